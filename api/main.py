@@ -23,6 +23,7 @@ from api.routers import (
     embedding_rebuild,
     episode_profiles,
     insights,
+    metrics,
     models,
     notebooks,
     notes,
@@ -168,6 +169,15 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error stopping P0 scheduler: {e}")
 
+    # Close pooled database connections
+    try:
+        from open_notebook.database.pool import close_connection_pools
+
+        await close_connection_pools()
+        logger.info("Database connection pools closed")
+    except Exception as e:
+        logger.error(f"Error closing database connection pools: {e}")
+
     logger.info("API shutdown complete")
 
 
@@ -272,6 +282,7 @@ app.include_router(personal_ip.router, prefix="/api", tags=["personal-ip"])
 app.include_router(platform_accounts.router, prefix="/api", tags=["platform-accounts"])
 app.include_router(publish.router, prefix="/api", tags=["publish"])
 app.include_router(activity.router, prefix="/api/v1", tags=["activity"])
+app.include_router(metrics.router, prefix="/api", tags=["metrics"])
 
 
 @app.get("/")
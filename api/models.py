@@ -31,13 +31,27 @@ class NotebookResponse(BaseModel):
 # Search models
 class SearchRequest(BaseModel):
     query: str = Field(..., description="Search query")
-    type: Literal["text", "vector"] = Field("text", description="Search type")
+    type: Literal["text", "vector", "hybrid"] = Field(
+        "text", description="Search type"
+    )
     limit: int = Field(100, description="Maximum number of results", le=1000)
     search_sources: bool = Field(True, description="Include sources in search")
     search_notes: bool = Field(True, description="Include notes in search")
     minimum_score: float = Field(
         0.2, description="Minimum score for vector search", ge=0, le=1
     )
+    text_weight: float = Field(
+        1.0, description="Weight of the BM25 ranking in hybrid search", ge=0
+    )
+    vector_weight: float = Field(
+        1.0, description="Weight of the vector ranking in hybrid search", ge=0
+    )
+    notebook_id: Optional[str] = Field(
+        None, description="Only search the sources and notes of this notebook"
+    )
+    source_ids: Optional[List[str]] = Field(
+        None, description="Only search these sources"
+    )
 
 
 class SearchResponse(BaseModel):
@@ -51,6 +65,12 @@ class AskRequest(BaseModel):
     strategy_model: str = Field(..., description="Model ID for query strategy")
     answer_model: str = Field(..., description="Model ID for individual answers")
     final_answer_model: str = Field(..., description="Model ID for final answer")
+    notebook_id: Optional[str] = Field(
+        None, description="Only search the sources and notes of this notebook"
+    )
+    source_ids: Optional[List[str]] = Field(
+        None, description="Only search these sources"
+    )
 
 
 class AskResponse(BaseModel):
@@ -223,6 +243,39 @@ class RebuildRequest(BaseModel):
     include_sources: bool = Field(True, description="Include sources in rebuild")
     include_notes: bool = Field(True, description="Include notes in rebuild")
     include_insights: bool = Field(True, description="Include insights in rebuild")
+    strategy: Literal["jobs", "batched"] = Field(
+        "jobs",
+        description="'jobs' submits one embedding job per item; 'batched' embeds "
+        "chunks from many items per provider call and resumes after interruption",
+    )
+
+
+class ConvertStorageRequest(BaseModel):
+    format: Optional[Literal["float", "int8"]] = Field(
+        None,
+        description="Target storage format; defaults to EMBEDDING_STORAGE_FORMAT",
+    )
+    force: bool = Field(
+        False, description="Quantise even if sampled recall@10 is below threshold"
+    )
+
+
+class ConvertStorageResponse(BaseModel):
+    command_id: str = Field(..., description="Command ID to track progress")
+    message: str = Field(..., description="Status message")
+
+
+class VectorIndexRequest(BaseModel):
+    dimension: Optional[int] = Field(
+        None,
+        description="Embedding dimension; defaults to the configured model's",
+        gt=0,
+    )
+
+
+class VectorIndexResponse(BaseModel):
+    command_id: str = Field(..., description="Command ID to track progress")
+    message: str = Field(..., description="Status message")
 
 
 class RebuildResponse(BaseModel):
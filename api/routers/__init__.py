@@ -11,6 +11,7 @@ from api.routers import (
     embedding_rebuild,
     episode_profiles,
     insights,
+    metrics,
     models,
     notebooks,
     notes,
@@ -38,6 +39,7 @@ __all__ = [
     "embedding_rebuild",
     "episode_profiles",
     "insights",
+    "metrics",
     "models",
     "notebooks",
     "notes",
@@ -8,7 +8,14 @@ from loguru import logger
 from pydantic import BaseModel, Field
 
 from open_notebook.database.repository import ensure_record_id, repo_query
-from open_notebook.domain.notebook import ChatSession, Note, Notebook, Source
+from open_notebook.domain.notebook import (
+    ChatSession,
+    Note,
+    Notebook,
+    Source,
+    SourceInsight,
+    get_context_records,
+)
 from open_notebook.exceptions import (
     NotFoundError,
 )
@@ -422,63 +429,73 @@ async def build_context(request: BuildContextRequest):
 
         # Process context configuration if provided
         if request.context_config:
-            # Process sources
-            for source_id, status in request.context_config.get("sources", {}).items():
-                if "not in" in status:
-                    continue
+            source_levels = {
+                (
+                    source_id
+                    if source_id.startswith("source:")
+                    else f"source:{source_id}"
+                ): status
+                for source_id, status in request.context_config.get(
+                    "sources", {}
+                ).items()
+                if "not in" not in status
+            }
+            note_levels = {
+                (note_id if note_id.startswith("note:") else f"note:{note_id}"): status
+                for note_id, status in request.context_config.get("notes", {}).items()
+                if "not in" not in status
+            }
+
+            # Load all selected sources, insights and notes in one round-trip
+            sources, insights_by_source, notes = await get_context_records(
+                list(source_levels), list(note_levels)
+            )
 
+            # Process sources
+            for source in sources:
+                status = source_levels.get(source.id or "", "")
                 try:
-                    # Add table prefix if not present
-                    full_source_id = (
-                        source_id
-                        if source_id.startswith("source:")
-                        else f"source:{source_id}"
-                    )
-
-                    try:
-                        source = await Source.get(full_source_id)
-                    except Exception:
-                        continue
-
                     if "insights" in status:
-                        source_context = await source.get_context(context_size="short")
+                        source_context = await source.get_context(
+                            context_size="short",
+                            insights=insights_by_source.get(source.id or "", []),
+                        )
                         context_data["sources"].append(source_context)
                         total_content += str(source_context)
                     elif "full content" in status:
-                        source_context = await source.get_context(context_size="long")
+                        source_context = await source.get_context(
+                            context_size="long",
+                            insights=insights_by_source.get(source.id or "", []),
+                        )
                         context_data["sources"].append(source_context)
                         total_content += str(source_context)
                 except Exception as e:
-                    logger.warning(f"Error processing source {source_id}: {str(e)}")
+                    logger.warning(f"Error processing source {source.id}: {str(e)}")
                     continue
 
             # Process notes
-            for note_id, status in request.context_config.get("notes", {}).items():
-                if "not in" in status:
-                    continue
-
+            for note in notes:
+                status = note_levels.get(note.id or "", "")
                 try:
-                    # Add table prefix if not present
-                    full_note_id = (
-                        note_id if note_id.startswith("note:") else f"note:{note_id}"
-                    )
-                    note = await Note.get(full_note_id)
-                    if not note:
-                        continue
-
                     if "full content" in status:
                         note_context = note.get_context(context_size="long")
                         context_data["notes"].append(note_context)
                         total_content += str(note_context)
                 except Exception as e:
-                    logger.warning(f"Error processing note {note_id}: {str(e)}")
+                    logger.warning(f"Error processing note {note.id}: {str(e)}")
                     continue
         else:
             # Default behavior - include all sources and notes with short context
             sources = await notebook.get_sources()
+            insights_by_source = await SourceInsight.get_for_sources(
+                [source.id for source in sources if source.id]
+            )
             for source in sources:
                 try:
-                    source_context = await source.get_context(context_size="short")
+                    source_context = await source.get_context(
+                        context_size="short",
+                        insights=insights_by_source.get(source.id or "", []),
+                    )
                     context_data["sources"].append(source_context)
                     total_content += str(source_context)
                 except Exception as e:
@@ -4,11 +4,15 @@ from surreal_commands import get_command_status
 
 from api.command_service import CommandService
 from api.models import (
+    ConvertStorageRequest,
+    ConvertStorageResponse,
     RebuildProgress,
     RebuildRequest,
     RebuildResponse,
     RebuildStats,
     RebuildStatusResponse,
+    VectorIndexRequest,
+    VectorIndexResponse,
 )
 from open_notebook.database.repository import repo_query
 
@@ -24,6 +28,8 @@ async def start_rebuild(request: RebuildRequest):
     - **include_sources**: Include sources in rebuild (default: true)
     - **include_notes**: Include notes in rebuild (default: true)
     - **include_insights**: Include insights in rebuild (default: true)
+    - **strategy**: "jobs" (one job per item, default) or "batched" (cross-item
+      embedding batches with a resumable checkpoint)
 
     Returns command ID to track progress and estimated item count.
     """
@@ -101,6 +107,7 @@ async def start_rebuild(request: RebuildRequest):
                 "include_sources": request.include_sources,
                 "include_notes": request.include_notes,
                 "include_insights": request.include_insights,
+                "strategy": request.strategy,
             },
         )
 
@@ -120,6 +127,70 @@ async def start_rebuild(request: RebuildRequest):
         )
 
 
+@router.post("/storage", response_model=ConvertStorageResponse)
+async def convert_storage(request: ConvertStorageRequest):
+    """
+    Start a background job converting stored embeddings to another format.
+
+    - **format**: "float" or "int8" (default: EMBEDDING_STORAGE_FORMAT)
+    - **force**: Convert to int8 even if sampled recall@10 is below
+      EMBEDDING_INT8_MIN_RECALL
+
+    Track the job with the rebuild status endpoint.
+    """
+    try:
+        import commands.embedding_commands  # noqa: F401
+
+        command_id = await CommandService.submit_command_job(
+            "open_notebook",
+            "convert_embedding_storage",
+            {"format": request.format, "force": request.force},
+        )
+        logger.info(f"Submitted embedding storage conversion: {command_id}")
+        return ConvertStorageResponse(
+            command_id=command_id,
+            message="Embedding storage conversion started.",
+        )
+    except Exception as e:
+        logger.error(f"Failed to start embedding storage conversion: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to start embedding storage conversion: {str(e)}",
+        )
+
+
+@router.post("/index", response_model=VectorIndexResponse)
+async def build_vector_index(request: VectorIndexRequest):
+    """
+    Start a background job building the vector indexes used by vector search.
+
+    - **dimension**: Embedding dimension (default: probed from the configured
+      embedding model)
+
+    Building is skipped while embeddings of another dimension are stored;
+    rebuild embeddings first. Track the job with the rebuild status endpoint.
+    """
+    try:
+        import commands.embedding_commands  # noqa: F401
+
+        command_id = await CommandService.submit_command_job(
+            "open_notebook",
+            "build_vector_index",
+            {"dimension": request.dimension},
+        )
+        logger.info(f"Submitted vector index build: {command_id}")
+        return VectorIndexResponse(
+            command_id=command_id,
+            message="Vector index build started.",
+        )
+    except Exception as e:
+        logger.error(f"Failed to start vector index build: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to start vector index build: {str(e)}",
+        )
+
+
 @router.get("/rebuild/{command_id}/status", response_model=RebuildStatusResponse)
 async def get_rebuild_status(command_id: str):
     """
@@ -0,0 +1,91 @@
+from fastapi import APIRouter, Query
+from fastapi.responses import PlainTextResponse
+
+from open_notebook.database.instrumentation import (
+    get_query_metrics,
+    render_prometheus,
+)
+from open_notebook.database.pool import get_pool_stats
+from open_notebook.domain.entity_cache import get_entity_cache
+from open_notebook.utils.embedding_cache import get_embedding_cache
+from open_notebook.utils.query_embedding_cache import get_query_embedding_cache
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_ENTITY_CACHE_COUNTERS = ("hits", "misses", "evictions", "expirations", "invalidations")
+_EMBEDDING_CACHE_COUNTERS = ("hits", "misses", "writes", "evictions", "errors")
+_QUERY_EMBEDDING_CACHE_COUNTERS = ("hits", "misses", "evictions", "expirations")
+
+
+def _render_cache(name: str, snapshot: dict, counters: tuple, size: int) -> str:
+    lines = []
+    for counter in counters:
+        metric = f"open_notebook_{name}_{counter}_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {snapshot[counter]}")
+    lines.append(f"# TYPE open_notebook_{name}_size gauge")
+    lines.append(f"open_notebook_{name}_size {size}")
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_prometheus_metrics():
+    """Query, connection pool and cache metrics in Prometheus text format.
+
+    Protected by the API password like other endpoints; configure the scraper
+    with ``authorization: {credentials: <password>}``.
+    """
+    entity_cache = get_entity_cache().snapshot()
+    embedding_cache = get_embedding_cache().snapshot()
+    query_cache = get_query_embedding_cache().snapshot()
+    body = (
+        render_prometheus(get_pool_stats())
+        + _render_cache(
+            "entity_cache", entity_cache, _ENTITY_CACHE_COUNTERS, entity_cache["size"]
+        )
+        + _render_cache(
+            "embedding_cache",
+            embedding_cache,
+            _EMBEDDING_CACHE_COUNTERS,
+            sum(embedding_cache["entries"].values()),
+        )
+        + _render_cache(
+            "query_embedding_cache",
+            query_cache,
+            _QUERY_EMBEDDING_CACHE_COUNTERS,
+            query_cache["size"],
+        )
+    )
+    return PlainTextResponse(body, media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@router.get("/metrics/db-pool")
+async def get_db_pool_metrics():
+    """Connection pool counters (checkouts, wait times, open/closed connections)."""
+    return {"pools": get_pool_stats()}
+
+
+@router.get("/metrics/db-queries")
+async def get_db_query_metrics(limit: int = Query(20, ge=1, le=500)):
+    """Statement fingerprints ranked by total time spent."""
+    return {"statements": get_query_metrics().top(limit)}
+
+
+@router.get("/metrics/entity-cache")
+async def get_entity_cache_metrics():
+    """Hit/miss counters and size of the in-process entity cache."""
+    return get_entity_cache().snapshot()
+
+
+@router.get("/metrics/embedding-cache")
+async def get_embedding_cache_metrics():
+    """Hit/miss counters and per-model entry counts of the embedding cache."""
+    return get_embedding_cache().snapshot()
+
+
+@router.get("/metrics/query-embedding-cache")
+async def get_query_embedding_cache_metrics():
+    """Hit/miss counters and size of the in-process query embedding cache."""
+    return get_query_embedding_cache().snapshot()
@@ -346,7 +346,7 @@ async def update_default_models(defaults_data: DefaultModelsResponse):
 
         await defaults.update()
 
-        # No cache refresh needed - next access will fetch fresh data from DB
+        # DefaultModels.update() invalidates the resolved model cache
 
         return DefaultModelsResponse(
             default_chat_model=defaults.default_chat_model,  # type: ignore[attr-defined]
@@ -1,5 +1,5 @@
 import json
-from typing import AsyncGenerator
+from typing import AsyncGenerator, List, Optional
 
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse
@@ -7,8 +7,9 @@ from loguru import logger
 
 from api.models import AskRequest, AskResponse, SearchRequest, SearchResponse
 from open_notebook.ai.models import Model, model_manager
-from open_notebook.domain.notebook import text_search, vector_search
+from open_notebook.domain.notebook import hybrid_search, text_search, vector_search
 from open_notebook.exceptions import DatabaseOperationError, InvalidInputError
+from open_notebook.graphs.ask import ThreadState
 from open_notebook.graphs.ask import graph as ask_graph
 
 router = APIRouter()
@@ -16,9 +17,9 @@ router = APIRouter()
 
 @router.post("/search", response_model=SearchResponse)
 async def search_knowledge_base(search_request: SearchRequest):
-    """Search the knowledge base using text or vector search."""
+    """Search the knowledge base using text, vector or hybrid search."""
     try:
-        if search_request.type == "vector":
+        if search_request.type in ("vector", "hybrid"):
             # Check if embedding model is available for vector search
             if not await model_manager.get_embedding_model():
                 raise HTTPException(
@@ -26,12 +27,27 @@ async def search_knowledge_base(search_request: SearchRequest):
                     detail="Vector search requires an embedding model. Please configure one in the Models section.",
                 )
 
+        if search_request.type == "hybrid":
+            results = await hybrid_search(
+                keyword=search_request.query,
+                results=search_request.limit,
+                source=search_request.search_sources,
+                note=search_request.search_notes,
+                minimum_score=search_request.minimum_score,
+                text_weight=search_request.text_weight,
+                vector_weight=search_request.vector_weight,
+                notebook_id=search_request.notebook_id,
+                source_ids=search_request.source_ids,
+            )
+        elif search_request.type == "vector":
             results = await vector_search(
                 keyword=search_request.query,
                 results=search_request.limit,
                 source=search_request.search_sources,
                 note=search_request.search_notes,
                 minimum_score=search_request.minimum_score,
+                notebook_id=search_request.notebook_id,
+                source_ids=search_request.source_ids,
             )
         else:
             # Text search
@@ -40,6 +56,8 @@ async def search_knowledge_base(search_request: SearchRequest):
                 results=search_request.limit,
                 source=search_request.search_sources,
                 note=search_request.search_notes,
+                notebook_id=search_request.notebook_id,
+                source_ids=search_request.source_ids,
             )
 
         return SearchResponse(
@@ -59,14 +77,21 @@ async def search_knowledge_base(search_request: SearchRequest):
 
 
 async def stream_ask_response(
-    question: str, strategy_model: Model, answer_model: Model, final_answer_model: Model
+    question: str,
+    strategy_model: Model,
+    answer_model: Model,
+    final_answer_model: Model,
+    notebook_id: Optional[str] = None,
+    source_ids: Optional[List[str]] = None,
 ) -> AsyncGenerator[str, None]:
     """Stream the ask response as Server-Sent Events."""
     try:
         final_answer = None
 
         async for chunk in ask_graph.astream(
-            input=dict(question=question),  # type: ignore[arg-type]
+            input=ThreadState(
+                question=question, notebook_id=notebook_id, source_ids=source_ids
+            ),
             config=dict(
                 configurable=dict(
                     strategy_model=strategy_model.id,
@@ -142,7 +167,12 @@ async def ask_knowledge_base(ask_request: AskRequest):
         # For streaming response
         return StreamingResponse(
             stream_ask_response(
-                ask_request.question, strategy_model, answer_model, final_answer_model
+                ask_request.question,
+                strategy_model,
+                answer_model,
+                final_answer_model,
+                notebook_id=ask_request.notebook_id,
+                source_ids=ask_request.source_ids,
             ),
             media_type="text/plain",
         )
@@ -189,7 +219,11 @@ async def ask_knowledge_base_simple(ask_request: AskRequest):
         # Run the ask graph and get final result
         final_answer = None
         async for chunk in ask_graph.astream(
-            input=dict(question=ask_request.question),  # type: ignore[arg-type]
+            input=ThreadState(
+                question=ask_request.question,
+                notebook_id=ask_request.notebook_id,
+                source_ids=ask_request.source_ids,
+            ),
             config=dict(
                 configurable=dict(
                     strategy_model=strategy_model.id,
@@ -565,7 +565,7 @@ async def create_source_json(source_data: SourceCreate):
 
 
 async def _resolve_source_file(source_id: str) -> tuple[str, str]:
-    source = await Source.get(source_id)
+    source = await Source.get(source_id, omit=["full_text"])
     if not source:
         raise HTTPException(status_code=404, detail="Source not found")
 
@@ -698,7 +698,7 @@ async def get_source_status(source_id: str):
     """Get processing status for a source."""
     try:
         # First, verify source exists
-        source = await Source.get(source_id)
+        source = await Source.get(source_id, omit=["full_text"])
         if not source:
             raise HTTPException(status_code=404, detail="Source not found")
 
@@ -802,7 +802,7 @@ async def retry_source_processing(source_id: str):
     """Retry processing for a failed or stuck source."""
     try:
         # First, verify source exists
-        source = await Source.get(source_id)
+        source = await Source.get(source_id, omit=["full_text"])
         if not source:
             raise HTTPException(status_code=404, detail="Source not found")
 
@@ -926,7 +926,7 @@ async def retry_source_processing(source_id: str):
 async def delete_source(source_id: str):
     """Delete a source."""
     try:
-        source = await Source.get(source_id)
+        source = await Source.get(source_id, omit=["full_text"])
         if not source:
             raise HTTPException(status_code=404, detail="Source not found")
 
@@ -944,7 +944,7 @@ async def delete_source(source_id: str):
 async def get_source_insights(source_id: str):
     """Get all insights for a specific source."""
     try:
-        source = await Source.get(source_id)
+        source = await Source.get(source_id, omit=["full_text"])
         if not source:
             raise HTTPException(status_code=404, detail="Source not found")
 
@@ -984,7 +984,7 @@ async def create_source_insight(source_id: str, request: CreateSourceInsightRequ
     """
     try:
         # Validate source exists
-        source = await Source.get(source_id)
+        source = await Source.get(source_id, omit=["full_text"])
         if not source:
             raise HTTPException(status_code=404, detail="Source not found")
 
@@ -1,6 +1,7 @@
 """Surreal-commands integration for Open Notebook"""
 
 from .embedding_commands import (
+    convert_embedding_storage_command,
     embed_insight_command,
     embed_note_command,
     embed_source_command,
@@ -16,6 +17,7 @@ __all__ = [
     "embed_insight_command",
     "embed_source_command",
     "rebuild_embeddings_command",
+    "convert_embedding_storage_command",
     # Other commands
     "generate_podcast_command",
     "process_source_command",
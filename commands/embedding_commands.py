@@ -1,15 +1,66 @@
 import time
-from typing import Dict, List, Literal, Optional
+import uuid
+from typing import Any, Dict, List, Literal, Optional, Tuple
 
 from loguru import logger
 from pydantic import BaseModel
 from surreal_commands import CommandInput, CommandOutput, command, submit_command
 
 from open_notebook.ai.models import model_manager
-from open_notebook.database.repository import ensure_record_id, repo_insert, repo_query
+from open_notebook.database.bulk import repo_insert_bulk
+from open_notebook.database.local_vector_index import (
+    forget_vector_parents,
+    forget_vectors,
+    record_vectors,
+)
+from open_notebook.database.repository import (
+    ensure_record_id,
+    repo_query,
+    repo_scan,
+    repo_upsert,
+)
+from open_notebook.database.vector_index import (
+    build_vector_index,
+    ensure_vector_index,
+    record_embedding_heads,
+    rerank_candidates,
+    vector_index_build_finished,
+    vector_search_backend,
+)
+from open_notebook.database.write_coalescer import coalesced_create, coalesced_merge
 from open_notebook.domain.notebook import Note, Source, SourceInsight
-from open_notebook.utils.chunking import ContentType, chunk_text, detect_content_type
-from open_notebook.utils.embedding import generate_embedding, generate_embeddings
+from open_notebook.utils.chunk_dedup import (
+    NearDuplicateIndex,
+    chunk_dedup_scope,
+    find_near_duplicates,
+    from_signed64,
+    simhash,
+    to_signed64,
+)
+from open_notebook.utils.chunking import (
+    ContentType,
+    chunk_text,
+    detect_content_type,
+    diff_chunks,
+    iter_chunks,
+)
+from open_notebook.utils.embedding import (
+    generate_embedding,
+    generate_embeddings,
+    mean_pool_embeddings,
+    split_for_embedding,
+)
+from open_notebook.utils.embedding_cache import model_cache_key, text_hash
+from open_notebook.utils.embedding_storage import (
+    STORAGE_FORMATS,
+    decode_embedding,
+    encode_embedding,
+    head_dimensions,
+    head_recall_at_k,
+    int8_recall_at_k,
+    min_int8_recall,
+    storage_format,
+)
 
 
 def full_model_dump(model):
@@ -35,6 +86,10 @@ class RebuildEmbeddingsInput(CommandInput):
     include_sources: bool = True
     include_notes: bool = True
     include_insights: bool = True
+    # "jobs": one embed_* command per item; "batched": embed in this command,
+    # packing chunks from many items per provider call, with checkpoints
+    strategy: Literal["jobs", "batched"] = "jobs"
+    resume: bool = True  # batched only: continue an interrupted rebuild
 
 
 class RebuildEmbeddingsOutput(CommandOutput):
@@ -45,6 +100,8 @@ class RebuildEmbeddingsOutput(CommandOutput):
     sources_submitted: int = 0
     notes_submitted: int = 0
     insights_submitted: int = 0
+    chunks_embedded: int = 0
+    resumed: bool = False
     processing_time: float
     error_message: Optional[str] = None
 
@@ -113,6 +170,8 @@ class EmbedSourceOutput(CommandOutput):
     success: bool
     source_id: str
     chunks_created: int
+    chunks_embedded: int = 0  # New chunks sent to the provider
+    chunks_deduplicated: int = 0  # Near-duplicates linked instead of embedded
     processing_time: float
     error_message: Optional[str] = None
 
@@ -166,13 +225,11 @@ async def embed_note_command(input_data: EmbedNoteInput) -> EmbedNoteOutput:
             note.content, content_type=ContentType.MARKDOWN, command_id=cmd_id
         )
 
-        # 3. UPSERT embedding into note record
-        await repo_query(
-            "UPDATE $note_id SET embedding = $embedding",
-            {
-                "note_id": ensure_record_id(input_data.note_id),
-                "embedding": embedding,
-            },
+        # 3. UPSERT embedding into note record (coalesced when enabled for note)
+        await ensure_vector_index(len(embedding))
+        await coalesced_merge(input_data.note_id, encode_embedding(embedding))
+        await record_vectors(
+            [(input_data.note_id, "note", input_data.note_id, embedding)]
         )
 
         processing_time = time.time() - start_time
@@ -260,14 +317,26 @@ async def embed_insight_command(input_data: EmbedInsightInput) -> EmbedInsightOu
             insight.content, content_type=ContentType.MARKDOWN, command_id=cmd_id
         )
 
-        # 3. UPSERT embedding into insight record
-        await repo_query(
-            "UPDATE $insight_id SET embedding = $embedding",
-            {
-                "insight_id": ensure_record_id(input_data.insight_id),
-                "embedding": embedding,
-            },
-        )
+        # 3. UPSERT embedding into insight record (coalesced when enabled)
+        await ensure_vector_index(len(embedding))
+        await coalesced_merge(input_data.insight_id, encode_embedding(embedding))
+        if vector_search_backend() == "local":
+            # The local index drops insights with their source
+            result = await repo_query(
+                "SELECT VALUE source FROM ONLY $id",
+                {"id": ensure_record_id(input_data.insight_id)},
+            )
+            source_id = result[0] if isinstance(result, list) and result else result
+            await record_vectors(
+                [
+                    (
+                        input_data.insight_id,
+                        "source_insight",
+                        str(source_id),
+                        embedding,
+                    )
+                ]
+            )
 
         processing_time = time.time() - start_time
         logger.info(
@@ -303,6 +372,86 @@ async def embed_insight_command(input_data: EmbedInsightInput) -> EmbedInsightOu
         raise
 
 
+# New chunks embedded and inserted per round while streaming a source
+EMBED_SOURCE_BATCH_CHUNKS = 500
+
+
+async def _embed_source_batch(
+    source_id: Any,
+    model_key: Optional[str],
+    batch: List[Tuple[int, str]],
+    chunk_hashes: List[str],
+    command_id: str,
+    row_ids: Optional[Dict[int, Any]] = None,
+    signatures: Optional[List[int]] = None,
+) -> int:
+    """Embed (order, text) chunks of a source and INSERT their rows.
+
+    Chunks listed in row_ids get that record id (near-duplicates link to
+    them), and signatures are stored when chunk dedup is enabled.
+    """
+    embeddings = await generate_embeddings(
+        [text for _, text in batch], command_id=command_id
+    )
+    # Verify we got embeddings for all chunks
+    if len(embeddings) != len(batch):
+        raise ValueError(
+            f"Embedding count mismatch: got {len(embeddings)} embeddings "
+            f"for {len(batch)} chunks"
+        )
+    await ensure_vector_index(len(embeddings[0]))
+    local_index = vector_search_backend() == "local"
+    records = []
+    for (idx, text), embedding in zip(batch, embeddings):
+        record = {
+            "source": source_id,
+            "order": idx,
+            "content": text,
+            "content_hash": chunk_hashes[idx],
+            "embedding_model": model_key,
+            **encode_embedding(embedding),
+        }
+        if row_ids and idx in row_ids:
+            record["id"] = row_ids[idx]
+        elif local_index:
+            # The local index journals rows by id, so ids are chosen here
+            record["id"] = ensure_record_id(f"source_embedding:{uuid.uuid4().hex}")
+        if signatures:
+            record["simhash"] = to_signed64(signatures[idx])
+        records.append(record)
+    logger.debug(f"Inserting {len(records)} source_embedding records")
+    write_stats = await repo_insert_bulk("source_embedding", records)
+    logger.debug(
+        f"Stored {write_stats.rows} chunks in {write_stats.batches} batches "
+        f"({write_stats.rows_per_sec:.0f} rows/s)"
+    )
+    if local_index:
+        await record_vectors(
+            [
+                (str(record["id"]), "source_embedding", str(source_id), embedding)
+                for record, embedding in zip(records, embeddings)
+            ]
+        )
+    return len(records)
+
+
+async def _index_notebook_chunks(
+    index: NearDuplicateIndex, source_id: Any, model_key: str
+) -> None:
+    """Add embedded chunks of sources sharing a notebook with source_id."""
+    rows = await repo_query(
+        "SELECT id, simhash FROM source_embedding "
+        "WHERE source IN (SELECT VALUE in FROM reference WHERE out IN "
+        "(SELECT VALUE out FROM reference WHERE in = $source_id)) "
+        "AND source != $source_id AND duplicate_of = NONE AND simhash != NONE "
+        "AND embedding_model = $model_key",
+        {"source_id": source_id, "model_key": model_key},
+    )
+    for row in rows:
+        index.add(row["id"], from_signed64(row["simhash"]))
+    logger.debug(f"Indexed {len(rows)} notebook chunks for near-duplicate lookup")
+
+
 @command(
     "embed_source",
     app="open_notebook",
@@ -324,11 +473,22 @@ async def embed_source_command(input_data: EmbedSourceInput) -> EmbedSourceOutpu
 
     Flow:
     1. Load Source by ID
-    2. DELETE existing source_embedding records for this source
-    3. Detect content type from file path or content
-    4. Chunk text using appropriate splitter
-    5. Generate embeddings for all chunks in a single API call
-    6. Bulk INSERT source_embedding records
+    2. Detect content type from file path or content
+    3. Stream chunks from the splitter, keeping only their hashes
+    4. Diff chunks against stored rows by content hash and embedding model
+    5. Stream chunks again; embed and bulk INSERT new ones in batches
+    6. Update `order` of kept rows, DELETE vanished rows
+
+    Editing or appending to a long document therefore costs in proportion to
+    the change. Rows without a content hash (embedded before migration 15) or
+    from a different embedding model are always replaced.
+
+    With CHUNK_DEDUP set, new chunks that near-duplicate an earlier chunk of
+    the source (or, for "notebook", an embedded chunk of a source sharing a
+    notebook) are not embedded: their row gets no embedding and links the
+    matching row through duplicate_of (see open_notebook.utils.chunk_dedup).
+    Linked rows are rebuilt on every run, and sources linking to rows this
+    run deletes are queued for re-embedding.
 
     Retry Strategy:
     - Retries up to 5 times for transient failures (network, timeout, etc.)
@@ -348,70 +508,194 @@ async def embed_source_command(input_data: EmbedSourceInput) -> EmbedSourceOutpu
         if not source.full_text or not source.full_text.strip():
             raise ValueError(f"Source '{input_data.source_id}' has no text to embed")
 
-        # 2. DELETE existing embeddings (idempotency)
-        logger.debug(f"Deleting existing embeddings for source {input_data.source_id}")
-        await repo_query(
-            "DELETE source_embedding WHERE source = $source_id",
-            {"source_id": ensure_record_id(input_data.source_id)},
-        )
-
-        # 3. Detect content type from file path if available
+        # 2. Detect content type from file path if available
         file_path = source.asset.file_path if source.asset else None
         content_type = detect_content_type(source.full_text, file_path)
         logger.debug(f"Detected content type: {content_type.value}")
 
-        # 4. Chunk text using appropriate splitter
-        chunks = chunk_text(source.full_text, content_type=content_type)
-        total_chunks = len(chunks)
+        # 3. Hash chunks as the splitter streams them; texts are not kept
+        dedup_scope = chunk_dedup_scope()
+        chunk_hashes: List[str] = []
+        signatures: List[int] = []
+        min_size, max_size, total_size = 0, 0, 0
+        for chunk in iter_chunks(source.full_text, content_type=content_type):
+            chunk_hashes.append(text_hash(chunk.text))
+            if dedup_scope:
+                signatures.append(simhash(chunk.text))
+            size = len(chunk.text)
+            min_size = min(min_size, size) if min_size else size
+            max_size = max(max_size, size)
+            total_size += size
+        total_chunks = len(chunk_hashes)
 
         # Log chunk statistics for debugging
-        chunk_sizes = [len(c) for c in chunks]
         logger.info(
             f"Created {total_chunks} chunks for source {input_data.source_id} "
-            f"(sizes: min={min(chunk_sizes) if chunk_sizes else 0}, "
-            f"max={max(chunk_sizes) if chunk_sizes else 0}, "
-            f"avg={sum(chunk_sizes)//len(chunk_sizes) if chunk_sizes else 0} chars)"
+            f"(sizes: min={min_size}, max={max_size}, "
+            f"avg={total_size // total_chunks if total_chunks else 0} chars)"
         )
 
         if total_chunks == 0:
             raise ValueError("No chunks created after splitting text")
 
-        # 5. Generate embeddings for all chunks in single API call
-        cmd_id = get_command_id(input_data)
-        logger.debug(f"Generating embeddings for {total_chunks} chunks")
-        embeddings = await generate_embeddings(chunks, command_id=cmd_id)
+        # 4. Diff against the chunks already stored for this source
+        source_id = ensure_record_id(input_data.source_id)
+        embedding_model = await model_manager.get_embedding_model()
+        model_key = model_cache_key(embedding_model) if embedding_model else None
+        existing = await repo_query(
+            "SELECT id, order, content_hash, embedding_model, simhash, duplicate_of "
+            "FROM source_embedding WHERE source = $source_id",
+            {"source_id": source_id},
+        )
+        diff = diff_chunks(
+            [row for row in existing if not row.get("duplicate_of")],
+            chunk_hashes,
+            model_key,
+        )
+        # Linked rows carry no embedding, so they are simply rebuilt
+        diff.stale.extend(row["id"] for row in existing if row.get("duplicate_of"))
+
+        # Near-duplicates among the new chunks: {index: chunk index or row id}.
+        # Chunks whose embedded row is kept stay embedded.
+        duplicates: Dict[int, Any] = {}
+        row_ids: Dict[int, Any] = {}
+        if dedup_scope:
+            index = NearDuplicateIndex()
+            if dedup_scope == "notebook" and model_key:
+                await _index_notebook_chunks(index, source_id, model_key)
+            duplicates = {
+                idx: target
+                for idx, target in find_near_duplicates(signatures, index).items()
+                if idx not in diff.kept
+            }
+            row_ids = dict(diff.kept)
+            for target in duplicates.values():
+                if isinstance(target, int) and target not in row_ids:
+                    row_ids[target] = ensure_record_id(
+                        f"source_embedding:{uuid.uuid4().hex}"
+                    )
+        logger.debug(
+            f"Chunk diff for source {input_data.source_id}: "
+            f"{len(diff.embed)} new ({len(duplicates)} near-duplicates), "
+            f"{total_chunks - len(diff.embed)} unchanged "
+            f"({len(diff.reorder)} moved), {len(diff.stale)} removed"
+        )
 
-        # Verify we got embeddings for all chunks
-        if len(embeddings) != len(chunks):
-            raise ValueError(
-                f"Embedding count mismatch: got {len(embeddings)} embeddings "
-                f"for {len(chunks)} chunks"
+        # 5. Chunk again and embed + INSERT new chunks batch by batch, so
+        # memory stays flat for very large documents. Kept chunks are moved
+        # and vanished ones dropped afterwards, so search never loses
+        # coverage if the command is interrupted; a retry reuses the rows
+        # already inserted.
+        cmd_id = get_command_id(input_data)
+        to_embed = set(diff.embed) - set(duplicates)
+        batch: List[Tuple[int, str]] = []
+        linked: List[Dict[str, Any]] = []
+        embedded = 0
+        for idx, chunk in enumerate(
+            iter_chunks(source.full_text, content_type=content_type)
+        ):
+            if idx in duplicates:
+                target = duplicates[idx]
+                linked.append(
+                    {
+                        "source": source_id,
+                        "order": idx,
+                        "content": chunk.text,
+                        "content_hash": chunk_hashes[idx],
+                        "embedding_model": model_key,
+                        "simhash": to_signed64(signatures[idx]),
+                        "duplicate_of": ensure_record_id(
+                            row_ids[target] if isinstance(target, int) else target
+                        ),
+                    }
+                )
+            elif idx in to_embed:
+                batch.append((idx, chunk.text))
+            if (
+                len(batch) >= EMBED_SOURCE_BATCH_CHUNKS
+                or len(linked) >= EMBED_SOURCE_BATCH_CHUNKS
+            ):
+                if batch:
+                    embedded += await _embed_source_batch(
+                        source_id,
+                        model_key,
+                        batch,
+                        chunk_hashes,
+                        cmd_id,
+                        row_ids,
+                        signatures,
+                    )
+                if linked:
+                    await repo_insert_bulk("source_embedding", linked)
+                batch, linked = [], []
+        if batch:
+            embedded += await _embed_source_batch(
+                source_id, model_key, batch, chunk_hashes, cmd_id, row_ids, signatures
             )
+        if linked:
+            await repo_insert_bulk("source_embedding", linked)
+
+        # Kept rows embedded while dedup was off have no signature yet
+        if dedup_scope:
+            missing = {str(row["id"]) for row in existing if row.get("simhash") is None}
+            rows = [
+                {
+                    "id": ensure_record_id(row_id),
+                    "simhash": to_signed64(signatures[idx]),
+                }
+                for idx, row_id in diff.kept.items()
+                if str(row_id) in missing
+            ]
+            if rows:
+                await repo_query(
+                    "FOR $row IN $rows "
+                    "{ UPDATE $row.id SET simhash = $row.simhash RETURN NONE; }",
+                    {"rows": rows},
+                )
 
-        # 6. Bulk INSERT source_embedding records
-        records = [
-            {
-                "source": ensure_record_id(input_data.source_id),
-                "order": idx,
-                "content": chunk,
-                "embedding": embedding,
-            }
-            for idx, (chunk, embedding) in enumerate(zip(chunks, embeddings))
-        ]
-
-        logger.debug(f"Inserting {len(records)} source_embedding records")
-        await repo_insert("source_embedding", records)
+        # 6. Update `order` of kept rows and DELETE vanished rows
+        if diff.reorder:
+            await repo_query(
+                "FOR $row IN $rows "
+                "{ UPDATE $row.id SET order = $row.order RETURN NONE; }",
+                {
+                    "rows": [
+                        {"id": row_id, "order": order} for row_id, order in diff.reorder
+                    ]
+                },
+            )
+        if diff.stale:
+            stale_ids = [ensure_record_id(row_id) for row_id in diff.stale]
+            # Other sources' near-duplicates of vanished rows must be relinked
+            dependents = await repo_query(
+                "SELECT source FROM source_embedding WHERE duplicate_of IN $ids "
+                "AND source != $source_id GROUP BY source",
+                {"ids": stale_ids, "source_id": source_id},
+            )
+            await repo_query("FOR $id IN $ids { DELETE $id; }", {"ids": stale_ids})
+            await forget_vectors(stale_ids)
+            for row in dependents:
+                submit_command(
+                    "open_notebook", "embed_source", {"source_id": str(row["source"])}
+                )
+                logger.debug(
+                    f"Submitted embed_source for {row['source']}: its near-duplicate "
+                    f"chunks linked rows removed from {input_data.source_id}"
+                )
 
         processing_time = time.time() - start_time
         logger.info(
             f"Successfully embedded source {input_data.source_id}: "
-            f"{total_chunks} chunks in {processing_time:.2f}s"
+            f"{total_chunks} chunks ({embedded} embedded, {len(duplicates)} "
+            f"near-duplicates) in {processing_time:.2f}s"
         )
 
         return EmbedSourceOutput(
             success=True,
             source_id=input_data.source_id,
             chunks_created=total_chunks,
+            chunks_embedded=embedded,
+            chunks_deduplicated=len(duplicates),
             processing_time=processing_time,
         )
 
@@ -460,6 +744,8 @@ async def create_insight_command(
     This command wraps the CREATE source_insight operation with retry logic
     to handle SurrealDB transaction conflicts that occur during batch imports
     when multiple parallel transformations try to create insights concurrently.
+    Enabling the write coalescer for source_insight avoids most of those
+    conflicts within a worker process.
 
     Flow:
     1. CREATE source_insight record in database
@@ -479,26 +765,21 @@ async def create_insight_command(
             f"type={input_data.insight_type}"
         )
 
-        # 1. Create insight record in database
-        result = await repo_query(
-            """
-            CREATE source_insight CONTENT {
-                "source": $source_id,
-                "insight_type": $insight_type,
-                "content": $content
-            };
-            """,
+        # 1. Create insight record in database. With source_insight listed in
+        # SURREAL_WRITE_COALESCE_TABLES, concurrent creates share one writer.
+        created = await coalesced_create(
+            "source_insight",
             {
-                "source_id": ensure_record_id(input_data.source_id),
+                "source": ensure_record_id(input_data.source_id),
                 "insight_type": input_data.insight_type,
                 "content": input_data.content,
             },
         )
 
-        if not result or len(result) == 0:
+        if not created:
             raise ValueError("Failed to create insight - no result returned")
 
-        insight_id = str(result[0].get("id", ""))
+        insight_id = str(created.get("id", ""))
         if not insight_id:
             raise ValueError("Failed to create insight - no ID in result")
 
@@ -545,6 +826,37 @@ async def create_insight_command(
         raise
 
 
+REBUILD_SCAN_BATCH_SIZE = 1000
+
+# Per-table conditions selecting the items each rebuild mode re-embeds
+_HAS_EMBEDDING = "embedding != none AND array::len(embedding) > 0"
+_REBUILD_FILTERS: Dict[str, Dict[str, str]] = {
+    "source": {
+        # Index lookup on source_embedding.source instead of scanning all chunks
+        "existing": "(SELECT VALUE id FROM source_embedding WHERE source = $parent.id LIMIT 1) != []",
+        "all": "full_text != none AND string::trim(full_text) != ''",
+    },
+    "note": {
+        "existing": _HAS_EMBEDDING,
+        "all": "content != none AND string::trim(content) != ''",
+    },
+    "source_insight": {
+        "existing": _HAS_EMBEDDING,
+        "all": "content != none AND string::trim(content) != ''",
+    },
+}
+
+
+async def _scan_ids(table: str, where: str) -> List[str]:
+    """Collect matching record ids page by page without loading full rows."""
+    ids: List[str] = []
+    async for page in repo_scan(
+        table, projection="id", where=where, batch_size=REBUILD_SCAN_BATCH_SIZE
+    ):
+        ids.extend(str(row["id"]) for row in page)
+    return ids
+
+
 async def collect_items_for_rebuild(
     mode: str,
     include_sources: bool,
@@ -554,70 +866,272 @@ async def collect_items_for_rebuild(
     """
     Collect items to rebuild based on mode and include flags.
 
+    Tables are read with keyset-paginated scans that select only ids, so
+    memory stays bounded by the id lists even on large instances.
+
     Returns:
         Dict with keys: 'sources', 'notes', 'insights' containing lists of item IDs
     """
     items: Dict[str, List[str]] = {"sources": [], "notes": [], "insights": []}
 
     if include_sources:
-        if mode == "existing":
-            # Query sources with embeddings (via source_embedding table)
-            result = await repo_query(
-                """
-                RETURN array::distinct(
-                    SELECT VALUE source.id
-                    FROM source_embedding
-                    WHERE embedding != none AND array::len(embedding) > 0
-                )
-                """
-            )
-            # RETURN returns the array directly as the result (not nested)
-            if result:
-                items["sources"] = [str(item) for item in result]
-            else:
-                items["sources"] = []
-        else:  # mode == "all"
-            # Query all sources with non-empty content
-            result = await repo_query(
-                "SELECT id FROM source WHERE full_text != none AND string::trim(full_text) != ''"
-            )
-            items["sources"] = [str(item["id"]) for item in result] if result else []
-
+        items["sources"] = await _scan_ids("source", _REBUILD_FILTERS["source"][mode])
         logger.info(f"Collected {len(items['sources'])} sources for rebuild")
 
     if include_notes:
-        if mode == "existing":
-            # Query notes with embeddings
-            result = await repo_query(
-                "SELECT id FROM note WHERE embedding != none AND array::len(embedding) > 0"
-            )
-        else:  # mode == "all"
-            # Query all notes with non-empty content
-            result = await repo_query(
-                "SELECT id FROM note WHERE content != none AND string::trim(content) != ''"
-            )
-
-        items["notes"] = [str(item["id"]) for item in result] if result else []
+        items["notes"] = await _scan_ids("note", _REBUILD_FILTERS["note"][mode])
         logger.info(f"Collected {len(items['notes'])} notes for rebuild")
 
     if include_insights:
-        if mode == "existing":
-            # Query insights with embeddings
-            result = await repo_query(
-                "SELECT id FROM source_insight WHERE embedding != none AND array::len(embedding) > 0"
-            )
-        else:  # mode == "all"
-            # Query all insights with non-empty content
-            result = await repo_query(
-                "SELECT id FROM source_insight WHERE content != none AND string::trim(content) != ''"
-            )
-
-        items["insights"] = [str(item["id"]) for item in result] if result else []
+        items["insights"] = await _scan_ids(
+            "source_insight", _REBUILD_FILTERS["source_insight"][mode]
+        )
         logger.info(f"Collected {len(items['insights'])} insights for rebuild")
 
     return items
 
 
+# Batched rebuild: chunks from many items share provider calls
+REBUILD_BATCH_CHUNKS = 2000  # Chunks embedded per flush
+REBUILD_ITEM_PAGE_SIZE = 100
+REBUILD_CHECKPOINT_ID = "open_notebook:embedding_rebuild"
+
+# (table, output counter, projection) in rebuild order
+_REBUILD_TABLES = (
+    ("source", "sources", "id, full_text, asset"),
+    ("note", "notes", "id, content"),
+    ("source_insight", "insights", "id, content, source"),
+)
+
+
+def _rebuild_chunks(table: str, row: Dict[str, Any]) -> List[str]:
+    """Chunks the per-item commands would embed for this row."""
+    if table == "source":
+        file_path = (row.get("asset") or {}).get("file_path")
+        content_type = detect_content_type(row["full_text"], file_path)
+        return chunk_text(row["full_text"], content_type=content_type)
+    # Notes and insights are markdown, pooled into one vector
+    return split_for_embedding(row["content"], content_type=ContentType.MARKDOWN)
+
+
+async def _flush_rebuild_batch(
+    table: str, items: List[Dict[str, Any]], model_key: Optional[str]
+) -> int:
+    """Embed all chunks of the given items together and write them back."""
+    texts = [chunk for item in items for chunk in item["chunks"]]
+    embeddings = await generate_embeddings(texts)
+    if len(embeddings) != len(texts):
+        raise ValueError(
+            f"Embedding count mismatch: got {len(embeddings)} embeddings "
+            f"for {len(texts)} chunks"
+        )
+    if embeddings:
+        await ensure_vector_index(len(embeddings[0]))
+
+    offset = 0
+    local_index = vector_search_backend() == "local"
+    if table == "source":
+        records = []
+        for item in items:
+            source_id = ensure_record_id(item["id"])
+            for order, chunk in enumerate(item["chunks"]):
+                records.append(
+                    {
+                        **(
+                            {
+                                "id": ensure_record_id(
+                                    f"source_embedding:{uuid.uuid4().hex}"
+                                )
+                            }
+                            if local_index
+                            else {}
+                        ),
+                        "source": source_id,
+                        "order": order,
+                        "content": chunk,
+                        "content_hash": text_hash(chunk),
+                        "embedding_model": model_key,
+                        **encode_embedding(embeddings[offset]),
+                    }
+                )
+                offset += 1
+        await repo_query(
+            "FOR $source IN $sources "
+            "{ DELETE source_embedding WHERE source = $source; }",
+            {"sources": [ensure_record_id(item["id"]) for item in items]},
+        )
+        await repo_insert_bulk("source_embedding", records)
+        if local_index:
+            await forget_vector_parents([item["id"] for item in items])
+            await record_vectors(
+                [
+                    (
+                        str(record["id"]),
+                        "source_embedding",
+                        str(record["source"]),
+                        vector,
+                    )
+                    for record, vector in zip(records, embeddings)
+                ]
+            )
+        return len(texts)
+
+    rows = []
+    for item in items:
+        vectors = embeddings[offset : offset + len(item["chunks"])]
+        offset += len(item["chunks"])
+        if len(vectors) > 1:
+            vectors = [await mean_pool_embeddings(vectors)]
+        rows.append(
+            {"id": ensure_record_id(item["id"]), **encode_embedding(vectors[0])}
+        )
+    await repo_query(
+        "FOR $row IN $rows "
+        "{ UPDATE $row.id SET embedding = $row.embedding, "
+        "embedding_scale = $row.embedding_scale, "
+        "embedding_head = $row.embedding_head RETURN NONE; }",
+        {"rows": rows},
+    )
+    if local_index:
+        await record_vectors(
+            [
+                (
+                    str(item["id"]),
+                    table,
+                    str(item.get("source") or item["id"]),
+                    vector,
+                )
+                for item, row in zip(items, rows)
+                if (vector := decode_embedding(row)) is not None
+            ]
+        )
+    return len(texts)
+
+
+async def _load_rebuild_checkpoint(state: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return the stored checkpoint if it belongs to an unfinished, identical run."""
+    result = await repo_query(
+        "SELECT * FROM ONLY $id", {"id": ensure_record_id(REBUILD_CHECKPOINT_ID)}
+    )
+    checkpoint = result[0] if isinstance(result, list) and result else result
+    if not isinstance(checkpoint, dict) or checkpoint.get("status") != "running":
+        return None
+    for key in ("mode", "tables", "model"):
+        if checkpoint.get(key) != state[key]:
+            return None
+    return checkpoint
+
+
+async def _save_rebuild_checkpoint(state: Dict[str, Any]) -> None:
+    await repo_upsert(
+        "open_notebook", REBUILD_CHECKPOINT_ID, dict(state), add_timestamp=True
+    )
+
+
+async def rebuild_embeddings_batched(
+    input_data: RebuildEmbeddingsInput, embedding_model: Any
+) -> Dict[str, Any]:
+    """
+    Re-embed all selected items inside this command, in cross-item batches.
+
+    Items are streamed with keyset scans; their chunks are packed into
+    batches of about REBUILD_BATCH_CHUNKS and sent through
+    generate_embeddings() (provider-sized, concurrent calls), and results
+    are written back with bulk statements. After every batch the last
+    written id is checkpointed, so rerunning an interrupted rebuild with the
+    same parameters and model resumes after it.
+    """
+    tables = [
+        table
+        for table, enabled in (
+            ("source", input_data.include_sources),
+            ("note", input_data.include_notes),
+            ("source_insight", input_data.include_insights),
+        )
+        if enabled
+    ]
+    model_key = model_cache_key(embedding_model)
+    state: Dict[str, Any] = {
+        "mode": input_data.mode,
+        "tables": tables,
+        "model": model_key,
+        "status": "running",
+        "table": None,
+        "last_id": None,
+        "counts": {"sources": 0, "notes": 0, "insights": 0, "chunks": 0, "failed": 0},
+    }
+    checkpoint = await _load_rebuild_checkpoint(state) if input_data.resume else None
+    if checkpoint:
+        state.update(
+            table=checkpoint.get("table"),
+            last_id=checkpoint.get("last_id"),
+            counts={**state["counts"], **(checkpoint.get("counts") or {})},
+        )
+        logger.info(
+            f"Resuming embedding rebuild after {state['last_id']} "
+            f"in {state['table']} ({state['counts']})"
+        )
+    await _save_rebuild_checkpoint(state)
+
+    for table, counter, projection in _REBUILD_TABLES:
+        if table not in tables:
+            continue
+        if state["table"] and tables.index(table) < tables.index(state["table"]):
+            continue  # Finished before the interruption
+
+        where = _REBUILD_FILTERS[table][input_data.mode]
+        vars: Dict[str, Any] = {}
+        if state["table"] == table and state["last_id"]:
+            where = f"({where}) AND id > $resume_after"
+            vars["resume_after"] = ensure_record_id(state["last_id"])
+        state["table"] = table
+
+        pending: List[Dict[str, Any]] = []
+        pending_chunks = 0
+        async for page in repo_scan(
+            table,
+            projection=projection,
+            where=where,
+            vars=vars,
+            batch_size=REBUILD_ITEM_PAGE_SIZE,
+        ):
+            for row in page:
+                try:
+                    chunks = _rebuild_chunks(table, row)
+                except ValueError as e:
+                    logger.warning(f"Skipping {row['id']} in rebuild: {e}")
+                    state["counts"]["failed"] += 1
+                    continue
+                if chunks:
+                    pending.append(
+                        {"id": row["id"], "source": row.get("source"), "chunks": chunks}
+                    )
+                    pending_chunks += len(chunks)
+            # Flush at page boundaries so the checkpoint is a scan cursor
+            if pending_chunks >= REBUILD_BATCH_CHUNKS:
+                state["counts"]["chunks"] += await _flush_rebuild_batch(
+                    table, pending, model_key
+                )
+                state["counts"][counter] += len(pending)
+                pending, pending_chunks = [], 0
+                state["last_id"] = str(page[-1]["id"])
+                await _save_rebuild_checkpoint(state)
+                logger.info(f"Rebuild progress: {state['counts']}")
+        if pending:
+            state["counts"]["chunks"] += await _flush_rebuild_batch(
+                table, pending, model_key
+            )
+            state["counts"][counter] += len(pending)
+        state["last_id"] = None
+        await _save_rebuild_checkpoint(state)
+
+    state["status"] = "completed"
+    await _save_rebuild_checkpoint(state)
+    # Indexes are blocked while vectors of an older model remain
+    submit_command("open_notebook", "build_vector_index", {})
+    return {"counts": state["counts"], "resumed": checkpoint is not None}
+
+
 @command("rebuild_embeddings", app="open_notebook", retry=None)
 async def rebuild_embeddings_command(
     input_data: RebuildEmbeddingsInput,
@@ -625,7 +1139,9 @@ async def rebuild_embeddings_command(
     """
     Rebuild embeddings for sources, notes, and/or insights.
 
-    This command submits individual embedding jobs for each item:
+    With strategy="batched" the items are embedded by this command itself
+    (see rebuild_embeddings_batched). Otherwise it submits individual
+    embedding jobs for each item:
     - embed_source for sources
     - embed_note for notes
     - embed_insight for insights
@@ -657,6 +1173,28 @@ async def rebuild_embeddings_command(
 
         logger.info(f"Embedding model configured: {EMBEDDING_MODEL}")
 
+        if input_data.strategy == "batched":
+            outcome = await rebuild_embeddings_batched(input_data, EMBEDDING_MODEL)
+            counts = outcome["counts"]
+            embedded = counts["sources"] + counts["notes"] + counts["insights"]
+            processing_time = time.time() - start_time
+            logger.info(
+                f"Batched rebuild finished: {embedded} items, {counts['chunks']} "
+                f"chunks in {processing_time:.2f}s"
+            )
+            return RebuildEmbeddingsOutput(
+                success=True,
+                total_items=embedded + counts["failed"],
+                jobs_submitted=embedded,
+                failed_submissions=counts["failed"],
+                sources_submitted=counts["sources"],
+                notes_submitted=counts["notes"],
+                insights_submitted=counts["insights"],
+                chunks_embedded=counts["chunks"],
+                resumed=outcome["resumed"],
+                processing_time=processing_time,
+            )
+
         # Collect items to process (returns IDs only)
         items = await collect_items_for_rebuild(
             input_data.mode,
@@ -784,3 +1322,227 @@ async def rebuild_embeddings_command(
             processing_time=processing_time,
             error_message=str(e),
         )
+
+
+class ConvertEmbeddingStorageInput(CommandInput):
+    # Defaults to EMBEDDING_STORAGE_FORMAT
+    format: Optional[Literal["float", "int8"]] = None
+    force: bool = False  # Quantise even if sampled recall@10 is below threshold
+
+
+class ConvertEmbeddingStorageOutput(CommandOutput):
+    success: bool
+    format: str
+    rows_converted: int = 0
+    recall_at_10: Optional[float] = None
+    # Two-stage search (embedding heads) against exact search, when enabled
+    head_recall_at_10: Optional[float] = None
+    processing_time: float
+    error_message: Optional[str] = None
+
+
+CONVERT_SAMPLE_SIZE = 2000
+CONVERT_QUERY_COUNT = 50
+_EMBEDDING_TABLES = ("source_embedding", "source_insight", "note")
+
+
+# (corpus, queries)
+RecallSample = Tuple[List[List[float]], List[List[float]]]
+
+
+async def _sample_recall_vectors() -> Optional[RecallSample]:
+    """(corpus, queries) sampled from stored chunks for recall estimates.
+
+    Sampled vectors double as queries (held out of the corpus), since real
+    queries are embedded with the same model.
+    """
+    rows = await repo_query(
+        "SELECT embedding, embedding_scale FROM source_embedding "
+        "WHERE embedding != none LIMIT $limit",
+        {"limit": CONVERT_SAMPLE_SIZE},
+    )
+    vectors = [vector for vector in map(decode_embedding, rows) if vector]
+    if len(vectors) <= CONVERT_QUERY_COUNT:
+        return None
+    # Ignore vectors left over from a previous model with other dimensions
+    dims = max({len(v) for v in vectors}, key=[len(v) for v in vectors].count)
+    vectors = [vector for vector in vectors if len(vector) == dims]
+    step = max(len(vectors) // CONVERT_QUERY_COUNT, 1)
+    query_idx = set(range(0, len(vectors), step)[:CONVERT_QUERY_COUNT])
+    queries = [vectors[idx] for idx in sorted(query_idx)]
+    corpus = [v for idx, v in enumerate(vectors) if idx not in query_idx]
+    return corpus, queries
+
+
+async def sample_int8_recall() -> Optional[float]:
+    """Recall@10 of int8 vs full precision on a sample of stored chunks."""
+    sample = await _sample_recall_vectors()
+    return int8_recall_at_k(*sample, k=10) if sample else None
+
+
+async def sample_head_recall() -> Optional[float]:
+    """Recall@10 of two-stage (embedding head) vs exact search on a sample."""
+    dims = head_dimensions()
+    sample = await _sample_recall_vectors()
+    if not dims or not sample or len(sample[0][0]) <= dims:
+        return None
+    return head_recall_at_k(*sample, dims, rerank_candidates(10), k=10)
+
+
+@command("convert_embedding_storage", app="open_notebook", retry=None)
+async def convert_embedding_storage_command(
+    input_data: ConvertEmbeddingStorageInput,
+) -> ConvertEmbeddingStorageOutput:
+    """
+    Rewrite stored embeddings into the float or int8 storage format.
+
+    Only rows not already in the target format, or whose embedding head
+    does not match EMBEDDING_HEAD_DIMENSIONS, are touched, so the command
+    can be rerun after an interruption. Quantising to int8 is refused when
+    recall@10 on a sample falls below EMBEDDING_INT8_MIN_RECALL (unless
+    force is set). Two-stage search starts using the heads once a run has
+    written them all.
+    """
+    start_time = time.time()
+    target = input_data.format or storage_format()
+    recall: Optional[float] = None
+    head_recall: Optional[float] = None
+    converted = 0
+
+    try:
+        if target not in STORAGE_FORMATS:
+            raise ValueError(f"Unknown embedding storage format: {target}")
+
+        if target == "int8":
+            recall = await sample_int8_recall()
+            threshold = min_int8_recall()
+            logger.info(f"Sampled int8 recall@10: {recall} (threshold {threshold})")
+            if recall is not None and recall < threshold and not input_data.force:
+                raise ValueError(
+                    f"int8 recall@10 {recall:.3f} is below the configured minimum "
+                    f"{threshold:.3f}; keeping float storage"
+                )
+            where = "embedding != none AND embedding_scale = none"
+        else:
+            where = "embedding_scale != none"
+
+        head_dims = head_dimensions()
+        if head_dims:
+            head_recall = await sample_head_recall()
+            logger.info(f"Sampled two-stage recall@10: {head_recall}")
+            where = (
+                f"({where}) OR (embedding != none AND "
+                "array::len(embedding) > $head_dims AND (embedding_head = none "
+                "OR array::len(embedding_head) != $head_dims))"
+            )
+        else:
+            where = f"({where}) OR embedding_head != none"
+
+        for table in _EMBEDDING_TABLES:
+            async for page in repo_scan(
+                table,
+                projection="id, embedding, embedding_scale",
+                where=where,
+                vars={"head_dims": head_dims},
+                batch_size=REBUILD_ITEM_PAGE_SIZE,
+            ):
+                rows = []
+                for row in page:
+                    vector = decode_embedding(row)
+                    if vector is not None:
+                        encoded = encode_embedding(vector, target)
+                        rows.append({"id": ensure_record_id(row["id"]), **encoded})
+                if rows:
+                    await repo_query(
+                        "FOR $row IN $rows { UPDATE $row.id SET embedding = "
+                        "$row.embedding, embedding_scale = $row.embedding_scale, "
+                        "embedding_head = $row.embedding_head RETURN NONE; }",
+                        {"rows": rows},
+                    )
+                    converted += len(rows)
+            logger.info(f"Converted {table} embeddings to {target} ({converted} rows)")
+
+        # Every row now has a head of this size: search may use the heads
+        await record_embedding_heads(head_dims)
+
+        return ConvertEmbeddingStorageOutput(
+            success=True,
+            format=target,
+            rows_converted=converted,
+            recall_at_10=recall,
+            head_recall_at_10=head_recall,
+            processing_time=time.time() - start_time,
+        )
+
+    except Exception as e:
+        logger.error(f"Embedding storage conversion failed: {e}")
+        return ConvertEmbeddingStorageOutput(
+            success=False,
+            format=target,
+            rows_converted=converted,
+            recall_at_10=recall,
+            head_recall_at_10=head_recall,
+            processing_time=time.time() - start_time,
+            error_message=str(e),
+        )
+
+
+class BuildVectorIndexInput(CommandInput):
+    # Defaults to the dimension of the configured embedding model
+    dimension: Optional[int] = None
+
+
+class BuildVectorIndexOutput(CommandOutput):
+    success: bool
+    status: str
+    dimension: Optional[int] = None
+    processing_time: float
+    error_message: Optional[str] = None
+
+
+@command("build_vector_index", app="open_notebook", retry=None)
+async def build_vector_index_command(
+    input_data: BuildVectorIndexInput,
+) -> BuildVectorIndexOutput:
+    """
+    Define the HNSW/M-tree indexes that vector_search queries with KNN.
+
+    The dimension is probed from the configured embedding model. Building is
+    refused (status "blocked") while embeddings of another dimension remain;
+    search keeps using fn::vector_search until the index is ready. With
+    VECTOR_SEARCH_BACKEND=local, the local index snapshot is built instead.
+    """
+    start_time = time.time()
+    dimension = input_data.dimension
+    status = "failed"
+
+    try:
+        if dimension is None:
+            if not await model_manager.get_embedding_model():
+                raise ValueError("No embedding model configured")
+            probe = await generate_embeddings(["dimension probe"])
+            dimension = len(probe[0])
+
+        state = await build_vector_index(dimension)
+        status = state.status
+        return BuildVectorIndexOutput(
+            success=status in ("ready", "missing"),
+            status=status,
+            dimension=dimension,
+            processing_time=time.time() - start_time,
+        )
+
+    except Exception as e:
+        logger.error(f"Building vector index failed: {e}")
+        return BuildVectorIndexOutput(
+            success=False,
+            status="failed",
+            dimension=dimension,
+            processing_time=time.time() - start_time,
+            error_message=str(e),
+        )
+    finally:
+        # A blocked build stays deduplicated until VECTOR_INDEX_BUILD_TIMEOUT:
+        # retrying it on every embedding write would fail the same way
+        if dimension is not None and status != "blocked":
+            vector_index_build_finished(dimension)
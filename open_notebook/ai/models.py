@@ -1,4 +1,6 @@
-from typing import Any, ClassVar, Dict, Optional, Union
+import os
+import time
+from typing import Any, ClassVar, Dict, Optional, Tuple, Union
 
 from esperanto import (
     AIFactory,
@@ -14,9 +16,32 @@ from open_notebook.domain.base import ObjectModel, RecordModel
 
 ModelType = Union[LanguageModel, EmbeddingModel, SpeechToTextModel, TextToSpeechModel]
 
+# Resolved models keyed by (model id, kwargs), shared by all ModelManager
+# instances. Entries are dropped whenever a model, credential or the defaults
+# change in this process; the TTL covers changes made by other processes.
+_resolved_models: Dict[Tuple[str, str], Tuple[float, ModelType]] = {}
+_cached_defaults: Optional[Tuple[float, "DefaultModels"]] = None
+
+
+def _model_cache_ttl() -> float:
+    value = os.getenv("MODEL_CACHE_TTL", "60")
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Invalid MODEL_CACHE_TTL value: '{value}'. Using default: 60")
+        return 60.0
+
+
+def invalidate_model_cache() -> None:
+    """Forget resolved models and defaults so the next lookup reads the database."""
+    global _cached_defaults
+    _resolved_models.clear()
+    _cached_defaults = None
+
 
 class Model(ObjectModel):
     table_name: ClassVar[str] = "model"
+    cache_enabled: ClassVar[bool] = True
     nullable_fields: ClassVar[set[str]] = {"credential"}
     name: str
     provider: str
@@ -45,6 +70,16 @@ class Model(ObjectModel):
             data["credential"] = ensure_record_id(data["credential"])
         return data
 
+    async def save(self) -> None:
+        await super().save()
+        invalidate_model_cache()
+
+    async def delete(self) -> bool:
+        try:
+            return await super().delete()
+        finally:
+            invalidate_model_cache()
+
     async def get_credential_obj(self):
         """Get the Credential object linked to this model, if any."""
         if not self.credential:
@@ -93,16 +128,35 @@ class DefaultModels(RecordModel):
         super(RecordModel, instance).__init__(**data)
         return instance
 
+    async def update(self):
+        try:
+            return await super().update()
+        finally:
+            invalidate_model_cache()
+
 
 class ModelManager:
     def __init__(self):
-        pass  # No caching needed
+        pass  # Resolved models are cached at module level
 
     async def get_model(self, model_id: str, **kwargs) -> Optional[ModelType]:
-        """Get a model by ID. Esperanto will cache the actual model instance."""
+        """Get a model by ID, reusing the resolved instance while it is fresh."""
         if not model_id:
             return None
 
+        key = (str(model_id), repr(sorted(kwargs.items())))
+        cached = _resolved_models.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+
+        resolved = await self._resolve_model(model_id, **kwargs)
+        ttl = _model_cache_ttl()
+        if resolved is not None and ttl > 0:
+            _resolved_models[key] = (time.monotonic() + ttl, resolved)
+        return resolved
+
+    async def _resolve_model(self, model_id: str, **kwargs) -> Optional[ModelType]:
+        """Load the model and its credential and build the Esperanto instance."""
         try:
             model: Model = await Model.get(model_id)
         except Exception:
@@ -175,10 +229,16 @@ class ModelManager:
             raise ValueError(f"Invalid model type: {model.type}")
 
     async def get_defaults(self) -> DefaultModels:
-        """Get the default models configuration from database"""
+        """Get the default models configuration (cached for MODEL_CACHE_TTL)"""
+        global _cached_defaults
+        if _cached_defaults and _cached_defaults[0] > time.monotonic():
+            return _cached_defaults[1]
         defaults = await DefaultModels.get_instance()
         if not defaults:
             raise RuntimeError("Failed to load default models configuration")
+        ttl = _model_cache_ttl()
+        if ttl > 0:
+            _cached_defaults = (time.monotonic() + ttl, defaults)
         return defaults
 
     async def get_speech_to_text(self, **kwargs) -> Optional[SpeechToTextModel]:
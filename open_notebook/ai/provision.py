@@ -4,7 +4,7 @@ from loguru import logger
 
 from open_notebook.ai.models import model_manager
 from open_notebook.config import LARGE_CONTEXT_TOKEN_THRESHOLD
-from open_notebook.utils import token_count
+from open_notebook.utils import token_counter
 
 
 async def provision_langchain_model(
@@ -16,14 +16,15 @@ async def provision_langchain_model(
     If model_id is specified in Config, returns that model
     Otherwise, returns the default model for the given type
     """
-    tokens = token_count(content)
     model = None
     selection_reason = ""
 
-    if tokens > LARGE_CONTEXT_TOKEN_THRESHOLD:
-        selection_reason = f"large_context (content has {tokens} tokens)"
+    # Only content near the threshold is actually tokenized
+    if token_counter.exceeds(content, LARGE_CONTEXT_TOKEN_THRESHOLD):
+        tokens = token_counter.estimate(content)
+        selection_reason = f"large_context (content has ~{tokens} tokens)"
         logger.debug(
-            f"Using large context model because the content has {tokens} tokens"
+            f"Using large context model because the content has ~{tokens} tokens"
         )
         model = await model_manager.get_default_model("large_context", **kwargs)
     elif model_id:
@@ -8,6 +8,12 @@ sqlite_folder = f"{DATA_FOLDER}/sqlite-db"
 os.makedirs(sqlite_folder, exist_ok=True)
 LANGGRAPH_CHECKPOINT_FILE = f"{sqlite_folder}/checkpoints.sqlite"
 
+# EMBEDDING CACHE FILE
+EMBEDDING_CACHE_FILE = f"{sqlite_folder}/embedding-cache.sqlite"
+
+# LOCAL VECTOR INDEX FOLDER (created on first use)
+VECTOR_INDEX_FOLDER = f"{DATA_FOLDER}/vector-index"
+
 # UPLOADS FOLDER
 UPLOADS_FOLDER = f"{DATA_FOLDER}/uploads"
 os.makedirs(UPLOADS_FOLDER, exist_ok=True)
@@ -15,11 +15,37 @@ from .repository import (
     repo_delete,
     repo_insert,
     repo_query,
+    repo_query_many,
+    repo_scan,
     repo_relate,
     repo_update,
     repo_upsert,
 )
 
+# Connection pooling
+from .pool import (
+    ConnectionPool,
+    PoolConfig,
+    PoolTimeoutError,
+    close_connection_pools,
+    get_connection_pool,
+    get_pool_stats,
+)
+
+# Query instrumentation
+from .instrumentation import QueryMetrics, get_query_metrics, render_prometheus
+
+# Chunked bulk inserts
+from .bulk import BulkWriter, BulkWriteStats, repo_insert_bulk
+
+# Per-table write coalescing
+from .write_coalescer import (
+    WriteCoalescer,
+    coalesced_create,
+    coalesced_merge,
+    get_write_coalescer,
+)
+
 # Unified repository (multi-backend)
 from .unified_repository import (
     BackendAdapter,
@@ -85,7 +111,33 @@ __all__ = [
     "ensure_record_id",
     "parse_record_ids",
     "repo_query",
+    "repo_query_many",
+    "repo_scan",
     "repo_relate",
+
+    # Connection pooling
+    "ConnectionPool",
+    "PoolConfig",
+    "PoolTimeoutError",
+    "close_connection_pools",
+    "get_connection_pool",
+    "get_pool_stats",
+
+    # Query instrumentation
+    "QueryMetrics",
+    "get_query_metrics",
+    "render_prometheus",
+
+    # Chunked bulk inserts
+    "BulkWriter",
+    "BulkWriteStats",
+    "repo_insert_bulk",
+
+    # Per-table write coalescing
+    "WriteCoalescer",
+    "coalesced_create",
+    "coalesced_merge",
+    "get_write_coalescer",
     
     # Repository with events (Phase 2 - recommended)
     "repo_create",
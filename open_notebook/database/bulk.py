@@ -0,0 +1,168 @@
+"""Chunked bulk inserts for SurrealDB.
+
+``repo_insert`` sends all rows in one websocket message. For embedding rows
+(thousands of chunks, each with a full vector) that message can reach tens of
+megabytes, which times out or spikes memory on both client and server.
+
+``BulkWriter`` splits rows into batches bounded by row count and estimated
+payload size. Each batch is written in its own transaction, and created rows
+are not echoed back. Only a batch that hits a transaction conflict is
+retried. Batches can be pipelined over several pooled connections.
+
+Environment Variables:
+    SURREAL_BULK_MAX_ROWS: Maximum rows per batch (default: 500)
+    SURREAL_BULK_MAX_BYTES: Approximate maximum payload bytes per batch (default: 4194304)
+    SURREAL_BULK_CONCURRENCY: Batches written in parallel (default: 2)
+    SURREAL_BULK_MAX_RETRIES: Attempts per batch on transaction conflicts (default: 5)
+"""
+
+import asyncio
+import random
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from open_notebook.database.instrumentation import estimate_payload_size
+from open_notebook.database.repository import repo_query_many
+from open_notebook.utils.env import env_int
+
+
+def is_transaction_conflict(error: BaseException) -> bool:
+    """Whether an error is a retriable SurrealDB transaction conflict."""
+    message = str(error).lower()
+    return "conflict" in message or "can be retried" in message
+
+
+@dataclass
+class BulkWriteStats:
+    """Outcome of a bulk write."""
+
+    table: str
+    rows: int = 0
+    batches: int = 0
+    retries: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["rows_per_sec"] = round(self.rows_per_sec, 1)
+        return data
+
+
+class BulkWriter:
+    """Insert many rows into one table in bounded, transactional batches."""
+
+    def __init__(
+        self,
+        table: str,
+        max_rows: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+    ):
+        self.table = table
+        self.max_rows = max_rows or env_int("SURREAL_BULK_MAX_ROWS", 500, minimum=1)
+        self.max_bytes = max_bytes or env_int(
+            "SURREAL_BULK_MAX_BYTES", 4 * 1024 * 1024, minimum=1
+        )
+        self.concurrency = concurrency or env_int(
+            "SURREAL_BULK_CONCURRENCY", 2, minimum=1
+        )
+        self.max_retries = max_retries or env_int(
+            "SURREAL_BULK_MAX_RETRIES", 5, minimum=1
+        )
+
+    def split(self, rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Split rows into batches within the row and byte limits.
+
+        A single row larger than max_bytes still gets a batch of its own.
+        """
+        batches: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_bytes = 0
+        for row in rows:
+            size = estimate_payload_size(row)
+            if current and (
+                len(current) >= self.max_rows or current_bytes + size > self.max_bytes
+            ):
+                batches.append(current)
+                current, current_bytes = [], 0
+            current.append(row)
+            current_bytes += size
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _write_batch(
+        self, batch: List[Dict[str, Any]], stats: BulkWriteStats
+    ) -> None:
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await repo_query_many(
+                    [(f"INSERT INTO {self.table} $rows RETURN NONE", {"rows": batch})],
+                    transaction=True,
+                )
+                return
+            except RuntimeError as e:
+                if not is_transaction_conflict(e) or attempt == self.max_retries:
+                    raise
+                stats.retries += 1
+                delay = min(0.1 * 2 ** (attempt - 1), 2.0) * (0.5 + random.random())
+                logger.debug(
+                    f"Conflict writing {len(batch)} rows to {self.table} "
+                    f"(attempt {attempt}/{self.max_retries}), retrying in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def write(self, rows: List[Dict[str, Any]]) -> BulkWriteStats:
+        """Insert all rows and return throughput statistics.
+
+        If any batch fails, the error is raised once every in-flight batch has
+        settled. Batches that already committed stay written, so callers
+        should make the write idempotent (e.g. delete-then-insert).
+        """
+        stats = BulkWriteStats(table=self.table)
+        if not rows:
+            return stats
+
+        start = time.perf_counter()
+        batches = self.split(rows)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def run(batch: List[Dict[str, Any]]) -> None:
+            async with semaphore:
+                await self._write_batch(batch, stats)
+                stats.rows += len(batch)
+                stats.batches += 1
+
+        outcomes = await asyncio.gather(
+            *(run(batch) for batch in batches), return_exceptions=True
+        )
+        stats.elapsed = time.perf_counter() - start
+        errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+        if errors:
+            logger.error(
+                f"Bulk insert into {self.table} failed: {len(errors)}/{len(batches)} "
+                f"batches errored, {stats.rows}/{len(rows)} rows written"
+            )
+            raise errors[0]
+
+        logger.info(
+            f"Bulk inserted {stats.rows} rows into {self.table} in {stats.batches} "
+            f"batches ({stats.elapsed:.2f}s, {stats.rows_per_sec:.0f} rows/s, "
+            f"{stats.retries} retries)"
+        )
+        return stats
+
+
+async def repo_insert_bulk(
+    table: str, rows: List[Dict[str, Any]], **options: Any
+) -> BulkWriteStats:
+    """Insert rows in chunked transactional batches (see ``BulkWriter``)."""
+    return await BulkWriter(table, **options).write(rows)
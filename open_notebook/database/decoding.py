@@ -0,0 +1,93 @@
+"""
+Decoding of SurrealDB query results.
+
+The driver hands back plain dicts and lists with ``RecordID`` objects for
+record links. The rest of the codebase expects those links as ``table:id``
+strings. A naive recursive rebuild of every container is expensive for
+embedding-heavy rows: each ``embedding`` array holds 768-3072 floats and
+would cost one Python call per element.
+
+The decoder here converts RecordIDs in place and skips work it can prove
+is unnecessary:
+
+- numeric arrays (embeddings) are passed through without being walked;
+- for rows whose ``id`` belongs to a known table, fields that the schema
+  declares as scalar or numeric payloads are never inspected.
+
+Result containers are freshly decoded by the driver and owned by the
+caller, so mutating them in place is safe and avoids reallocating every
+dict and list.
+"""
+
+from typing import Any, Dict, FrozenSet
+
+from surrealdb import RecordID  # type: ignore
+
+# Fields that can never hold a RecordID, keyed by table. Projections may
+# alias columns (e.g. ``source.id AS id``), so this list only names fields
+# whose type is the same wherever the name appears in that table's results.
+PASSTHROUGH_FIELDS: Dict[str, FrozenSet[str]] = {
+    "source": frozenset({"full_text", "title", "topics"}),
+    "source_embedding": frozenset({"embedding", "content", "order"}),
+    "source_insight": frozenset({"embedding", "content", "insight_type"}),
+    "note": frozenset({"embedding", "content", "title", "note_type"}),
+    "notebook": frozenset({"name", "description"}),
+}
+
+_EMPTY: FrozenSet[str] = frozenset()
+_NUMBERS = (float, int)
+
+
+def _is_numeric_array(value: list) -> bool:
+    # Arrays are homogeneous in practice: checking the ends is enough to
+    # recognise an embedding without scanning it.
+    return type(value[0]) in _NUMBERS and type(value[-1]) in _NUMBERS
+
+
+def _decode_list(items: list) -> None:
+    if not items or _is_numeric_array(items):
+        return
+    for index, value in enumerate(items):
+        kind = type(value)
+        if kind is RecordID:
+            items[index] = str(value)
+        elif kind is dict:
+            _decode_dict(value)
+        elif kind is list:
+            _decode_list(value)
+
+
+def _decode_dict(row: dict) -> None:
+    record_id = row.get("id")
+    skip = (
+        PASSTHROUGH_FIELDS.get(record_id.table_name, _EMPTY)
+        if type(record_id) is RecordID
+        else _EMPTY
+    )
+    for key, value in row.items():
+        if key in skip:
+            continue
+        kind = type(value)
+        if kind is RecordID:
+            row[key] = str(value)
+        elif kind is dict:
+            _decode_dict(value)
+        elif kind is list:
+            _decode_list(value)
+
+
+def decode_result(obj: Any) -> Any:
+    """Convert RecordIDs in a query result to strings, in place.
+
+    Returns the (same) decoded object so it can be used as an expression.
+    """
+    kind = type(obj)
+    if kind is RecordID:
+        return str(obj)
+    if kind is dict:
+        _decode_dict(obj)
+    elif kind is list:
+        _decode_list(obj)
+    elif isinstance(obj, RecordID):
+        return str(obj)
+    return obj
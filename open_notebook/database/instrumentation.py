@@ -0,0 +1,377 @@
+"""Query instrumentation for the SurrealDB repository layer.
+
+Every repository call is recorded under a normalised statement fingerprint,
+with literals, numbers and record ids replaced by ``?``. Each fingerprint
+collects:
+
+- a latency histogram;
+- row counts;
+- estimated request and response payload sizes;
+- error counts.
+
+Statements slower than a threshold are logged with their fingerprint and
+parameter names. Parameter values are never logged. The collected metrics
+can be rendered in the Prometheus text exposition format
+(see ``/api/metrics``).
+
+Environment Variables:
+    SURREAL_QUERY_METRICS_ENABLED: Set to "false" to disable collection (default: true)
+    SURREAL_SLOW_QUERY_MS: Log statements slower than this many ms; 0 disables (default: 500)
+    SURREAL_QUERY_METRICS_MAX_FINGERPRINTS: Distinct fingerprints tracked before
+        new ones are grouped under "other" (default: 500)
+"""
+
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+# Prometheus client default buckets (seconds)
+LATENCY_BUCKETS: Tuple[float, ...] = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+OVERFLOW_FINGERPRINT = "other"
+
+# Rough CBOR sizes used for payload estimates
+_NUMBER_BYTES = 9
+_CONTAINER_OVERHEAD = 5
+
+
+def estimate_payload_size(value: Any) -> int:
+    """Approximate the encoded size of a value without serialising it."""
+    kind = type(value)
+    if kind is str:
+        return len(value) + _CONTAINER_OVERHEAD
+    if kind in (int, float, bool) or value is None:
+        return _NUMBER_BYTES
+    if kind is list or kind is tuple:
+        if value and type(value[0]) in (int, float):
+            return _CONTAINER_OVERHEAD + _NUMBER_BYTES * len(value)
+        return _CONTAINER_OVERHEAD + sum(estimate_payload_size(v) for v in value)
+    if kind is dict:
+        return _CONTAINER_OVERHEAD + sum(
+            len(str(k)) + estimate_payload_size(v) for k, v in value.items()
+        )
+    return len(str(value)) + _CONTAINER_OVERHEAD
+
+
+def metrics_enabled() -> bool:
+    return os.getenv("SURREAL_QUERY_METRICS_ENABLED", "true").lower() not in (
+        "false",
+        "0",
+        "no",
+    )
+
+
+def _slow_query_threshold() -> float:
+    value = os.getenv("SURREAL_SLOW_QUERY_MS")
+    if not value:
+        return 0.5
+    try:
+        return float(value) / 1000
+    except ValueError:
+        logger.warning(f"Invalid SURREAL_SLOW_QUERY_MS value: '{value}'. Using 500")
+        return 0.5
+
+
+def _max_fingerprints() -> int:
+    value = os.getenv("SURREAL_QUERY_METRICS_MAX_FINGERPRINTS")
+    try:
+        return max(int(value), 1) if value else 500
+    except ValueError:
+        return 500
+
+
+_COMMENT = re.compile(r"--[^\n]*|/\*.*?\*/", re.DOTALL)
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_RECORD_ID = re.compile(r"\b([A-Za-z_][A-Za-z0-9_]*):(?:⟨[^⟩]*⟩|`[^`]*`|[A-Za-z0-9_]+)")
+_NUMBER = re.compile(r"(?<![\w$])-?\d+(?:\.\d+)?(?:e-?\d+)?\b", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(query: str) -> str:
+    """Normalise a statement so executions with different literals group together."""
+    text = _COMMENT.sub(" ", query)
+    text = _STRING.sub("?", text)
+    text = _RECORD_ID.sub(r"\1:?", text)
+    text = _NUMBER.sub("?", text)
+    text = _WHITESPACE.sub(" ", text).strip().rstrip(";").strip()
+    return text
+
+
+@dataclass
+class StatementMetrics:
+    """Counters for one (operation, fingerprint) pair."""
+
+    count: int = 0
+    errors: int = 0
+    duration_total: float = 0.0
+    duration_max: float = 0.0
+    rows_total: int = 0
+    request_bytes_total: int = 0
+    response_bytes_total: int = 0
+    bucket_counts: List[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+
+    def observe(
+        self,
+        duration: float,
+        rows: int,
+        request_bytes: int,
+        response_bytes: int,
+        error: bool,
+    ) -> None:
+        self.count += 1
+        self.duration_total += duration
+        self.duration_max = max(self.duration_max, duration)
+        self.rows_total += rows
+        self.request_bytes_total += request_bytes
+        self.response_bytes_total += response_bytes
+        if error:
+            self.errors += 1
+        for index, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                self.bucket_counts[index] += 1
+                break
+
+
+class QueryMetrics:
+    """Process-wide registry of statement metrics."""
+
+    def __init__(self, max_fingerprints: Optional[int] = None):
+        self.max_fingerprints = max_fingerprints or _max_fingerprints()
+        self._statements: Dict[Tuple[str, str], StatementMetrics] = {}
+        # Updated from worker threads running their own event loops too
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        operation: str,
+        statement: str,
+        duration: float,
+        rows: int = 0,
+        request_bytes: int = 0,
+        response_bytes: int = 0,
+        error: bool = False,
+    ) -> None:
+        key = (operation, statement)
+        with self._lock:
+            metrics = self._statements.get(key)
+            if metrics is None:
+                if len(self._statements) >= self.max_fingerprints:
+                    key = (operation, OVERFLOW_FINGERPRINT)
+                metrics = self._statements.setdefault(key, StatementMetrics())
+            metrics.observe(duration, rows, request_bytes, response_bytes, error)
+
+    def snapshot(self) -> Dict[Tuple[str, str], StatementMetrics]:
+        with self._lock:
+            return {
+                key: StatementMetrics(
+                    count=m.count,
+                    errors=m.errors,
+                    duration_total=m.duration_total,
+                    duration_max=m.duration_max,
+                    rows_total=m.rows_total,
+                    request_bytes_total=m.request_bytes_total,
+                    response_bytes_total=m.response_bytes_total,
+                    bucket_counts=list(m.bucket_counts),
+                )
+                for key, m in self._statements.items()
+            }
+
+    def top(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Statements ordered by total time spent, heaviest first."""
+        rows = [
+            {
+                "operation": operation,
+                "fingerprint": statement,
+                "count": m.count,
+                "errors": m.errors,
+                "total_seconds": round(m.duration_total, 6),
+                "avg_seconds": round(m.duration_total / m.count, 6) if m.count else 0,
+                "max_seconds": round(m.duration_max, 6),
+                "rows": m.rows_total,
+                "request_bytes": m.request_bytes_total,
+                "response_bytes": m.response_bytes_total,
+            }
+            for (operation, statement), m in self.snapshot().items()
+        ]
+        rows.sort(key=lambda row: row["total_seconds"], reverse=True)
+        return rows[:limit]
+
+    def reset(self) -> None:
+        with self._lock:
+            self._statements.clear()
+
+
+_metrics = QueryMetrics()
+
+
+def get_query_metrics() -> QueryMetrics:
+    return _metrics
+
+
+def _count_rows(result: Any) -> int:
+    if isinstance(result, list):
+        return len(result)
+    return 0 if result is None else 1
+
+
+class track_query:
+    """Time one repository call and record it on exit.
+
+    Usage::
+
+        with track_query("query", query_str, vars) as tracked:
+            tracked.result = await connection.query(query_str, vars)
+
+    Errors are counted and re-raised. Set ``result`` before leaving the
+    block so rows and response size can be recorded.
+    """
+
+    __slots__ = ("operation", "query", "vars", "result", "_start", "_enabled")
+
+    def __init__(self, operation: str, query: str, vars: Optional[Any] = None):
+        self.operation = operation
+        self.query = query
+        self.vars = vars
+        self.result: Any = None
+        self._enabled = metrics_enabled()
+        self._start = 0.0
+
+    def __enter__(self) -> "track_query":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if not self._enabled:
+            return
+        duration = time.perf_counter() - self._start
+        error = exc_type is not None or isinstance(self.result, str)
+        statement = fingerprint(self.query)
+        rows = 0 if error else _count_rows(self.result)
+        _metrics.observe(
+            self.operation,
+            statement,
+            duration,
+            rows=rows,
+            request_bytes=estimate_payload_size(self.vars) if self.vars else 0,
+            response_bytes=0 if error else estimate_payload_size(self.result),
+            error=error,
+        )
+        threshold = _slow_query_threshold()
+        if threshold > 0 and duration >= threshold:
+            params = ", ".join(sorted(self.vars)) if isinstance(self.vars, dict) else ""
+            logger.warning(
+                f"Slow {self.operation} ({duration * 1000:.0f} ms, {rows} rows): "
+                f"{statement[:500]}" + (f" [params: {params}]" if params else "")
+            )
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def render_prometheus(pool_stats: Optional[Dict[str, Dict[str, Any]]] = None) -> str:
+    """Render query (and optionally pool) metrics in Prometheus text format."""
+    snapshot = _metrics.snapshot()
+    lines: List[str] = []
+
+    def labels(operation: str, statement: str, extra: str = "") -> str:
+        base = (
+            f'operation="{_escape_label(operation)}",'
+            f'fingerprint="{_escape_label(statement)}"'
+        )
+        return "{" + base + (f",{extra}" if extra else "") + "}"
+
+    lines.append(
+        "# HELP open_notebook_db_query_duration_seconds SurrealDB statement latency"
+    )
+    lines.append("# TYPE open_notebook_db_query_duration_seconds histogram")
+    for (operation, statement), m in snapshot.items():
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS, m.bucket_counts):
+            cumulative += count
+            bucket = labels(operation, statement, 'le="%s"' % bound)
+            lines.append(
+                f"open_notebook_db_query_duration_seconds_bucket{bucket} {cumulative}"
+            )
+        bucket = labels(operation, statement, 'le="+Inf"')
+        lines.append(
+            f"open_notebook_db_query_duration_seconds_bucket{bucket} {m.count}"
+        )
+        lines.append(
+            "open_notebook_db_query_duration_seconds_sum"
+            f"{labels(operation, statement)} {m.duration_total}"
+        )
+        lines.append(
+            "open_notebook_db_query_duration_seconds_count"
+            f"{labels(operation, statement)} {m.count}"
+        )
+
+    counters = (
+        ("open_notebook_db_query_errors_total", "Failed statements", "errors"),
+        ("open_notebook_db_query_rows_total", "Rows returned", "rows_total"),
+        (
+            "open_notebook_db_query_request_bytes_total",
+            "Estimated request payload bytes",
+            "request_bytes_total",
+        ),
+        (
+            "open_notebook_db_query_response_bytes_total",
+            "Estimated response payload bytes",
+            "response_bytes_total",
+        ),
+    )
+    for name, help_text, attribute in counters:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for (operation, statement), m in snapshot.items():
+            lines.append(
+                f"{name}{labels(operation, statement)} {getattr(m, attribute)}"
+            )
+
+    if pool_stats:
+        gauges = ("in_use", "idle")
+        counters_pool = (
+            "checkouts",
+            "connections_opened",
+            "connections_closed",
+            "health_check_failures",
+            "discarded",
+            "acquire_timeouts",
+        )
+        for stat in gauges:
+            name = f"open_notebook_db_pool_{stat}"
+            lines.append(f"# TYPE {name} gauge")
+            for pool, stats in pool_stats.items():
+                lines.append(f'{name}{{pool="{_escape_label(pool)}"}} {stats[stat]}')
+        for stat in counters_pool:
+            name = f"open_notebook_db_pool_{stat}_total"
+            lines.append(f"# TYPE {name} counter")
+            for pool, stats in pool_stats.items():
+                lines.append(f'{name}{{pool="{_escape_label(pool)}"}} {stats[stat]}')
+        name = "open_notebook_db_pool_wait_seconds_total"
+        lines.append(f"# TYPE {name} counter")
+        for pool, stats in pool_stats.items():
+            lines.append(
+                f'{name}{{pool="{_escape_label(pool)}"}} {stats["wait_time_total"]}'
+            )
+
+    return "\n".join(lines) + "\n"
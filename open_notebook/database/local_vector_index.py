@@ -0,0 +1,809 @@
+"""
+In-process vector index, an alternative backend for vector search.
+
+With VECTOR_SEARCH_BACKEND=local, vector_search ranks chunks, insights and
+notes inside the Python process and only asks SurrealDB for the titles and
+text of the hits, in one batched query. Search latency then no longer
+depends on database scans or on SurrealDB's vector indexes.
+
+The index lives in VECTOR_LOCAL_PATH, shared by the API and the worker:
+
+- A snapshot: normalised vectors in a raw float32 file that is
+  memory-mapped on load, their record ids, and an HNSW graph over them
+  when hnswlib is installed. Startup maps the snapshot instead of
+  rebuilding anything.
+- A SQLite journal (WAL mode) of changes made after the snapshot. The
+  embedding commands append the vectors they store and the rows they
+  delete. Deleted sources and notes arrive as SyncHookRegistry events.
+  Each process replays new journal entries before it searches, and keeps
+  them in memory next to the snapshot.
+
+Once the journal holds more than VECTOR_LOCAL_COMPACT_EVERY entries (or a
+tenth of the snapshot), the process that wrote them folds them into a new
+snapshot. The build_vector_index command builds the snapshot from the
+database. Until a snapshot for the current embedding dimension exists,
+vector_search keeps using SurrealDB.
+
+Without hnswlib, snapshots are searched exactly with a NumPy matrix-vector
+product over the memory-mapped vectors. With EMBEDDING_HEAD_DIMENSIONS set,
+snapshots also hold int8 heads (the first N components of each vector) and
+exact searches run in two stages: the heads pick the
+VECTOR_SEARCH_RERANK_CANDIDATES best rows, which are then re-scored with
+their full vectors. Only those rows are read from the full matrix.
+
+Environment Variables:
+    VECTOR_SEARCH_BACKEND: "local" enables this backend (default: "surreal")
+    VECTOR_LOCAL_PATH: Index directory (default: <DATA_FOLDER>/vector-index)
+    VECTOR_LOCAL_COMPACT_EVERY: Journal entries that trigger a new snapshot (default: 20000)
+    VECTOR_INDEX_EF, VECTOR_INDEX_EFC, VECTOR_INDEX_M: HNSW parameters, as for
+        SurrealDB indexes (see vector_index.py)
+    EMBEDDING_HEAD_DIMENSIONS, VECTOR_SEARCH_RERANK_CANDIDATES: Two-stage
+        search (see embedding_storage.py and vector_index.py)
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from loguru import logger
+
+from open_notebook.config import VECTOR_INDEX_FOLDER
+from open_notebook.database.repository import (
+    ensure_record_id,
+    repo_query_many,
+    repo_scan,
+)
+from open_notebook.database.sync_hooks import (
+    SyncEvent,
+    SyncEventType,
+    get_sync_registry,
+)
+from open_notebook.database.vector_index import (
+    SEARCH_PROJECTIONS,
+    VECTOR_INDEXES,
+    merge_search_results,
+    rerank_candidates,
+    vector_search_backend,
+)
+from open_notebook.utils.embedding_storage import decode_embedding, head_dimensions
+from open_notebook.utils.env import env_int
+
+try:
+    import hnswlib  # type: ignore
+except ImportError:  # Optional: pip install open-notebook[ann]
+    hnswlib = None
+
+KINDS: Tuple[str, ...] = tuple(VECTOR_INDEXES)
+
+# Rows per database page while building a snapshot
+_BUILD_PAGE_SIZE = 1000
+# Heads converted to float32 at a time while scoring them
+_HEAD_BLOCK_ROWS = 65536
+_LEASE_SECONDS = 1800  # Renewed while a build pages through the database
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    op TEXT NOT NULL,
+    key TEXT,
+    kind TEXT,
+    parent TEXT,
+    dims INTEGER,
+    vector BLOB
+);
+CREATE TABLE IF NOT EXISTS meta (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+# (key, kind, parent, vector) of one stored embedding
+VectorRow = Tuple[str, str, str, Sequence[float]]
+
+
+def _normalise(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _quantise_heads(vectors: np.ndarray, dims: int) -> Tuple[np.ndarray, np.ndarray]:
+    """int8 heads of normalised vectors and the factor turning dot into cosine.
+
+    ``(heads @ query_head) * factors`` is the cosine similarity of each head
+    with a normalised query head, up to quantisation error.
+    """
+    heads = vectors[:, :dims]
+    peaks = np.max(np.abs(heads), axis=1)
+    scales = np.where(peaks == 0, 1, peaks / 127).astype(np.float32)
+    norms = np.linalg.norm(heads, axis=1)
+    factors = np.where(norms == 0, 0, scales / np.where(norms == 0, 1, norms))
+    return np.rint(heads / scales[:, None]).astype(np.int8), factors.astype(np.float32)
+
+
+class _SnapshotWriter:
+    """Streams normalised vectors (and their heads) into a new snapshot."""
+
+    def __init__(self, directory: str, dimension: int):
+        self.directory = directory
+        self.dimension = dimension
+        self.name = f"snapshot-{time.time_ns()}"
+        self.keys: List[str] = []
+        self.kinds: List[str] = []
+        self.parents: List[str] = []
+        self._file = open(os.path.join(directory, f"{self.name}.f32"), "wb")
+        self.head_dimension = head_dimensions()
+        if not 0 < self.head_dimension < dimension:
+            self.head_dimension = 0
+        self._head_files = None
+        if self.head_dimension:
+            self._head_files = (
+                open(os.path.join(directory, f"{self.name}.h8"), "wb"),
+                open(os.path.join(directory, f"{self.name}.hf"), "wb"),
+            )
+
+    def add(
+        self,
+        keys: Sequence[str],
+        kinds: Sequence[str],
+        parents: Sequence[str],
+        vectors: np.ndarray,
+    ) -> None:
+        if not len(keys):
+            return
+        normalised = _normalise(vectors)
+        self._file.write(normalised.tobytes())
+        if self._head_files:
+            heads, factors = _quantise_heads(normalised, self.head_dimension)
+            self._head_files[0].write(heads.tobytes())
+            self._head_files[1].write(factors.tobytes())
+        self.keys.extend(keys)
+        self.kinds.extend(kinds)
+        self.parents.extend(parents)
+
+    def _close(self) -> None:
+        self._file.close()
+        for file in self._head_files or ():
+            file.close()
+
+    def finish(self, seq: int) -> Dict[str, Any]:
+        self._close()
+        count = len(self.keys)
+        if hnswlib is not None and count:
+            matrix = np.memmap(
+                os.path.join(self.directory, f"{self.name}.f32"),
+                dtype=np.float32,
+                mode="r",
+                shape=(count, self.dimension),
+            )
+            graph = hnswlib.Index(space="cosine", dim=self.dimension)
+            graph.init_index(
+                max_elements=count,
+                ef_construction=env_int("VECTOR_INDEX_EFC", 150, minimum=1),
+                M=env_int("VECTOR_INDEX_M", 12, minimum=2),
+            )
+            for start in range(0, count, 50_000):
+                block = np.asarray(matrix[start : start + 50_000])
+                graph.add_items(block, np.arange(start, start + len(block)))
+            graph.save_index(os.path.join(self.directory, f"{self.name}.hnsw"))
+        with open(os.path.join(self.directory, f"{self.name}.json"), "w") as f:
+            json.dump(
+                {"keys": self.keys, "kinds": self.kinds, "parents": self.parents}, f
+            )
+        return {
+            "name": self.name,
+            "seq": seq,
+            "count": count,
+            "dimension": self.dimension,
+            "head_dimension": self.head_dimension,
+        }
+
+    def abort(self) -> None:
+        self._close()
+        for extension in ("f32", "h8", "hf"):
+            path = os.path.join(self.directory, f"{self.name}.{extension}")
+            if os.path.exists(path):
+                os.unlink(path)
+
+
+class LocalVectorIndex:
+    """Memory-mapped snapshot plus replayed journal, searchable in-process."""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("VECTOR_LOCAL_PATH") or VECTOR_INDEX_FOLDER
+        self.dimension: Optional[int] = None
+        self.complete = False
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.RLock()
+        self._compacting = threading.Event()
+        # Loaded snapshot
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._heads: Optional[np.ndarray] = None
+        self._head_factors: Optional[np.ndarray] = None
+        self._graph: Any = None
+        self._keys: List[str] = []
+        self._kinds = np.zeros(0, dtype=np.int8)
+        self._rows: Dict[str, int] = {}
+        self._rows_by_parent: Dict[str, List[int]] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        # Journal entries replayed on top of it: key -> (kind, parent, vector)
+        self._applied = 0
+        self._delta: Dict[str, Tuple[str, str, np.ndarray]] = {}
+        self._registry: Any = None
+
+    # -- storage -----------------------------------------------------------
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(self.path, exist_ok=True)
+            conn = sqlite3.connect(
+                os.path.join(self.path, "journal.sqlite"),
+                timeout=30,
+                check_same_thread=False,
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _meta(self) -> Dict[str, str]:
+        rows = self._connection().execute("SELECT name, value FROM meta").fetchall()
+        return dict(rows)
+
+    def _set_meta(self, conn: sqlite3.Connection, **values: Any) -> None:
+        conn.executemany(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+            [(name, str(value)) for name, value in values.items()],
+        )
+
+    def _acquire_lease(self) -> bool:
+        """Cross-process lock for writing snapshots, expiring after a while."""
+        conn = self._connection()
+        with self._lock:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT value FROM meta WHERE name = 'lease'"
+                ).fetchone()
+                if row and float(row[0]) > time.time():
+                    conn.rollback()
+                    return False
+                self._set_meta(conn, lease=time.time() + _LEASE_SECONDS)
+                conn.commit()
+                return True
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _renew_lease(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            self._set_meta(conn, lease=time.time() + _LEASE_SECONDS)
+            conn.commit()
+
+    def _release_lease(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM meta WHERE name = 'lease'")
+            conn.commit()
+
+    # -- replay ------------------------------------------------------------
+
+    def _load_snapshot(self, snapshot: Optional[Dict[str, Any]]) -> None:
+        self._snapshot = snapshot
+        self._matrix, self._graph = None, None
+        self._heads, self._head_factors = None, None
+        self._keys, self._rows, self._rows_by_parent = [], {}, {}
+        self._kinds = np.zeros(0, dtype=np.int8)
+        self._alive = np.zeros(0, dtype=bool)
+        self._delta = {}
+        self._applied = snapshot["seq"] if snapshot else 0
+        if not snapshot or not snapshot["count"]:
+            return
+        base = os.path.join(self.path, snapshot["name"])
+        with open(f"{base}.json") as f:
+            data = json.load(f)
+        count, dimension = snapshot["count"], snapshot["dimension"]
+        self._matrix = np.memmap(
+            f"{base}.f32", dtype=np.float32, mode="r", shape=(count, dimension)
+        )
+        self._keys = data["keys"]
+        self._kinds = np.array([KINDS.index(k) for k in data["kinds"]], dtype=np.int8)
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+        for row, parent in enumerate(data["parents"]):
+            self._rows_by_parent.setdefault(parent, []).append(row)
+        self._alive = np.ones(count, dtype=bool)
+        head_dimension = snapshot.get("head_dimension") or 0
+        if head_dimension:
+            self._heads = np.memmap(
+                f"{base}.h8", dtype=np.int8, mode="r", shape=(count, head_dimension)
+            )
+            self._head_factors = np.fromfile(f"{base}.hf", dtype=np.float32)
+        if hnswlib is not None and os.path.exists(f"{base}.hnsw"):
+            graph = hnswlib.Index(space="cosine", dim=dimension)
+            graph.load_index(f"{base}.hnsw", max_elements=count)
+            self._graph = graph
+        logger.debug(f"Loaded vector snapshot {snapshot['name']} ({count} vectors)")
+
+    def _drop_row(self, row: int) -> None:
+        if self._alive[row]:
+            self._alive[row] = False
+            if self._graph is not None:
+                self._graph.mark_deleted(row)
+
+    def _apply(self, op: str, key, kind, parent, dims, blob) -> None:
+        if op == "put":
+            if key in self._rows:
+                self._drop_row(self._rows[key])
+            self._delta[key] = (kind, parent, np.frombuffer(blob, dtype=np.float32))
+        elif op == "delete":
+            self._delta.pop(key, None)
+            if key in self._rows:
+                self._drop_row(self._rows[key])
+        elif op == "delete_parent":
+            for row in self._rows_by_parent.get(parent, ()):
+                self._drop_row(row)
+            for k in [k for k, entry in self._delta.items() if entry[1] == parent]:
+                del self._delta[k]
+        elif op == "reset":
+            applied = self._applied
+            self._load_snapshot(None)
+            self._applied = applied
+
+    def refresh_sync(self) -> None:
+        """Load a newer snapshot and replay journal entries not seen yet."""
+        with self._lock:
+            meta = self._meta()
+            self.dimension = int(meta["dimension"]) if "dimension" in meta else None
+            self.complete = meta.get("complete") == "1"
+            snapshot = json.loads(meta["snapshot"]) if "snapshot" in meta else None
+            if snapshot and snapshot["name"] != self._snapshot_name():
+                self._load_snapshot(snapshot)
+            rows = (
+                self._connection()
+                .execute(
+                    "SELECT seq, op, key, kind, parent, dims, vector FROM journal "
+                    "WHERE seq > ? ORDER BY seq",
+                    (self._applied,),
+                )
+                .fetchall()
+            )
+            for seq, *entry in rows:
+                self._apply(*entry)
+                self._applied = seq
+
+    # -- writes ------------------------------------------------------------
+
+    def _append(self, entries: List[Tuple[Any, ...]]) -> None:
+        if not entries:
+            return
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT INTO journal (op, key, kind, parent, dims, vector) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                entries,
+            )
+            conn.commit()
+            self.refresh_sync()
+            backlog = len(self._delta) + int((~self._alive).sum())
+            snapshot_size = self._snapshot["count"] if self._snapshot else 0
+        threshold = max(
+            env_int("VECTOR_LOCAL_COMPACT_EVERY", 20000, minimum=1),
+            snapshot_size // 10,
+        )
+        if self.complete and backlog > threshold and not self._compacting.is_set():
+            self._compacting.set()
+            threading.Thread(target=self._compact_in_background, daemon=True).start()
+
+    def put_sync(self, rows: Sequence[VectorRow]) -> None:
+        entries = []
+        for key, kind, parent, vector in rows:
+            arr = _normalise(np.asarray(vector, dtype=np.float32))
+            if self.dimension is not None and arr.shape[0] != self.dimension:
+                continue  # ensure_dimension resets the index on model changes
+            entries.append(("put", key, kind, parent, arr.shape[0], arr.tobytes()))
+        self._append(entries)
+
+    def delete_sync(self, keys: Iterable[str]) -> None:
+        self._append([("delete", key, None, None, None, None) for key in keys])
+
+    def delete_parents_sync(self, parents: Iterable[str]) -> None:
+        self._append(
+            [("delete_parent", None, None, parent, None, None) for parent in parents]
+        )
+
+    def ensure_dimension_sync(self, dimension: int) -> bool:
+        """Reset the index for a new embedding dimension; True if it is usable."""
+        with self._lock:
+            self.refresh_sync()
+            if self.dimension == dimension:
+                return self.complete
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO journal (op, dims) VALUES ('reset', ?)", (dimension,)
+            )
+            self._set_meta(conn, dimension=dimension, complete=0)
+            conn.execute("DELETE FROM meta WHERE name = 'snapshot'")
+            conn.commit()
+            logger.info(f"Reset local vector index for {dimension}-dimension vectors")
+            self.refresh_sync()
+            return False
+
+    # -- snapshots ---------------------------------------------------------
+
+    def _publish(self, snapshot: Dict[str, Any], complete: bool) -> bool:
+        with self._lock:
+            conn = self._connection()
+            if self._meta().get("dimension") != str(snapshot["dimension"]):
+                # The embedding model changed while the snapshot was written
+                self._remove_snapshot_files({self._snapshot_name()})
+                return False
+            self._set_meta(
+                conn,
+                snapshot=json.dumps(snapshot),
+                dimension=snapshot["dimension"],
+                **({"complete": 1} if complete else {}),
+            )
+            conn.execute("DELETE FROM journal WHERE seq <= ?", (snapshot["seq"],))
+            conn.commit()
+            previous = self._snapshot_name()
+            self.refresh_sync()
+        # Keep the previous snapshot for processes about to load it
+        self._remove_snapshot_files({snapshot["name"], previous})
+        return True
+
+    def _snapshot_name(self) -> Optional[str]:
+        return self._snapshot["name"] if self._snapshot else None
+
+    def _remove_snapshot_files(self, keep: Set[Optional[str]]) -> None:
+        for filename in os.listdir(self.path):
+            name = filename.rsplit(".", 1)[0]
+            if filename.startswith("snapshot-") and name not in keep:
+                os.unlink(os.path.join(self.path, filename))
+
+    def compact_sync(self) -> bool:
+        """Fold the replayed journal into a new snapshot."""
+        if not self._acquire_lease():
+            return False
+        try:
+            with self._lock:
+                self.refresh_sync()
+                if self.dimension is None:
+                    return False
+                writer = _SnapshotWriter(self.path, self.dimension)
+                matrix, alive, keys = self._matrix, self._alive.copy(), self._keys
+                kinds = self._kinds.copy()
+                parents = {
+                    row: parent
+                    for parent, rows in self._rows_by_parent.items()
+                    for row in rows
+                }
+                delta = dict(self._delta)
+                seq = self._applied
+            try:
+                if matrix is not None:
+                    for start in range(0, len(keys), 50_000):
+                        rows = [
+                            row
+                            for row in range(start, min(start + 50_000, len(keys)))
+                            if alive[row]
+                        ]
+                        writer.add(
+                            [keys[row] for row in rows],
+                            [KINDS[kinds[row]] for row in rows],
+                            [parents[row] for row in rows],
+                            np.asarray(matrix[rows]),
+                        )
+                if delta:
+                    writer.add(
+                        list(delta),
+                        [entry[0] for entry in delta.values()],
+                        [entry[1] for entry in delta.values()],
+                        np.stack([entry[2] for entry in delta.values()]),
+                    )
+                snapshot = writer.finish(seq)
+            except Exception:
+                writer.abort()
+                raise
+            self._publish(snapshot, complete=False)
+            logger.info(
+                f"Compacted local vector index into {snapshot['name']} "
+                f"({snapshot['count']} vectors)"
+            )
+            return True
+        finally:
+            self._release_lease()
+
+    def _compact_in_background(self) -> None:
+        try:
+            self.compact_sync()
+        except Exception as e:
+            logger.error(f"Compacting local vector index failed: {e}")
+        finally:
+            self._compacting.clear()
+
+    async def build(self, dimension: int) -> Dict[str, Any]:
+        """Snapshot every stored embedding of this dimension from the database."""
+        if not await asyncio.to_thread(self._acquire_lease):
+            raise RuntimeError("Local vector index is being rebuilt by another process")
+        try:
+            await asyncio.to_thread(self.ensure_dimension_sync, dimension)
+            with self._lock:
+                (seq,) = (
+                    self._connection()
+                    .execute("SELECT COALESCE(MAX(seq), 0) FROM journal")
+                    .fetchone()
+                )
+            writer = _SnapshotWriter(self.path, dimension)
+            try:
+                for kind in KINDS:
+                    parent_field = "id" if kind == "note" else "source"
+                    async for page in repo_scan(
+                        kind,
+                        projection=f"id, {parent_field} AS parent, embedding, "
+                        "embedding_scale",
+                        where="embedding != NONE AND array::len(embedding) = $dims",
+                        vars={"dims": dimension},
+                        batch_size=_BUILD_PAGE_SIZE,
+                    ):
+                        rows = [(row, decode_embedding(row)) for row in page]
+                        rows = [(row, vector) for row, vector in rows if vector]
+                        if rows:
+                            writer.add(
+                                [str(row["id"]) for row, _ in rows],
+                                [kind] * len(rows),
+                                [str(row["parent"]) for row, _ in rows],
+                                np.asarray([v for _, v in rows], dtype=np.float32),
+                            )
+                        await asyncio.to_thread(self._renew_lease)
+                snapshot = await asyncio.to_thread(writer.finish, seq)
+            except BaseException:
+                writer.abort()
+                raise
+            await asyncio.to_thread(self._publish, snapshot, True)
+            logger.info(
+                f"Built local vector index {snapshot['name']} "
+                f"({snapshot['count']} vectors, {dimension} dimensions)"
+            )
+            return snapshot
+        finally:
+            await asyncio.to_thread(self._release_lease)
+
+    # -- search ------------------------------------------------------------
+
+    def search_sync(
+        self,
+        query: Sequence[float],
+        k: int,
+        kind: str,
+        parents: Optional[Set[str]] = None,
+    ) -> Optional[List[Tuple[str, float]]]:
+        """
+        Top-k (key, cosine similarity) of one table, or None if unusable.
+
+        With parents, only vectors of those sources (or notes) are scored.
+        """
+        with self._lock:
+            self.refresh_sync()
+            if not self.complete or self.dimension != len(query):
+                return None
+            q = _normalise(np.asarray(query, dtype=np.float32))
+            if parents is None:
+                hits = self._search_snapshot(q, k, KINDS.index(kind))
+            else:
+                hits = self._search_parents(q, k, KINDS.index(kind), parents)
+            delta = [
+                (key, e[2])
+                for key, e in self._delta.items()
+                if e[0] == kind and (parents is None or e[1] in parents)
+            ]
+            if delta:
+                scores = np.stack([vector for _, vector in delta]) @ q
+                hits.extend((key, float(s)) for (key, _), s in zip(delta, scores))
+        hits.sort(key=lambda hit: hit[1], reverse=True)
+        return hits[:k]
+
+    def _search_snapshot(
+        self, q: np.ndarray, k: int, code: int
+    ) -> List[Tuple[str, float]]:
+        if self._matrix is None:
+            return []
+        wanted = (self._kinds == code) & self._alive
+        available = int(wanted.sum())
+        if not available:
+            return []
+        if self._graph is not None:
+            self._graph.set_ef(max(env_int("VECTOR_INDEX_EF", 64, minimum=1), k))
+            try:
+                labels, distances = self._graph.knn_query(
+                    q, k=min(k, available), filter=lambda label: bool(wanted[label])
+                )
+                return [
+                    (self._keys[label], 1.0 - float(distance))
+                    for label, distance in zip(labels[0], distances[0])
+                ]
+            except RuntimeError:
+                # Too few matching rows reachable from the graph; scan instead
+                pass
+        if self._two_stage(available, k):
+            return self._rank_rows(q, k, np.flatnonzero(wanted))
+        scores = np.asarray(self._matrix @ q)
+        scores[~wanted] = -np.inf
+        top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+        return [(self._keys[row], float(scores[row])) for row in top if wanted[row]]
+
+    def _search_parents(
+        self, q: np.ndarray, k: int, code: int, parents: Set[str]
+    ) -> List[Tuple[str, float]]:
+        if self._matrix is None:
+            return []
+        rows = np.fromiter(
+            (row for p in parents for row in self._rows_by_parent.get(p, ())),
+            dtype=np.int64,
+        )
+        rows = rows[(self._kinds[rows] == code) & self._alive[rows]]
+        if not len(rows):
+            return []
+        rows = np.sort(rows)  # Sequential reads from the memory map
+        return self._rank_rows(q, k, rows)
+
+    def _two_stage(self, rows: int, k: int) -> bool:
+        """Whether the heads should shortlist rows before the full vectors."""
+        return (
+            self._heads is not None
+            and head_dimensions() > 0
+            and rows > rerank_candidates(k)
+        )
+
+    def _rank_rows(
+        self, q: np.ndarray, k: int, rows: np.ndarray
+    ) -> List[Tuple[str, float]]:
+        """Top-k of the given (sorted) snapshot rows."""
+        matrix, heads, factors = self._matrix, self._heads, self._head_factors
+        if matrix is None:
+            return []
+        if heads is not None and factors is not None and self._two_stage(len(rows), k):
+            q_head = _normalise(q[: heads.shape[1]])
+            head_scores = np.empty(len(rows), dtype=np.float32)
+            for start in range(0, len(rows), _HEAD_BLOCK_ROWS):
+                block = rows[start : start + _HEAD_BLOCK_ROWS]
+                head_scores[start : start + len(block)] = (
+                    np.asarray(heads[block], dtype=np.float32) @ q_head
+                ) * factors[block]
+            candidates = rerank_candidates(k)
+            shortlist = np.argpartition(-head_scores, candidates - 1)[:candidates]
+            rows = rows[np.sort(shortlist)]
+        scores = np.asarray(matrix[rows] @ q)
+        top = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+        return [(self._keys[rows[i]], float(scores[i])) for i in top]
+
+    # -- async API ---------------------------------------------------------
+
+    async def put(self, rows: Sequence[VectorRow]) -> None:
+        self._ensure_subscribed()
+        await asyncio.to_thread(self.put_sync, rows)
+
+    async def delete(self, keys: Iterable[str]) -> None:
+        await asyncio.to_thread(self.delete_sync, list(keys))
+
+    async def delete_parents(self, parents: Iterable[str]) -> None:
+        await asyncio.to_thread(self.delete_parents_sync, list(parents))
+
+    async def ensure_dimension(self, dimension: int) -> bool:
+        return await asyncio.to_thread(self.ensure_dimension_sync, dimension)
+
+    async def search(
+        self,
+        query: Sequence[float],
+        k: int,
+        kind: str,
+        parents: Optional[Set[str]] = None,
+    ) -> Optional[List[Tuple[str, float]]]:
+        self._ensure_subscribed()
+        return await asyncio.to_thread(self.search_sync, query, k, kind, parents)
+
+    def _ensure_subscribed(self) -> None:
+        # The registry can be replaced (reset_sync_registry), so check identity
+        registry = get_sync_registry()
+        if registry is self._registry:
+            return
+        registry.register(SyncEventType.SOURCE_DELETED, self._on_deleted)
+        registry.register(SyncEventType.NOTE_DELETED, self._on_deleted)
+        self._registry = registry
+
+    async def _on_deleted(self, event: SyncEvent) -> None:
+        entity_id = str(event.entity_id)
+        if ":" not in entity_id:
+            entity_id = f"{event.entity_type}:{entity_id}"
+        await self.delete_parents([entity_id])
+
+
+_local_index: Optional[LocalVectorIndex] = None
+
+
+def get_local_vector_index() -> LocalVectorIndex:
+    """Process-wide local vector index."""
+    global _local_index
+    if _local_index is None:
+        _local_index = LocalVectorIndex()
+    return _local_index
+
+
+async def record_vectors(rows: Sequence[VectorRow]) -> None:
+    """Journal stored embeddings when the local backend is enabled."""
+    if rows and vector_search_backend() == "local":
+        await get_local_vector_index().put(rows)
+
+
+async def forget_vectors(keys: Sequence[Any]) -> None:
+    if keys and vector_search_backend() == "local":
+        await get_local_vector_index().delete(str(key) for key in keys)
+
+
+async def forget_vector_parents(parents: Sequence[Any]) -> None:
+    if parents and vector_search_backend() == "local":
+        await get_local_vector_index().delete_parents(str(p) for p in parents)
+
+
+async def local_vector_search(
+    query: List[float],
+    match_count: int,
+    sources: bool,
+    show_notes: bool,
+    min_similarity: float,
+    scope: Optional[Dict[str, List[Any]]] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    fn::vector_search answered from the local index.
+
+    scope is what fn::search_scope returns for a scoped search: the source
+    and note ids whose vectors may match.
+
+    Returns None while the index cannot serve this query (no snapshot yet,
+    or another embedding dimension), so the caller can fall back.
+    """
+    kinds = (["source_embedding", "source_insight"] if sources else []) + (
+        ["note"] if show_notes else []
+    )
+    index = get_local_vector_index()
+    scores: Dict[str, float] = {}
+    statements = []
+    for kind in kinds:
+        parents = None
+        if scope is not None:
+            parents = {
+                str(p)
+                for p in scope.get("notes" if kind == "note" else "sources") or []
+            }
+        # Over-fetch: hits are grouped per source below (see rerank_candidates)
+        hits = await index.search(query, rerank_candidates(match_count), kind, parents)
+        if hits is None:
+            return None
+        hits = [(key, score) for key, score in hits if score >= min_similarity]
+        if not hits:
+            continue
+        scores.update(hits)
+        statements.append(
+            (
+                f"SELECT {SEARCH_PROJECTIONS[kind]}, id AS row_id FROM ${kind}_ids",
+                {f"{kind}_ids": [ensure_record_id(key) for key, _ in hits]},
+            )
+        )
+    if not statements:
+        return []
+    # Rows deleted since they were indexed are simply not returned
+    rows = [
+        {**row, "similarity": scores[str(row["row_id"])]}
+        for result in await repo_query_many(statements)
+        for row in result
+        if str(row.get("row_id")) in scores
+    ]
+    return merge_search_results(rows, match_count, min_similarity)
@@ -0,0 +1,367 @@
+"""Async connection pool for SurrealDB.
+
+Opening an ``AsyncSurreal`` websocket costs three round-trips (connect,
+signin, use) before the first statement runs. The pool keeps authenticated
+connections open and hands them out per operation.
+
+Pools are scoped to the running event loop and the current process: the
+websocket client binds its receive task to the loop that opened it, and
+forked workers must never share sockets with their parent. Each pool is also
+bound to a single namespace/database pair, so a checked-out connection is
+always ready to query without calling ``use()`` again.
+
+Environment Variables:
+    SURREAL_POOL_ENABLED: Set to "false" to open a connection per operation (default: true)
+    SURREAL_POOL_MIN_SIZE: Connections opened eagerly when a pool starts (default: 1)
+    SURREAL_POOL_MAX_SIZE: Maximum concurrent connections per pool (default: 10)
+    SURREAL_POOL_ACQUIRE_TIMEOUT: Seconds to wait for a free connection (default: 30)
+    SURREAL_POOL_HEALTH_CHECK_INTERVAL: Idle seconds before a connection is pinged on checkout (default: 30)
+    SURREAL_POOL_MAX_IDLE_TIME: Idle seconds before surplus connections are closed (default: 300)
+"""
+
+import asyncio
+import os
+import time
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional, Tuple
+
+from loguru import logger
+from surrealdb import AsyncSurreal  # type: ignore
+
+from open_notebook.utils.env import env_float, env_int
+
+
+def pool_enabled() -> bool:
+    """Whether repository operations should use pooled connections."""
+    return os.getenv("SURREAL_POOL_ENABLED", "true").lower() not in (
+        "0",
+        "false",
+        "no",
+    )
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no pooled connection becomes available in time."""
+
+
+@dataclass
+class PoolConfig:
+    """Connection and sizing settings for a single pool."""
+
+    url: str
+    username: Optional[str]
+    password: Optional[str]
+    namespace: Optional[str]
+    database: Optional[str]
+    min_size: int = 1
+    max_size: int = 10
+    acquire_timeout: float = 30.0
+    health_check_interval: float = 30.0
+    max_idle_time: float = 300.0
+
+    @classmethod
+    def from_env(
+        cls, namespace: Optional[str] = None, database: Optional[str] = None
+    ) -> "PoolConfig":
+        """Build a config from the SURREAL_* environment variables."""
+        # Imported here to keep a single source of truth for URL/password fallbacks
+        from open_notebook.database.repository import (
+            get_database_password,
+            get_database_url,
+        )
+
+        max_size = env_int("SURREAL_POOL_MAX_SIZE", 10, minimum=1)
+        min_size = min(env_int("SURREAL_POOL_MIN_SIZE", 1), max_size)
+        return cls(
+            url=get_database_url(),
+            username=os.environ.get("SURREAL_USER"),
+            password=get_database_password(),
+            namespace=namespace or os.environ.get("SURREAL_NAMESPACE"),
+            database=database or os.environ.get("SURREAL_DATABASE"),
+            min_size=min_size,
+            max_size=max_size,
+            acquire_timeout=env_float("SURREAL_POOL_ACQUIRE_TIMEOUT", 30.0),
+            health_check_interval=env_float("SURREAL_POOL_HEALTH_CHECK_INTERVAL", 30.0),
+            max_idle_time=env_float("SURREAL_POOL_MAX_IDLE_TIME", 300.0),
+        )
+
+
+@dataclass
+class PoolStats:
+    """Counters describing pool activity since it was created."""
+
+    checkouts: int = 0
+    connections_opened: int = 0
+    connections_closed: int = 0
+    health_check_failures: int = 0
+    discarded: int = 0
+    acquire_timeouts: int = 0
+    wait_time_total: float = 0.0
+    wait_time_max: float = 0.0
+    in_use: int = 0
+    idle: int = 0
+
+    @property
+    def wait_time_avg(self) -> float:
+        return self.wait_time_total / self.checkouts if self.checkouts else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["wait_time_avg"] = self.wait_time_avg
+        return data
+
+
+@dataclass
+class _PooledConnection:
+    db: Any
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+# Errors that mean the socket itself is unusable, as opposed to a failed statement
+_CONNECTION_ERRORS: Tuple[type, ...] = (ConnectionError, OSError, asyncio.TimeoutError)
+try:
+    from websockets.exceptions import WebSocketException
+
+    _CONNECTION_ERRORS = _CONNECTION_ERRORS + (WebSocketException,)
+except ImportError:  # pragma: no cover - websockets ships with surrealdb
+    pass
+
+
+def is_connection_error(error: BaseException) -> bool:
+    """Return True if the error indicates a dropped or broken connection."""
+    return isinstance(error, _CONNECTION_ERRORS)
+
+
+class ConnectionPool:
+    """Bounded pool of authenticated SurrealDB connections.
+
+    Connections are opened lazily up to ``max_size`` and returned to the pool
+    after each checkout. Idle connections are pinged before reuse once they
+    have been idle longer than ``health_check_interval``; connections that
+    fail the check, or that raised a connection-level error while checked
+    out, are closed and replaced on the next checkout.
+    """
+
+    def __init__(
+        self,
+        config: PoolConfig,
+        connection_factory: Callable[[str], Any] = AsyncSurreal,
+    ):
+        self.config = config
+        self._connection_factory = connection_factory
+        self.stats = PoolStats()
+        self._idle: Deque[_PooledConnection] = deque()
+        self._slots = asyncio.Semaphore(config.max_size)
+        self._lock = asyncio.Lock()
+        self._started = False
+        self._closed = False
+
+    @property
+    def size(self) -> int:
+        return self.stats.in_use + len(self._idle)
+
+    async def _open(self) -> _PooledConnection:
+        db = self._connection_factory(self.config.url)
+        try:
+            await db.signin(
+                {"username": self.config.username, "password": self.config.password}
+            )
+            await db.use(self.config.namespace, self.config.database)
+        except BaseException:
+            await self._close_db(db)
+            raise
+        self.stats.connections_opened += 1
+        return _PooledConnection(db=db)
+
+    async def _close_db(self, db: Any) -> None:
+        try:
+            await db.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled SurrealDB connection: {e}")
+
+    async def _close(self, conn: _PooledConnection) -> None:
+        await self._close_db(conn.db)
+        self.stats.connections_closed += 1
+
+    async def _is_alive(self, conn: _PooledConnection) -> bool:
+        # A finished receive task means the server closed the socket
+        recv_task = getattr(conn.db, "recv_task", None)
+        if recv_task is not None and recv_task.done():
+            return False
+        if time.monotonic() - conn.last_used < self.config.health_check_interval:
+            return True
+        try:
+            await asyncio.wait_for(conn.db.query("RETURN true"), timeout=5)
+            return True
+        except Exception as e:
+            logger.debug(f"Pooled connection failed health check: {e}")
+            return False
+
+    async def start(self) -> None:
+        """Open ``min_size`` connections ahead of the first checkout."""
+        async with self._lock:
+            if self._started:
+                return
+            self._started = True
+            for _ in range(self.config.min_size - len(self._idle)):
+                try:
+                    self._idle.append(await self._open())
+                except Exception as e:
+                    logger.warning(f"Could not pre-open SurrealDB connection: {e}")
+                    break
+            self.stats.idle = len(self._idle)
+
+    async def _prune_idle(self) -> None:
+        """Close surplus connections that have been idle for too long."""
+        now = time.monotonic()
+        while len(self._idle) > self.config.min_size:
+            oldest = self._idle[0]
+            if now - oldest.last_used < self.config.max_idle_time:
+                break
+            self._idle.popleft()
+            await self._close(oldest)
+
+    async def acquire(self) -> _PooledConnection:
+        """Check out a live connection, opening one if none are idle."""
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        if not self._started:
+            await self.start()
+
+        wait_start = time.monotonic()
+        try:
+            await asyncio.wait_for(
+                self._slots.acquire(), timeout=self.config.acquire_timeout
+            )
+        except asyncio.TimeoutError:
+            self.stats.acquire_timeouts += 1
+            raise PoolTimeoutError(
+                f"Timed out after {self.config.acquire_timeout}s waiting for a "
+                f"SurrealDB connection (max_size={self.config.max_size})"
+            )
+        wait = time.monotonic() - wait_start
+        self.stats.checkouts += 1
+        self.stats.wait_time_total += wait
+        self.stats.wait_time_max = max(self.stats.wait_time_max, wait)
+
+        try:
+            conn: Optional[_PooledConnection] = None
+            while self._idle:
+                candidate = self._idle.pop()
+                if await self._is_alive(candidate):
+                    conn = candidate
+                    break
+                self.stats.health_check_failures += 1
+                await self._close(candidate)
+            if conn is None:
+                conn = await self._open()
+        except BaseException:
+            self._slots.release()
+            self.stats.idle = len(self._idle)
+            raise
+
+        self.stats.in_use += 1
+        self.stats.idle = len(self._idle)
+        return conn
+
+    async def release(self, conn: _PooledConnection, discard: bool = False) -> None:
+        """Return a connection to the pool, closing it if it is no longer usable."""
+        self.stats.in_use -= 1
+        try:
+            if discard or self._closed:
+                if discard:
+                    self.stats.discarded += 1
+                await self._close(conn)
+            else:
+                conn.last_used = time.monotonic()
+                self._idle.append(conn)
+                await self._prune_idle()
+        finally:
+            self.stats.idle = len(self._idle)
+            self._slots.release()
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[Any]:
+        """Check out a connection for the duration of the ``async with`` block."""
+        conn = await self.acquire()
+        discard = False
+        try:
+            yield conn.db
+        except BaseException as e:
+            # Statement errors leave the socket usable; anything else may not
+            discard = is_connection_error(e) or isinstance(e, asyncio.CancelledError)
+            raise
+        finally:
+            await self.release(conn, discard=discard)
+
+    async def close(self) -> None:
+        """Close all idle connections and refuse further checkouts."""
+        self._closed = True
+        while self._idle:
+            await self._close(self._idle.pop())
+        self.stats.idle = 0
+
+
+# Pools per event loop, then per (pid, namespace, database). Weak keys let a
+# pool disappear together with a short-lived loop (e.g. the async bridge).
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[int, Optional[str], Optional[str]], ConnectionPool]]" = weakref.WeakKeyDictionary()
+
+
+def get_connection_pool(
+    namespace: Optional[str] = None, database: Optional[str] = None
+) -> ConnectionPool:
+    """Get or create the pool for the running loop and namespace/database."""
+    loop = asyncio.get_running_loop()
+    config = PoolConfig.from_env(namespace, database)
+    key = (os.getpid(), config.namespace, config.database)
+    loop_pools = _pools.setdefault(loop, {})
+    pool = loop_pools.get(key)
+    if pool is None or pool._closed:
+        # Drop pools inherited from a parent process without touching their sockets
+        for stale_key in [k for k in loop_pools if k[0] != key[0]]:
+            del loop_pools[stale_key]
+        pool = ConnectionPool(config)
+        loop_pools[key] = pool
+        logger.debug(
+            f"Created SurrealDB connection pool for {config.namespace}/{config.database} "
+            f"(min={config.min_size}, max={config.max_size})"
+        )
+    return pool
+
+
+async def close_connection_pools() -> None:
+    """Close every pool owned by the running event loop (call on shutdown)."""
+    loop = asyncio.get_running_loop()
+    for pool in list(_pools.pop(loop, {}).values()):
+        await pool.close()
+
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Return stats for all pools in this process, keyed by namespace/database."""
+    pid = os.getpid()
+    aggregated: Dict[str, Dict[str, Any]] = {}
+    for loop_pools in list(_pools.values()):
+        for (owner_pid, namespace, database), pool in loop_pools.items():
+            if owner_pid != pid:
+                continue
+            name = f"{namespace}/{database}"
+            stats = pool.stats.to_dict()
+            if name in aggregated:
+                merged = aggregated[name]
+                for key, value in stats.items():
+                    if key == "wait_time_max":
+                        merged[key] = max(merged[key], value)
+                    else:
+                        merged[key] += value
+                merged["wait_time_avg"] = (
+                    merged["wait_time_total"] / merged["checkouts"]
+                    if merged["checkouts"]
+                    else 0.0
+                )
+            else:
+                aggregated[name] = stats
+    return aggregated
@@ -1,11 +1,25 @@
 import os
 from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional, TypeVar, Union
+from typing import (
+    Any,
+    AsyncIterator,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 from loguru import logger
 from surrealdb import AsyncSurreal, RecordID  # type: ignore
 
+from open_notebook.database.decoding import decode_result
+from open_notebook.database.instrumentation import track_query
+from open_notebook.database.pool import get_connection_pool, pool_enabled
+
 T = TypeVar("T", Dict[str, Any], List[Dict[str, Any]])
 
 
@@ -27,14 +41,12 @@ def get_database_password():
 
 
 def parse_record_ids(obj: Any) -> Any:
-    """Recursively parse and convert RecordIDs into strings."""
-    if isinstance(obj, dict):
-        return {k: parse_record_ids(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [parse_record_ids(item) for item in obj]
-    elif isinstance(obj, RecordID):
-        return str(obj)
-    return obj
+    """Convert RecordIDs in a query result into strings.
+
+    Containers are decoded in place (see decoding.py); numeric arrays such as
+    embeddings are passed through without being walked.
+    """
+    return decode_result(obj)
 
 
 def ensure_record_id(value: Union[str, RecordID]) -> RecordID:
@@ -45,7 +57,9 @@ def ensure_record_id(value: Union[str, RecordID]) -> RecordID:
 
 
 @asynccontextmanager
-async def db_connection():
+async def _direct_connection(
+    namespace: Optional[str] = None, database: Optional[str] = None
+):
     db = AsyncSurreal(get_database_url())
     await db.signin(
         {
@@ -54,7 +68,8 @@ async def db_connection():
         }
     )
     await db.use(
-        os.environ.get("SURREAL_NAMESPACE"), os.environ.get("SURREAL_DATABASE")
+        namespace or os.environ.get("SURREAL_NAMESPACE"),
+        database or os.environ.get("SURREAL_DATABASE"),
     )
     try:
         yield db
@@ -62,6 +77,25 @@ async def db_connection():
         await db.close()
 
 
+@asynccontextmanager
+async def db_connection(
+    namespace: Optional[str] = None, database: Optional[str] = None
+):
+    """Yield an authenticated connection bound to the namespace/database.
+
+    Connections come from the process-wide pool (see pool.py) unless
+    SURREAL_POOL_ENABLED is false, in which case a fresh connection is opened
+    and closed around each operation.
+    """
+    if not pool_enabled():
+        async with _direct_connection(namespace, database) as db:
+            yield db
+        return
+
+    async with get_connection_pool(namespace, database).connection() as db:
+        yield db
+
+
 async def repo_query(
     query_str: str, vars: Optional[Dict[str, Any]] = None
 ) -> List[Dict[str, Any]]:
@@ -69,7 +103,11 @@ async def repo_query(
 
     async with db_connection() as connection:
         try:
-            result = parse_record_ids(await connection.query(query_str, vars))
+            with track_query("query", query_str, vars) as tracked:
+                tracked.result = parse_record_ids(
+                    await connection.query(query_str, vars)
+                )
+            result = tracked.result
             if isinstance(result, str):
                 raise RuntimeError(result)
             return result
@@ -82,6 +120,175 @@ async def repo_query(
             raise
 
 
+Statement = Union[str, Tuple[str, Optional[Dict[str, Any]]]]
+
+# Reported for the other statements of a transaction that failed
+_NOT_EXECUTED = "not executed due to a failed transaction"
+
+
+def _merge_statement_vars(
+    statements: Sequence[Statement],
+) -> Tuple[List[str], Dict[str, Any]]:
+    """Split statements into SQL strings and one merged parameter dict.
+
+    SurrealDB binds parameters per request, so all statements in a batch share
+    one namespace. Reusing a name is fine as long as the value is the same.
+    """
+    sql: List[str] = []
+    merged: Dict[str, Any] = {}
+    for statement in statements:
+        if isinstance(statement, str):
+            query_str, vars = statement, None
+        else:
+            query_str, vars = statement
+        query_str = query_str.strip().rstrip(";").strip()
+        if not query_str:
+            raise ValueError("Empty statement in batched query")
+        sql.append(query_str)
+        for key, value in (vars or {}).items():
+            if key in merged and merged[key] != value:
+                raise ValueError(
+                    f"Parameter ${key} is bound to different values in one batch"
+                )
+            merged[key] = value
+    return sql, merged
+
+
+async def repo_query_many(
+    statements: Sequence[Statement], transaction: bool = False
+) -> List[List[Dict[str, Any]]]:
+    """Execute several SurrealQL statements in a single round-trip.
+
+    Each entry is either a query string or a ``(query, vars)`` tuple and must
+    hold exactly one statement. Results are returned in the same order, one
+    list per statement. With ``transaction=True`` the batch is wrapped in
+    BEGIN/COMMIT so it applies atomically; SurrealDB returns no results for
+    BEGIN/COMMIT themselves.
+    """
+    if not statements:
+        return []
+
+    sql, vars = _merge_statement_vars(statements)
+    if transaction:
+        sql = ["BEGIN TRANSACTION", *sql, "COMMIT TRANSACTION"]
+    query_str = ";\n".join(sql) + ";"
+
+    async with db_connection() as connection:
+        try:
+            with track_query("query_many", query_str, vars) as tracked:
+                response = await connection.query_raw(query_str, vars)
+                tracked.result = response.get("result")
+            if response.get("error") is not None:
+                raise RuntimeError(str(response["error"]))
+            raw_results = response.get("result") or []
+            errors = [
+                str(r.get("result")) for r in raw_results if r.get("status") == "ERR"
+            ]
+            if errors:
+                # In a failed transaction every statement reports an error;
+                # prefer the one that caused it over "not executed" notices
+                causes = [e for e in errors if _NOT_EXECUTED not in e]
+                raise RuntimeError((causes or errors)[0])
+            if len(raw_results) != len(statements):
+                raise RuntimeError(
+                    f"Expected {len(statements)} statement results, "
+                    f"got {len(raw_results)}"
+                )
+
+            results: List[List[Dict[str, Any]]] = []
+            for raw in raw_results:
+                result = parse_record_ids(raw.get("result"))
+                if result is None:
+                    result = []
+                elif not isinstance(result, list):
+                    result = [result]
+                results.append(result)
+            return results
+        except RuntimeError as e:
+            # Same handling as repo_query: conflicts are retriable, log quietly
+            logger.debug(str(e))
+            raise
+        except Exception as e:
+            logger.exception(e)
+            raise
+
+
+def _parse_scan_order(order_by: Optional[str]) -> Tuple[Optional[str], bool]:
+    """Split ``"field [asc|desc]"`` into the field name and a descending flag."""
+    if not order_by:
+        return None, False
+    parts = order_by.split()
+    if len(parts) > 2 or (len(parts) == 2 and parts[1].lower() not in ("asc", "desc")):
+        raise ValueError(f"Unsupported order_by for keyset scan: {order_by}")
+    field = parts[0]
+    if not field.replace("_", "").isalnum():
+        raise ValueError(f"Unsupported order_by for keyset scan: {order_by}")
+    descending = len(parts) == 2 and parts[1].lower() == "desc"
+    return (None if field == "id" else field), descending
+
+
+async def repo_scan(
+    table: str,
+    projection: str = "*",
+    where: Optional[str] = None,
+    vars: Optional[Dict[str, Any]] = None,
+    batch_size: int = 500,
+    order_by: Optional[str] = None,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Page through a table with keyset cursors, yielding one list per batch.
+
+    Each page continues after the last row of the previous one
+    (``WHERE id > $last``), so the cost per page stays flat no matter how far
+    into the table the scan is, unlike LIMIT/START. ``order_by`` accepts a
+    single ``"field [asc|desc]"``; ties are broken by id. Rows with NONE in
+    the order field sort unpredictably against the cursor, so order by a
+    field that is always set. ``where`` is ANDed with the cursor condition;
+    parameters starting with ``_scan_`` are reserved.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive")
+    field, descending = _parse_scan_order(order_by)
+    op, direction = ("<", "DESC") if descending else (">", "ASC")
+    if not projection.strip().startswith("*"):
+        # The cursor needs id (and the order field) from every row
+        columns = [column.strip() for column in projection.split(",")]
+        for required in ("id", field):
+            if required and required not in columns:
+                columns.append(required)
+        projection = ", ".join(columns)
+    order_clause = (
+        f"{field} {direction}, id {direction}" if field else f"id {direction}"
+    )
+
+    params: Dict[str, Any] = dict(vars or {})
+    params["_scan_limit"] = batch_size
+    last: Optional[Dict[str, Any]] = None
+    while True:
+        conditions = [f"({where})"] if where else []
+        if last is not None:
+            params["_scan_id"] = ensure_record_id(last["id"])
+            if field:
+                params["_scan_value"] = last.get(field)
+                conditions.append(
+                    f"({field} {op} $_scan_value OR "
+                    f"({field} = $_scan_value AND id {op} $_scan_id))"
+                )
+            else:
+                conditions.append(f"id {op} $_scan_id")
+        query = f"SELECT {projection} FROM {table}"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += f" ORDER BY {order_clause} LIMIT $_scan_limit"
+
+        page = await repo_query(query, params)
+        if not page:
+            return
+        yield page
+        if len(page) < batch_size:
+            return
+        last = page[-1]
+
+
 async def repo_create(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
     """Create a new record in the specified table"""
     # Remove 'id' attribute if it exists in data
@@ -90,7 +297,9 @@ async def repo_create(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
     data["updated"] = datetime.now(timezone.utc)
     try:
         async with db_connection() as connection:
-            result = parse_record_ids(await connection.insert(table, data))
+            with track_query("create", f"INSERT INTO {table}", data) as tracked:
+                tracked.result = parse_record_ids(await connection.insert(table, data))
+            result = tracked.result
             # SurrealDB may return a string error message instead of the expected record
             if isinstance(result, str):
                 raise RuntimeError(result)
@@ -160,7 +369,10 @@ async def repo_delete(record_id: Union[str, RecordID]):
 
     try:
         async with db_connection() as connection:
-            return await connection.delete(ensure_record_id(record_id))
+            record = ensure_record_id(record_id)
+            with track_query("delete", f"DELETE {record.table_name}:?") as tracked:
+                tracked.result = await connection.delete(record)
+            return tracked.result
     except Exception as e:
         logger.exception(e)
         raise RuntimeError(f"Failed to delete record: {str(e)}")
@@ -172,7 +384,9 @@ async def repo_insert(
     """Create a new record in the specified table"""
     try:
         async with db_connection() as connection:
-            result = parse_record_ids(await connection.insert(table, data))
+            with track_query("insert", f"INSERT INTO {table}", data) as tracked:
+                tracked.result = parse_record_ids(await connection.insert(table, data))
+            result = tracked.result
             # SurrealDB may return a string error message instead of the expected records
             if isinstance(result, str):
                 raise RuntimeError(result)
@@ -27,6 +27,8 @@ from open_notebook.database.repository import (
     repo_delete as _original_repo_delete,
     repo_insert as _original_repo_insert,
     repo_query,
+    repo_query_many,
+    repo_scan,
     repo_relate,
     repo_update as _original_repo_update,
     repo_upsert as _original_repo_upsert,
@@ -271,6 +273,8 @@ __all__ = [
     
     # Direct re-exports (no events needed)
     "repo_query",
+    "repo_query_many",
+    "repo_scan",
     "repo_relate",
     "db_connection",
     "ensure_record_id",
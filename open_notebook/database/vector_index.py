@@ -0,0 +1,462 @@
+"""
+Approximate nearest-neighbour indexes for vector search.
+
+fn::vector_search (migration 9) scores every stored embedding with
+``vector::similarity::cosine``, so search time grows linearly with the number
+of chunks. SurrealDB can instead answer the query from an HNSW (or M-tree)
+index with the KNN operator ``<|k,ef|>``, reading a few hundred vectors.
+
+An index has a fixed dimension, which depends on the configured embedding
+model, so it cannot be declared in a migration. The build_vector_index
+command probes the model's dimension and defines one index per embedding
+table (``build_vector_index``). Its dimension and status are kept in the
+``open_notebook:vector_index`` record. The embedding commands call
+``ensure_vector_index`` before writing vectors: an index of another
+dimension would reject them, so it is dropped and a build for the new
+dimension is queued. Defining an index fails while rows of another
+dimension remain (after switching models), so such a build is reported as
+blocked until the embeddings are rebuilt.
+
+``vector_search`` uses the index only when its dimension matches the query
+embedding. Without a usable index it falls back to fn::vector_search.
+
+With VECTOR_SEARCH_BACKEND=local, both functions maintain the in-process
+index of local_vector_index.py instead of the SurrealDB indexes.
+
+Searches that scan (no usable index, or a scoped search) run in two stages
+when embeddings carry a head (EMBEDDING_HEAD_DIMENSIONS, see
+embedding_storage.py): the heads pick rerank_candidates() rows per table and
+only those are scored with the full vectors. Rows without a head would be
+missed, so this waits until the storage conversion has written the heads of
+every row and recorded their size in ``open_notebook:embedding_heads``.
+
+Environment Variables:
+    VECTOR_INDEX: "hnsw" (default), "mtree" or "off"
+    VECTOR_INDEX_EF: HNSW candidate list size at query time (default: 64)
+    VECTOR_INDEX_EFC: HNSW candidate list size at build time (default: 150)
+    VECTOR_INDEX_M: HNSW links per node (default: 12)
+    VECTOR_INDEX_STATE_TTL: Seconds the index state is cached in-process (default: 30)
+    VECTOR_INDEX_BUILD_TIMEOUT: Seconds after which an unfinished build may be
+        queued again (default: 3600)
+    VECTOR_SEARCH_BACKEND: "surreal" (default) or "local"
+    VECTOR_SEARCH_RERANK_CANDIDATES: Rows per table re-scored in two-stage search (default: 100)
+"""
+
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+from surreal_commands import submit_command
+
+from open_notebook.database.repository import (
+    ensure_record_id,
+    repo_query,
+    repo_query_many,
+    repo_upsert,
+)
+from open_notebook.utils.env import env_int
+
+VECTOR_INDEX_KINDS = ("hnsw", "mtree")
+VECTOR_SEARCH_BACKENDS = ("surreal", "local")
+VECTOR_INDEX_STATE_ID = "open_notebook:vector_index"
+EMBEDDING_HEADS_STATE_ID = "open_notebook:embedding_heads"
+
+# Indexed table -> index name
+VECTOR_INDEXES: Dict[str, str] = {
+    "source_embedding": "idx_source_embedding_vector",
+    "source_insight": "idx_source_insight_vector",
+    "note": "idx_note_vector",
+}
+
+# Same columns as the corresponding branches of fn::vector_search
+SEARCH_PROJECTIONS: Dict[str, str] = {
+    "source_embedding": (
+        "source.id AS id, source.title AS title, content, source.id AS parent_id"
+    ),
+    "source_insight": (
+        "id, insight_type + ' - ' + (source.title OR '') AS title, content, "
+        "source.id AS parent_id"
+    ),
+    "note": "id, title, content, id AS parent_id",
+}
+
+
+def vector_index_kind() -> Optional[str]:
+    """Configured index type ("hnsw" or "mtree"), or None when disabled."""
+    value = os.getenv("VECTOR_INDEX", "hnsw").strip().lower()
+    if value in VECTOR_INDEX_KINDS:
+        return value
+    if value in ("off", "false", "0", "no"):
+        return None
+    logger.warning(f"Invalid VECTOR_INDEX value: '{value}'. Using default: hnsw")
+    return "hnsw"
+
+
+def vector_search_backend() -> str:
+    """Where vector search runs: "surreal" (default) or "local" (in-process)."""
+    value = os.getenv("VECTOR_SEARCH_BACKEND", "surreal").strip().lower()
+    if value not in VECTOR_SEARCH_BACKENDS:
+        logger.warning(
+            f"Invalid VECTOR_SEARCH_BACKEND value: '{value}'. Using default: surreal"
+        )
+        return "surreal"
+    return value
+
+
+@dataclass
+class VectorIndexState:
+    """What the open_notebook:vector_index record says about the indexes."""
+
+    kind: Optional[str] = None
+    dimension: Optional[int] = None
+    status: str = "missing"  # "missing", "building", "ready" or "blocked"
+    # Unix time the current build started (status "building")
+    started_at: Optional[float] = None
+
+    def usable_for(self, dimension: int) -> bool:
+        return self.status == "ready" and self.dimension == dimension
+
+    def build_is_stale(self) -> bool:
+        """A build that has run longer than VECTOR_INDEX_BUILD_TIMEOUT died."""
+        return self.status == "building" and (
+            self.started_at is None or time.time() - self.started_at > _build_timeout()
+        )
+
+
+def _build_timeout() -> int:
+    return env_int("VECTOR_INDEX_BUILD_TIMEOUT", 3600, minimum=1)
+
+
+_cached_state: Optional[Tuple[float, VectorIndexState]] = None
+# Dimension -> time.monotonic() of the build submitted by this process
+_builds_submitted: Dict[int, float] = {}
+
+
+async def get_vector_index_state(refresh: bool = False) -> VectorIndexState:
+    """Index state, cached for VECTOR_INDEX_STATE_TTL seconds."""
+    global _cached_state
+    now = time.monotonic()
+    if not refresh and _cached_state and _cached_state[0] > now:
+        return _cached_state[1]
+    result = await repo_query(
+        "SELECT * FROM ONLY $id", {"id": ensure_record_id(VECTOR_INDEX_STATE_ID)}
+    )
+    record = result[0] if isinstance(result, list) and result else result
+    state = VectorIndexState()
+    if isinstance(record, dict):
+        state = VectorIndexState(
+            kind=record.get("kind"),
+            dimension=record.get("dimension"),
+            status=record.get("status") or "missing",
+            started_at=record.get("started_at"),
+        )
+    _cached_state = (now + env_int("VECTOR_INDEX_STATE_TTL", 30), state)
+    return state
+
+
+async def _save_state(state: VectorIndexState) -> None:
+    global _cached_state
+    await repo_upsert(
+        "open_notebook", VECTOR_INDEX_STATE_ID, asdict(state), add_timestamp=True
+    )
+    _cached_state = (
+        time.monotonic() + env_int("VECTOR_INDEX_STATE_TTL", 30),
+        state,
+    )
+
+
+def index_definition(name: str, table: str, dimension: int, kind: str) -> str:
+    """DEFINE INDEX statement for the embedding field of a table."""
+    if kind == "mtree":
+        spec = f"MTREE DIMENSION {dimension} DIST COSINE"
+    else:
+        efc = env_int("VECTOR_INDEX_EFC", 150, minimum=1)
+        m = env_int("VECTOR_INDEX_M", 12, minimum=2)
+        spec = f"HNSW DIMENSION {dimension} DIST COSINE EFC {efc} M {m}"
+    return f"DEFINE INDEX OVERWRITE {name} ON TABLE {table} FIELDS embedding {spec}"
+
+
+async def drop_vector_indexes() -> None:
+    await repo_query_many(
+        [
+            f"REMOVE INDEX IF EXISTS {name} ON TABLE {table}"
+            for table, name in VECTOR_INDEXES.items()
+        ]
+    )
+    await _save_state(VectorIndexState())
+    logger.info("Dropped vector indexes")
+
+
+async def count_mismatched_rows(dimension: int) -> Dict[str, int]:
+    """Rows per table whose embedding has another dimension."""
+    results = await repo_query_many(
+        [
+            (
+                f"SELECT count() AS rows FROM {table} WHERE embedding != NONE "
+                "AND array::len(embedding) != $dimension GROUP ALL",
+                {"dimension": dimension},
+            )
+            for table in VECTOR_INDEXES
+        ]
+    )
+    return {
+        table: result[0]["rows"] if result else 0
+        for table, result in zip(VECTOR_INDEXES, results)
+    }
+
+
+async def build_vector_index(dimension: int) -> VectorIndexState:
+    """(Re)define the vector indexes for embeddings of the given dimension."""
+    if vector_search_backend() == "local":
+        from open_notebook.database.local_vector_index import get_local_vector_index
+
+        await get_local_vector_index().build(dimension)
+        return VectorIndexState(kind="local", dimension=dimension, status="ready")
+    kind = vector_index_kind()
+    if kind is None:
+        await drop_vector_indexes()
+        return VectorIndexState()
+
+    mismatched = {
+        table: rows
+        for table, rows in (await count_mismatched_rows(dimension)).items()
+        if rows
+    }
+    if mismatched:
+        logger.warning(
+            f"Not building {dimension}-dimension vector indexes: rows with other "
+            f"dimensions remain ({mismatched}). Rebuild embeddings first."
+        )
+        state = VectorIndexState(kind=kind, dimension=dimension, status="blocked")
+        await _save_state(state)
+        return state
+
+    await _save_state(
+        VectorIndexState(
+            kind=kind, dimension=dimension, status="building", started_at=time.time()
+        )
+    )
+    try:
+        for table, name in VECTOR_INDEXES.items():
+            start = time.time()
+            await repo_query(index_definition(name, table, dimension, kind))
+            logger.info(
+                f"Built {kind} index on {table}.embedding ({dimension} dimensions) "
+                f"in {time.time() - start:.1f}s"
+            )
+    except Exception:
+        await drop_vector_indexes()
+        raise
+    state = VectorIndexState(kind=kind, dimension=dimension, status="ready")
+    await _save_state(state)
+    return state
+
+
+async def ensure_vector_index(dimension: int) -> None:
+    """
+    Make sure vectors of this dimension can be written and will be indexed.
+
+    Called before embeddings are stored. Drops indexes of another dimension
+    (they would reject the rows) and queues build_vector_index once per
+    process for a dimension without an index. A build still "building" after
+    VECTOR_INDEX_BUILD_TIMEOUT is assumed dead and queued again.
+    """
+    if vector_search_backend() == "local":
+        from open_notebook.database.local_vector_index import get_local_vector_index
+
+        if await get_local_vector_index().ensure_dimension(dimension):
+            return
+        _submit_build(dimension)
+        return
+    if vector_index_kind() is None:
+        return
+    state = await get_vector_index_state()
+    if _covers(state, dimension):
+        return
+    state = await get_vector_index_state(refresh=True)
+    if _covers(state, dimension):
+        return
+    if state.status in ("ready", "building") and state.dimension != dimension:
+        logger.info(
+            f"Embedding dimension changed from {state.dimension} to {dimension}; "
+            "dropping vector indexes"
+        )
+        await drop_vector_indexes()
+    elif state.status == "building":
+        logger.warning(
+            f"Vector index build for {dimension} dimensions did not finish "
+            f"within {_build_timeout()}s; queueing it again"
+        )
+        _builds_submitted.pop(dimension, None)
+    _submit_build(dimension)
+
+
+def _covers(state: VectorIndexState, dimension: int) -> bool:
+    """Ready for this dimension, or a build for it is still running."""
+    if state.dimension != dimension:
+        return False
+    return state.status == "ready" or (
+        state.status == "building" and not state.build_is_stale()
+    )
+
+
+def _submit_build(dimension: int) -> None:
+    submitted = _builds_submitted.get(dimension)
+    if submitted is not None and time.monotonic() - submitted < _build_timeout():
+        return
+    _builds_submitted[dimension] = time.monotonic()
+    submit_command("open_notebook", "build_vector_index", {"dimension": dimension})
+    logger.debug(f"Submitted build_vector_index for {dimension} dimensions")
+
+
+def vector_index_build_finished(dimension: int) -> None:
+    """Let ensure_vector_index queue another build for this dimension."""
+    _builds_submitted.pop(dimension, None)
+
+
+def knn_operator(k: int, kind: str, ef: Optional[int] = None) -> str:
+    """KNN operator answered by the index (ef only applies to HNSW)."""
+    if kind == "mtree":
+        return f"<|{k}|>"
+    ef = max(ef or env_int("VECTOR_INDEX_EF", 64, minimum=1), k)
+    return f"<|{k},{ef}|>"
+
+
+def rerank_candidates(match_count: int) -> int:
+    """
+    Chunks fetched per table before they are grouped into items.
+
+    Used by the first stage of two-stage search and by KNN queries: one
+    long source can fill the nearest match_count chunks on its own, so
+    asking for only match_count would return fewer items than the scan.
+    """
+    return max(env_int("VECTOR_SEARCH_RERANK_CANDIDATES", 100, minimum=1), match_count)
+
+
+_cached_head_dimension: Optional[Tuple[float, int]] = None
+
+
+async def embedding_heads_ready(dimension: int) -> bool:
+    """Whether every stored embedding has a head of ``dimension`` components.
+
+    fn::vector_search_two_stage never finds rows without a head, so it is only
+    used once the storage conversion has recorded that it wrote them all.
+    """
+    global _cached_head_dimension
+    now = time.monotonic()
+    if not _cached_head_dimension or _cached_head_dimension[0] <= now:
+        result = await repo_query(
+            "SELECT * FROM ONLY $id",
+            {"id": ensure_record_id(EMBEDDING_HEADS_STATE_ID)},
+        )
+        record = result[0] if isinstance(result, list) and result else result
+        recorded = record.get("dimension") if isinstance(record, dict) else None
+        _cached_head_dimension = (
+            now + env_int("VECTOR_INDEX_STATE_TTL", 30),
+            recorded or 0,
+        )
+    return dimension > 0 and _cached_head_dimension[1] == dimension
+
+
+async def record_embedding_heads(dimension: int) -> None:
+    """Record the head size every stored embedding now has (0: no heads)."""
+    global _cached_head_dimension
+    await repo_upsert(
+        "open_notebook",
+        EMBEDDING_HEADS_STATE_ID,
+        {"dimension": dimension},
+        add_timestamp=True,
+    )
+    _cached_head_dimension = (
+        time.monotonic() + env_int("VECTOR_INDEX_STATE_TTL", 30),
+        dimension,
+    )
+
+
+def merge_search_results(
+    rows: Sequence[Dict[str, Any]], match_count: int, min_similarity: float
+) -> List[Dict[str, Any]]:
+    """Group chunk hits by item the way fn::vector_search does."""
+    grouped: Dict[Tuple[str, str, Any], Dict[str, Any]] = {}
+    for row in rows:
+        if row.get("id") is None or row["similarity"] < min_similarity:
+            continue
+        key = (str(row["id"]), str(row.get("parent_id")), row.get("title"))
+        hit = grouped.get(key)
+        if hit is None:
+            grouped[key] = {
+                "id": row["id"],
+                "parent_id": row.get("parent_id"),
+                "title": row.get("title"),
+                "similarity": row["similarity"],
+                "matches": [row.get("content")],
+            }
+        else:
+            hit["similarity"] = max(hit["similarity"], row["similarity"])
+            hit["matches"].append(row.get("content"))
+    ranked = sorted(grouped.values(), key=lambda hit: hit["similarity"], reverse=True)
+    return ranked[:match_count]
+
+
+def _search_tables(sources: bool, show_notes: bool) -> List[str]:
+    return (["source_embedding", "source_insight"] if sources else []) + (
+        ["note"] if show_notes else []
+    )
+
+
+def knn_select(table: str, operator: str) -> str:
+    """Chunk hits of one table, with the columns of fn::vector_search."""
+    return (
+        f"SELECT {SEARCH_PROJECTIONS[table]}, "
+        "1 - vector::distance::knn() AS similarity "
+        f"FROM {table} WHERE embedding {operator} $query"
+    )
+
+
+def knn_hits_expression(
+    match_count: int, sources: bool, show_notes: bool, kind: str
+) -> str:
+    """
+    Subquery with knn_vector_search's results, for use inside other queries.
+
+    Binds $query, $min_similarity and $candidates (the number of items).
+    """
+    operator = knn_operator(rerank_candidates(match_count), kind)
+    selects = ", ".join(
+        f"({knn_select(table, operator)})"
+        for table in _search_tables(sources, show_notes)
+    )
+    if not selects:
+        return "[]"
+    # Ordered outside the GROUP BY, which would sort by the group key
+    return (
+        "(SELECT * FROM (SELECT id, parent_id, title, "
+        "math::max(similarity) AS similarity, array::flatten(content) AS matches "
+        f"FROM array::concat([], {selects}) "
+        "WHERE id != NONE AND similarity >= $min_similarity "
+        "GROUP BY id, parent_id, title) "
+        "ORDER BY similarity DESC LIMIT $candidates)"
+    )
+
+
+async def knn_vector_search(
+    query: List[float],
+    match_count: int,
+    sources: bool,
+    show_notes: bool,
+    min_similarity: float,
+    kind: str,
+) -> List[Dict[str, Any]]:
+    """fn::vector_search answered from the vector indexes, in one round-trip."""
+    tables = _search_tables(sources, show_notes)
+    if not tables:
+        return []
+    operator = knn_operator(rerank_candidates(match_count), kind)
+    results = await repo_query_many(
+        [(knn_select(table, operator), {"query": query}) for table in tables]
+    )
+    return merge_search_results(
+        [row for result in results for row in result], match_count, min_similarity
+    )
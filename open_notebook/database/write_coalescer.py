@@ -0,0 +1,240 @@
+"""Per-table write coalescing for SurrealDB.
+
+During batch imports many commands write to the same table at once
+(``source_insight`` records from parallel transformations, embedding updates
+from parallel embed jobs). Each concurrent write is its own SurrealDB
+transaction, and overlapping transactions on one table conflict and get
+retried. A retry can throw away an LLM or embedding result that was already
+paid for.
+
+With coalescing enabled for a table, writes are funnelled into a queue
+drained by a single writer task. The writer flushes micro-batches: up to
+``max_batch`` writes or whatever arrives within ``max_delay``. Each batch
+runs as one statement, or one transaction for updates. Callers in the same
+process no longer race each other; throughput grows with worker count
+because one round-trip carries many writes.
+
+If a batch fails on anything other than a conflict, each write in it is
+retried on its own, so one bad row only fails its own caller.
+
+Environment Variables:
+    SURREAL_WRITE_COALESCE_TABLES: Comma-separated tables to coalesce (default: none)
+    SURREAL_WRITE_COALESCE_MAX_BATCH: Maximum writes per flush (default: 100)
+    SURREAL_WRITE_COALESCE_MAX_DELAY_MS: Wait for more writes before flushing (default: 10)
+"""
+
+import asyncio
+import os
+import random
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from loguru import logger
+from surrealdb import RecordID  # type: ignore
+
+from open_notebook.database.bulk import is_transaction_conflict
+from open_notebook.database.repository import (
+    ensure_record_id,
+    repo_query,
+    repo_query_many,
+)
+from open_notebook.utils.env import env_int
+
+_CONFLICT_RETRIES = 5
+
+
+def coalesced_tables() -> set:
+    value = os.getenv("SURREAL_WRITE_COALESCE_TABLES", "")
+    return {table.strip() for table in value.split(",") if table.strip()}
+
+
+@dataclass
+class _PendingWrite:
+    kind: str  # "create" or "merge"
+    payload: Any
+    future: asyncio.Future = field(repr=False)
+
+
+@dataclass
+class CoalescerStats:
+    writes: int = 0
+    flushes: int = 0
+    conflicts: int = 0
+    fallbacks: int = 0
+
+    @property
+    def avg_batch_size(self) -> float:
+        return self.writes / self.flushes if self.flushes else 0.0
+
+
+class WriteCoalescer:
+    """Single-writer queue that flushes micro-batches for one table."""
+
+    def __init__(
+        self,
+        table: str,
+        max_batch: Optional[int] = None,
+        max_delay: Optional[float] = None,
+    ):
+        self.table = table
+        self.max_batch = max_batch or env_int(
+            "SURREAL_WRITE_COALESCE_MAX_BATCH", 100, minimum=1
+        )
+        self.max_delay = (
+            max_delay
+            if max_delay is not None
+            else env_int("SURREAL_WRITE_COALESCE_MAX_DELAY_MS", 10) / 1000
+        )
+        self.stats = CoalescerStats()
+        self._queue: "asyncio.Queue[_PendingWrite]" = asyncio.Queue()
+        self._writer: Optional[asyncio.Task] = None
+
+    async def create(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue a new record and return it once written."""
+        return await self._submit("create", dict(data))
+
+    async def merge(
+        self, record_id: Union[str, RecordID], data: Dict[str, Any]
+    ) -> None:
+        """Queue a MERGE of ``data`` into an existing record."""
+        await self._submit("merge", (ensure_record_id(record_id), dict(data)))
+
+    async def _submit(self, kind: str, payload: Any) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait(_PendingWrite(kind, payload, future))
+        if self._writer is None or self._writer.done():
+            # The writer exits when the queue drains, so no task outlives a burst
+            self._writer = asyncio.create_task(self._drain())
+        return await future
+
+    async def _drain(self) -> None:
+        while not self._queue.empty():
+            batch = [self._queue.get_nowait()]
+            deadline = asyncio.get_running_loop().time() + self.max_delay
+            while len(batch) < self.max_batch:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            for kind in ("create", "merge"):
+                writes = [write for write in batch if write.kind == kind]
+                if writes:
+                    await self._flush(kind, writes)
+
+    async def _flush(self, kind: str, writes: List[_PendingWrite]) -> None:
+        self.stats.flushes += 1
+        self.stats.writes += len(writes)
+        try:
+            results = await self._write_with_retry(kind, writes)
+        except Exception as e:
+            if len(writes) == 1:
+                _settle(writes[0], error=e)
+                return
+            # Isolate the failing write instead of failing everyone in the batch
+            self.stats.fallbacks += 1
+            logger.debug(
+                f"Coalesced {kind} of {len(writes)} rows into {self.table} failed "
+                f"({e}); retrying individually"
+            )
+            for write in writes:
+                try:
+                    [result] = await self._write_with_retry(kind, [write])
+                    _settle(write, result=result)
+                except Exception as single_error:
+                    _settle(write, error=single_error)
+            return
+        for write, result in zip(writes, results):
+            _settle(write, result=result)
+
+    async def _write_with_retry(
+        self, kind: str, writes: List[_PendingWrite]
+    ) -> List[Any]:
+        for attempt in range(1, _CONFLICT_RETRIES + 1):
+            try:
+                if kind == "create":
+                    return await self._write_creates(writes)
+                return await self._write_merges(writes)
+            except RuntimeError as e:
+                # Other processes may still write the same table
+                if not is_transaction_conflict(e) or attempt == _CONFLICT_RETRIES:
+                    raise
+                self.stats.conflicts += 1
+                await asyncio.sleep(
+                    min(0.05 * 2 ** (attempt - 1), 1.0) * (0.5 + random.random())
+                )
+        return []  # pragma: no cover - loop always returns or raises
+
+    async def _write_creates(self, writes: List[_PendingWrite]) -> List[Any]:
+        rows = [write.payload for write in writes]
+        created = await repo_query(f"INSERT INTO {self.table} $rows", {"rows": rows})
+        if not isinstance(created, list) or len(created) != len(rows):
+            raise RuntimeError(
+                f"Expected {len(rows)} created rows in {self.table}, "
+                f"got {len(created) if isinstance(created, list) else created!r}"
+            )
+        return created
+
+    async def _write_merges(self, writes: List[_PendingWrite]) -> List[Any]:
+        statements: List[Tuple[str, Dict[str, Any]]] = []
+        for index, write in enumerate(writes):
+            record_id, data = write.payload
+            statements.append(
+                (
+                    f"UPDATE $id_{index} MERGE $data_{index} RETURN NONE",
+                    {f"id_{index}": record_id, f"data_{index}": data},
+                )
+            )
+        await repo_query_many(statements, transaction=len(statements) > 1)
+        return [None] * len(writes)
+
+
+def _settle(
+    write: _PendingWrite, result: Any = None, error: Optional[BaseException] = None
+) -> None:
+    if write.future.done():  # Caller was cancelled
+        return
+    if error is not None:
+        write.future.set_exception(error)
+    else:
+        write.future.set_result(result)
+
+
+# Coalescers are bound to the loop that created their queue and writer task
+_LoopCoalescers = Dict[str, WriteCoalescer]
+_coalescers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopCoalescers]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_write_coalescer(table: str) -> WriteCoalescer:
+    loop = asyncio.get_running_loop()
+    loop_coalescers = _coalescers.setdefault(loop, {})
+    coalescer = loop_coalescers.get(table)
+    if coalescer is None:
+        coalescer = loop_coalescers[table] = WriteCoalescer(table)
+    return coalescer
+
+
+async def coalesced_create(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Create a record, through the table's coalescer when one is enabled."""
+    if table in coalesced_tables():
+        return await get_write_coalescer(table).create(data)
+    result = await repo_query(f"CREATE {table} CONTENT $data", {"data": data})
+    if not result:
+        raise RuntimeError(f"Failed to create record in {table}")
+    return result[0]
+
+
+async def coalesced_merge(
+    record_id: Union[str, RecordID], data: Dict[str, Any]
+) -> None:
+    """MERGE data into a record, through its table's coalescer when enabled."""
+    rid = ensure_record_id(record_id)
+    if rid.table_name in coalesced_tables():
+        await get_write_coalescer(rid.table_name).merge(rid, data)
+        return
+    await repo_query("UPDATE $id MERGE $data RETURN NONE", {"id": rid, "data": data})
@@ -1,10 +1,25 @@
+import re
 from datetime import datetime
-from typing import Any, ClassVar, Dict, List, Optional, Type, TypeVar, Union, cast
+from typing import (
+    Any,
+    AsyncIterator,
+    ClassVar,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Type,
+    TypeVar,
+    Union,
+    cast,
+)
 
 from loguru import logger
 from pydantic import (
     BaseModel,
     ConfigDict,
+    PrivateAttr,
     ValidationError,
     field_validator,
     model_validator,
@@ -16,9 +31,11 @@ from open_notebook.database.repository import (
     repo_delete,
     repo_query,
     repo_relate,
+    repo_scan,
     repo_update,
     repo_upsert,
 )
+from open_notebook.domain.entity_cache import entity_cache_enabled, get_entity_cache
 from open_notebook.exceptions import (
     DatabaseOperationError,
     InvalidInputError,
@@ -27,16 +44,128 @@ from open_notebook.exceptions import (
 
 T = TypeVar("T", bound="ObjectModel")
 
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
 
 class ObjectModel(BaseModel):
     id: Optional[str] = None
     table_name: ClassVar[str] = ""
     nullable_fields: ClassVar[set[str]] = set()  # Fields that can be saved as None
+    # Stored fields the model never reads (e.g. embedding vectors); left out
+    # of SELECTs unless a projection asks for them explicitly
+    default_omit: ClassVar[set[str]] = set()
+    # Opt-in to the in-process entity cache (see entity_cache.py); only for
+    # small, frequently read tables
+    cache_enabled: ClassVar[bool] = False
     created: Optional[datetime] = None
     updated: Optional[datetime] = None
 
+    _unloaded_fields: Set[str] = PrivateAttr(default_factory=set)
+    _lazy_values: Dict[str, Any] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def _select_clause(
+        cls,
+        fields: Optional[Iterable[str]] = None,
+        omit: Optional[Iterable[str]] = None,
+    ) -> str:
+        """Build the projection part of a SELECT for this model."""
+        if fields is not None and omit is not None:
+            raise InvalidInputError("Use either fields or omit, not both")
+        if fields is not None:
+            selected = list(dict.fromkeys(["id", *fields]))
+            cls._validate_field_names(selected)
+            return ", ".join(selected)
+        omitted = list(dict.fromkeys([*cls.default_omit, *(omit or [])]))
+        cls._validate_field_names(omitted)
+        return f"* OMIT {', '.join(omitted)}" if omitted else "*"
+
+    @staticmethod
+    def _validate_field_names(names: List[str]) -> None:
+        invalid = [name for name in names if not _FIELD_NAME.match(name)]
+        if invalid:
+            raise InvalidInputError(f"Invalid field names: {', '.join(invalid)}")
+
+    @classmethod
+    def _unloaded_for(
+        cls,
+        fields: Optional[Iterable[str]] = None,
+        omit: Optional[Iterable[str]] = None,
+    ) -> Set[str]:
+        """Model fields a projected load leaves out."""
+        if fields is not None:
+            return set(cls.model_fields) - {"id", *fields}
+        return set(cls.model_fields) & set(omit or [])
+
+    def _mark_unloaded(self, unloaded: Set[str]) -> None:
+        self._unloaded_fields = set(unloaded)
+
+    def is_loaded(self, field: str) -> bool:
+        """Whether ``field`` holds its stored value rather than a projection gap."""
+        return field not in self._unloaded_fields
+
+    async def load_fields(self, *fields: str) -> Dict[str, Any]:
+        """
+        Fetch fields left out when this object was loaded and return them.
+
+        Model fields are set on the instance so later attribute access sees
+        them; stored fields the model does not declare (such as ``embedding``)
+        are kept on the instance and returned from memory on the next call.
+        """
+        if self.id is None:
+            raise InvalidInputError("Cannot load fields for an object without an ID")
+        self._validate_field_names(list(fields))
+        missing = [
+            field
+            for field in fields
+            if field in self._unloaded_fields
+            or (
+                field not in self.__class__.model_fields
+                and field not in self._lazy_values
+            )
+        ]
+        if missing:
+            try:
+                result = await repo_query(
+                    f"SELECT {', '.join(missing)} FROM $id",
+                    {"id": ensure_record_id(self.id)},
+                )
+            except Exception as e:
+                logger.error(f"Error loading fields for {self.id}: {str(e)}")
+                raise DatabaseOperationError(e)
+            if not result:
+                raise NotFoundError(f"Object with id {self.id} not found")
+            row = result[0]
+            for field in missing:
+                value = row.get(field)
+                if field in self.__class__.model_fields:
+                    setattr(self, field, value)
+                    self._unloaded_fields.discard(field)
+                else:
+                    self._lazy_values[field] = value
+        return {
+            field: self._lazy_values[field]
+            if field in self._lazy_values
+            else getattr(self, field)
+            for field in fields
+        }
+
     @classmethod
-    async def get_all(cls: Type[T], order_by=None) -> List[T]:
+    async def get_all(
+        cls: Type[T],
+        order_by=None,
+        fields: Optional[List[str]] = None,
+        omit: Optional[List[str]] = None,
+    ) -> List[T]:
+        """
+        Fetch every record of this model.
+
+        ``fields`` limits the load to the given columns (``id`` is always
+        included); ``omit`` loads everything except the given columns. Fields
+        left out can be fetched later with ``load_fields``.
+        """
+        projection = cls._select_clause(fields, omit)
+        unloaded = cls._unloaded_for(fields, omit)
         try:
             # If called from a specific subclass, use its table_name
             if cls.table_name:
@@ -48,17 +177,20 @@ class ObjectModel(BaseModel):
                     "get_all() must be called from a specific model class"
                 )
             if order_by:
-                query = f"SELECT * FROM {table_name} ORDER BY {order_by}"
+                query = f"SELECT {projection} FROM {table_name} ORDER BY {order_by}"
             else:
-                query = f"SELECT * FROM {table_name}"
+                query = f"SELECT {projection} FROM {table_name}"
 
             result = await repo_query(query)
             objects = []
             for obj in result:
                 try:
-                    objects.append(target_class(**obj))
+                    instance = target_class(**obj)
                 except Exception as e:
                     logger.critical(f"Error creating object: {str(e)}")
+                    continue
+                instance._mark_unloaded(unloaded)
+                objects.append(instance)
 
             return objects
         except Exception as e:
@@ -67,9 +199,70 @@ class ObjectModel(BaseModel):
             raise DatabaseOperationError(e)
 
     @classmethod
-    async def get(cls: Type[T], id: str) -> T:
+    async def iter_all(
+        cls: Type[T],
+        batch_size: int = 500,
+        order_by: Optional[str] = None,
+        where: Optional[str] = None,
+        vars: Optional[Dict[str, Any]] = None,
+        fields: Optional[List[str]] = None,
+        omit: Optional[List[str]] = None,
+    ) -> AsyncIterator[T]:
+        """
+        Stream records of this model without loading the whole table.
+
+        Pages are fetched ``batch_size`` rows at a time with keyset cursors
+        (see ``repo_scan``) and models are built only as they are consumed.
+        ``order_by`` takes a single ``"field [asc|desc]"`` (default: id);
+        ``where`` is a SurrealQL condition with its parameters in ``vars``.
+        Accepts the same ``fields``/``omit`` projection as ``get_all``.
+        """
+        if not cls.table_name:
+            raise InvalidInputError(
+                "iter_all() must be called from a specific model class"
+            )
+        projection = cls._select_clause(fields, omit)
+        unloaded = cls._unloaded_for(fields, omit)
+        try:
+            pages = repo_scan(
+                cls.table_name,
+                projection=projection,
+                where=where,
+                vars=vars,
+                batch_size=batch_size,
+                order_by=order_by,
+            )
+            async for page in pages:
+                for row in page:
+                    try:
+                        instance = cls(**row)
+                    except Exception as e:
+                        logger.critical(f"Error creating object: {str(e)}")
+                        continue
+                    instance._mark_unloaded(unloaded)
+                    yield instance
+        except ValueError as e:
+            raise InvalidInputError(str(e))
+        except Exception as e:
+            logger.error(f"Error iterating {cls.table_name}: {str(e)}")
+            logger.exception(e)
+            raise DatabaseOperationError(e)
+
+    @classmethod
+    async def get(
+        cls: Type[T],
+        id: str,
+        fields: Optional[List[str]] = None,
+        omit: Optional[List[str]] = None,
+    ) -> T:
+        """
+        Fetch one record by id.
+
+        Accepts the same ``fields``/``omit`` projection as ``get_all``.
+        """
         if not id:
             raise InvalidInputError("ID cannot be empty")
+        cls._select_clause(fields, omit)  # Reject bad projections up front
         try:
             # Get the table name from the ID (everything before the first colon)
             table_name = id.split(":")[0] if ":" in id else id
@@ -84,9 +277,24 @@ class ObjectModel(BaseModel):
                     raise InvalidInputError(f"No class found for table {table_name}")
                 target_class = cast(Type[T], found_class)
 
-            result = await repo_query("SELECT * FROM $id", {"id": ensure_record_id(id)})
+            cacheable = (
+                target_class._uses_entity_cache() and fields is None and omit is None
+            )
+            if cacheable:
+                cached = get_entity_cache().get(str(id))
+                if cached is not None:
+                    return target_class(**cached)
+
+            projection = target_class._select_clause(fields, omit)
+            result = await repo_query(
+                f"SELECT {projection} FROM $id", {"id": ensure_record_id(id)}
+            )
             if result:
-                return target_class(**result[0])
+                if cacheable:
+                    get_entity_cache().put(str(id), result[0])
+                instance = target_class(**result[0])
+                instance._mark_unloaded(target_class._unloaded_for(fields, omit))
+                return instance
             else:
                 raise NotFoundError(f"{table_name} with id {id} not found")
         except Exception as e:
@@ -94,6 +302,72 @@ class ObjectModel(BaseModel):
             logger.exception(e)
             raise NotFoundError(f"Object with id {id} not found - {str(e)}")
 
+    @classmethod
+    async def get_many(
+        cls: Type[T],
+        ids: List[str],
+        fields: Optional[List[str]] = None,
+        omit: Optional[List[str]] = None,
+    ) -> List[T]:
+        """
+        Fetch several records of this model in one query.
+
+        Results follow the order of ``ids``; ids that do not exist are skipped.
+        Bare ids without a table prefix are resolved against this model's table.
+        Accepts the same ``fields``/``omit`` projection as ``get_all``.
+        """
+        if not cls.table_name:
+            raise InvalidInputError(
+                "get_many() must be called from a specific model class"
+            )
+        if not ids:
+            return []
+        projection = cls._select_clause(fields, omit)
+        try:
+            full_ids = cls._qualify_ids(ids)
+            result = await repo_query(
+                f"SELECT {projection} FROM $ids",
+                {"ids": [ensure_record_id(record_id) for record_id in full_ids]},
+            )
+            objects = cls._order_by_ids(result, full_ids)
+            unloaded = cls._unloaded_for(fields, omit)
+            for obj in objects:
+                obj._mark_unloaded(unloaded)
+            return objects
+        except Exception as e:
+            logger.error(f"Error fetching {cls.table_name} records: {str(e)}")
+            logger.exception(e)
+            raise DatabaseOperationError(e)
+
+    @classmethod
+    def _qualify_ids(cls, ids: List[str]) -> List[str]:
+        """Prefix bare ids with the table name and drop duplicates, keeping order."""
+        full_ids = [
+            record_id if ":" in record_id else f"{cls.table_name}:{record_id}"
+            for record_id in ids
+        ]
+        return list(dict.fromkeys(full_ids))
+
+    @classmethod
+    def _order_by_ids(
+        cls: Type[T], rows: List[Dict[str, Any]], ids: List[str]
+    ) -> List[T]:
+        """Build models from rows, ordered like ``ids``."""
+        by_id: Dict[str, T] = {}
+        for row in rows or []:
+            try:
+                obj = cls(**row)
+            except Exception as e:
+                logger.critical(f"Error creating object: {str(e)}")
+                continue
+            if obj.id:
+                by_id[str(obj.id)] = obj
+        return [by_id[record_id] for record_id in ids if record_id in by_id]
+
+    @classmethod
+    def _uses_entity_cache(cls) -> bool:
+        return cls.cache_enabled and entity_cache_enabled()
+
     @classmethod
     def _get_class_by_table_name(cls, table_name: str) -> Optional[Type["ObjectModel"]]:
         """Find the appropriate subclass based on table_name."""
@@ -121,6 +395,9 @@ class ObjectModel(BaseModel):
         try:
             self.model_validate(self.model_dump(), strict=True)
             data = self._prepare_save_data()
+            # Never overwrite stored values the projection did not load
+            for field in self._unloaded_fields:
+                data.pop(field, None)
             data["updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
             repo_result: Union[List[Dict[str, Any]], Dict[str, Any]]
@@ -142,12 +419,16 @@ class ObjectModel(BaseModel):
             result_list: List[Dict[str, Any]] = (
                 repo_result if isinstance(repo_result, list) else [repo_result]
             )
+            if self._uses_entity_cache() and result_list and result_list[0].get("id"):
+                # Write-through: the stored row is what the next get() would read
+                get_entity_cache().put(str(result_list[0]["id"]), result_list[0])
             for key, value in result_list[0].items():
                 if hasattr(self, key):
                     if isinstance(getattr(self, key), BaseModel):
                         setattr(self, key, type(getattr(self, key))(**value))
                     else:
                         setattr(self, key, value)
+                    self._unloaded_fields.discard(key)
 
         except ValidationError as e:
             logger.error(f"Validation failed: {e}")
@@ -172,7 +453,11 @@ class ObjectModel(BaseModel):
             raise InvalidInputError("Cannot delete object without an ID")
         try:
             logger.debug(f"Deleting record with id {self.id}")
-            return await repo_delete(self.id)
+            deleted = await repo_delete(self.id)
+            # After the delete: a get() racing with it would cache the row again
+            if self.cache_enabled:
+                get_entity_cache().invalidate(str(self.id))
+            return deleted
         except Exception as e:
             logger.error(
                 f"Error deleting {self.__class__.table_name} with id {self.id}: {str(e)}"
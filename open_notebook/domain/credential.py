@@ -35,6 +35,7 @@ class Credential(ObjectModel):
     """
 
     table_name: ClassVar[str] = "credential"
+    cache_enabled: ClassVar[bool] = True
     nullable_fields: ClassVar[set[str]] = {
         "api_key",
         "base_url",
@@ -113,9 +114,14 @@ class Credential(ObjectModel):
         return credentials
 
     @classmethod
-    async def get(cls, id: str) -> "Credential":
+    async def get(
+        cls,
+        id: str,
+        fields: Optional[List[str]] = None,
+        omit: Optional[List[str]] = None,
+    ) -> "Credential":
         """Override get() to handle api_key decryption."""
-        instance = await super().get(id)
+        instance = await super().get(id, fields=fields, omit=omit)
         # Pydantic auto-wraps the raw DB string in SecretStr, so we need
         # to extract, decrypt, and re-wrap regardless of type.
         if instance.api_key:
@@ -129,9 +135,14 @@ class Credential(ObjectModel):
         return instance
 
     @classmethod
-    async def get_all(cls, order_by=None) -> List["Credential"]:
+    async def get_all(
+        cls,
+        order_by=None,
+        fields: Optional[List[str]] = None,
+        omit: Optional[List[str]] = None,
+    ) -> List["Credential"]:
         """Override get_all() to handle api_key decryption."""
-        instances = await super().get_all(order_by=order_by)
+        instances = await super().get_all(order_by=order_by, fields=fields, omit=omit)
         for instance in instances:
             if instance.api_key:
                 raw = (
@@ -157,7 +168,7 @@ class Credential(ObjectModel):
 
     def _prepare_save_data(self) -> Dict[str, Any]:
         """Override to encrypt api_key before storage."""
-        data = {}
+        data: Dict[str, Any] = {}
         for key, value in self.model_dump().items():
             if key == "api_key":
                 # Handle SecretStr: extract, encrypt, store
@@ -186,6 +197,13 @@ class Credential(ObjectModel):
             # Decrypt if DB returned an encrypted string
             decrypted = decrypt_value(self.api_key)
             object.__setattr__(self, "api_key", SecretStr(decrypted))
+        _invalidate_model_cache()
+
+    async def delete(self) -> bool:
+        try:
+            return await super().delete()
+        finally:
+            _invalidate_model_cache()
 
     @classmethod
     def _from_db_row(cls, row: dict) -> "Credential":
@@ -197,3 +215,10 @@ class Credential(ObjectModel):
         elif api_key_val is None:
             row["api_key"] = None
         return cls(**row)
+
+
+def _invalidate_model_cache() -> None:
+    # Resolved models embed this credential's config (see ModelManager)
+    from open_notebook.ai.models import invalidate_model_cache
+
+    invalidate_model_cache()
@@ -0,0 +1,170 @@
+"""In-process cache of records loaded through ``ObjectModel.get``.
+
+Configuration records are read on almost every request:
+- models and credentials;
+- transformations;
+- episode and speaker profiles;
+- the current notebook.
+
+This cache keeps their rows in an LRU with a TTL, keyed by record id, and
+builds a fresh model from a copy of the row on every hit. Callers can
+therefore mutate what they get back without corrupting the cache.
+
+Only tables whose model sets ``cache_enabled = True`` are cached. Large or
+volatile tables (sources, notes, embeddings) never enter it. Entries are:
+- refreshed by ``ObjectModel.save``;
+- dropped by ``ObjectModel.delete``;
+- dropped by any update/delete event published on the ``SyncHookRegistry``.
+
+The TTL bounds staleness for writes made by other processes (API vs
+worker).
+
+Environment Variables:
+    ENTITY_CACHE_ENABLED: Set to "false" to bypass the cache (default: true)
+    ENTITY_CACHE_MAX_SIZE: Maximum cached records (default: 1000)
+    ENTITY_CACHE_TTL: Seconds an entry stays valid (default: 30)
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from open_notebook.database.sync_hooks import (
+    SyncEvent,
+    SyncEventType,
+    SyncHookRegistry,
+    get_sync_registry,
+)
+from open_notebook.utils.env import env_float, env_int
+
+# Events after which a cached copy of the entity can no longer be trusted
+_INVALIDATING_EVENTS = (
+    SyncEventType.NOTEBOOK_UPDATED,
+    SyncEventType.NOTEBOOK_DELETED,
+    SyncEventType.SOURCE_UPDATED,
+    SyncEventType.SOURCE_DELETED,
+    SyncEventType.NOTE_UPDATED,
+    SyncEventType.NOTE_DELETED,
+)
+
+
+def entity_cache_enabled() -> bool:
+    return os.getenv("ENTITY_CACHE_ENABLED", "true").lower() not in ("false", "0", "no")
+
+
+@dataclass
+class EntityCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class EntityCache:
+    """Thread-safe LRU + TTL map from record id to a stored row."""
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_size = int(
+            max_size if max_size is not None else env_int("ENTITY_CACHE_MAX_SIZE", 1000)
+        )
+        self.ttl = ttl if ttl is not None else env_float("ENTITY_CACHE_TTL", 30)
+        self.stats = EntityCacheStats()
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        # Shared by the API loop and worker threads running their own loops
+        self._lock = threading.Lock()
+        self._registry: Optional[SyncHookRegistry] = None
+
+    def get(self, record_id: str) -> Optional[Dict[str, Any]]:
+        """Return a private copy of the cached row, or None on a miss."""
+        self._ensure_subscribed()
+        with self._lock:
+            entry = self._entries.get(record_id)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            expires_at, row = entry
+            if expires_at <= time.monotonic():
+                del self._entries[record_id]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(record_id)
+            self.stats.hits += 1
+        return copy.deepcopy(row)
+
+    def put(self, record_id: str, row: Dict[str, Any]) -> None:
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        self._ensure_subscribed()
+        stored = copy.deepcopy(row)
+        with self._lock:
+            self._entries[record_id] = (time.monotonic() + self.ttl, stored)
+            self._entries.move_to_end(record_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def invalidate(self, record_id: str) -> None:
+        with self._lock:
+            if self._entries.pop(record_id, None) is not None:
+                self.stats.invalidations += 1
+
+    def invalidate_table(self, table: str) -> None:
+        prefix = f"{table}:"
+        with self._lock:
+            stale = [key for key in self._entries if key.startswith(prefix)]
+            for key in stale:
+                del self._entries[key]
+            self.stats.invalidations += len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        data = asdict(self.stats)
+        data.update(
+            size=size,
+            max_size=self.max_size,
+            ttl=self.ttl,
+            hit_ratio=round(self.stats.hit_ratio, 4),
+        )
+        return data
+
+    def _ensure_subscribed(self) -> None:
+        # The registry can be replaced (reset_sync_registry), so check identity
+        registry = get_sync_registry()
+        if registry is self._registry:
+            return
+        for event_type in _INVALIDATING_EVENTS:
+            registry.register(event_type, self._on_sync_event)
+        self._registry = registry
+
+    async def _on_sync_event(self, event: SyncEvent) -> None:
+        entity_id = str(event.entity_id)
+        if ":" not in entity_id:
+            entity_id = f"{event.entity_type}:{entity_id}"
+        self.invalidate(entity_id)
+
+
+_entity_cache: Optional[EntityCache] = None
+
+
+def get_entity_cache() -> EntityCache:
+    """Process-wide entity cache."""
+    global _entity_cache
+    if _entity_cache is None:
+        _entity_cache = EntityCache()
+    return _entity_cache
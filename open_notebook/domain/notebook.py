@@ -1,20 +1,52 @@
 import asyncio
 import os
 from pathlib import Path
-from typing import Any, ClassVar, Dict, List, Literal, Optional, Tuple, Union
+from typing import (
+    Any,
+    ClassVar,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Tuple,
+    Type,
+    TypeVar,
+    Union,
+)
 
 from loguru import logger
 from pydantic import BaseModel, ConfigDict, Field, field_validator
 from surreal_commands import submit_command
 from surrealdb import RecordID
 
-from open_notebook.database.repository import ensure_record_id, repo_query
+from open_notebook.database.local_vector_index import (
+    forget_vector_parents,
+    forget_vectors,
+    local_vector_search,
+)
+from open_notebook.database.repository import (
+    ensure_record_id,
+    repo_query,
+    repo_query_many,
+)
+from open_notebook.database.vector_index import (
+    embedding_heads_ready,
+    get_vector_index_state,
+    knn_hits_expression,
+    knn_vector_search,
+    rerank_candidates,
+    vector_search_backend,
+)
 from open_notebook.domain.base import ObjectModel
 from open_notebook.exceptions import DatabaseOperationError, InvalidInputError
+from open_notebook.utils.embedding_storage import head_dimensions
+
+T = TypeVar("T", bound=ObjectModel)
 
 
 class Notebook(ObjectModel):
     table_name: ClassVar[str] = "notebook"
+    cache_enabled: ClassVar[bool] = True
     name: str
     description: str
     archived: Optional[bool] = False
@@ -237,6 +269,7 @@ class Asset(BaseModel):
 
 class SourceEmbedding(ObjectModel):
     table_name: ClassVar[str] = "source_embedding"
+    default_omit: ClassVar[set[str]] = {"embedding"}
     content: str
 
     async def get_source(self) -> "Source":
@@ -256,6 +289,7 @@ class SourceEmbedding(ObjectModel):
 
 class SourceInsight(ObjectModel):
     table_name: ClassVar[str] = "source_insight"
+    default_omit: ClassVar[set[str]] = {"embedding"}
     insight_type: str
     content: str
 
@@ -273,6 +307,29 @@ class SourceInsight(ObjectModel):
             logger.exception(e)
             raise DatabaseOperationError(e)
 
+    @classmethod
+    async def get_for_sources(
+        cls, source_ids: List[str]
+    ) -> Dict[str, List["SourceInsight"]]:
+        """Fetch insights for many sources in one query, grouped by source id."""
+        if not source_ids:
+            return {}
+        try:
+            result = await repo_query(
+                "SELECT * OMIT embedding FROM source_insight WHERE source IN $source_ids",
+                {"source_ids": [ensure_record_id(sid) for sid in source_ids]},
+            )
+            return _group_insights_by_source(result)
+        except Exception as e:
+            logger.error(f"Error fetching insights for sources: {str(e)}")
+            logger.exception(e)
+            raise DatabaseOperationError("Failed to fetch insights for sources")
+
+    async def delete(self) -> bool:
+        deleted = await super().delete()
+        await forget_vectors([self.id])
+        return deleted
+
     async def save_as_note(self, notebook_id: Optional[str] = None) -> Any:
         source = await self.get_source()
         note = Note(
@@ -359,19 +416,22 @@ class Source(ObjectModel):
             return None
 
     async def get_context(
-        self, context_size: Literal["short", "long"] = "short"
+        self,
+        context_size: Literal["short", "long"] = "short",
+        insights: Optional[List[SourceInsight]] = None,
     ) -> Dict[str, Any]:
-        insights_list = await self.get_insights()
-        insights = [insight.model_dump() for insight in insights_list]
+        """Build the context dict; pass ``insights`` if already loaded to skip a query."""
+        insights_list = insights if insights is not None else await self.get_insights()
+        insights_data = [insight.model_dump() for insight in insights_list]
         if context_size == "long":
             return dict(
                 id=self.id,
                 title=self.title,
-                insights=insights,
+                insights=insights_data,
                 full_text=self.full_text,
             )
         else:
-            return dict(id=self.id, title=self.title, insights=insights)
+            return dict(id=self.id, title=self.title, insights=insights_data)
 
     async def get_embedded_chunks(self) -> int:
         try:
@@ -393,7 +453,7 @@ class Source(ObjectModel):
         try:
             result = await repo_query(
                 """
-                SELECT * FROM source_insight WHERE source=$id
+                SELECT * OMIT embedding FROM source_insight WHERE source=$id
                 """,
                 {"id": ensure_record_id(self.id)},
             )
@@ -416,8 +476,8 @@ class Source(ObjectModel):
         pool exhaustion when processing large documents. The embed_source command:
         1. Detects content type from file path
         2. Chunks text using content-type aware splitter
-        3. Generates all embeddings in a single API call
-        4. Bulk inserts source_embedding records
+        3. Embeds only chunks not already stored (diffed by content hash)
+        4. Bulk inserts new source_embedding records and drops vanished ones
 
         Returns:
             str: The command/job ID that can be used to track progress via the commands API
@@ -448,9 +508,7 @@ class Source(ObjectModel):
             return command_id_str
 
         except Exception as e:
-            logger.error(
-                f"Failed to submit embed_source job for source {self.id}: {e}"
-            )
+            logger.error(f"Failed to submit embed_source job for source {self.id}: {e}")
             logger.exception(e)
             raise DatabaseOperationError(e)
 
@@ -533,14 +591,26 @@ class Source(ObjectModel):
         # Delete associated embeddings and insights to prevent orphaned records
         try:
             source_id = ensure_record_id(self.id)
+            # Near-duplicate chunks of other sources (CHUNK_DEDUP=notebook)
+            # that link this source's chunks are re-embedded once they are gone
+            dependents = await repo_query(
+                "SELECT source FROM source_embedding WHERE duplicate_of.source = "
+                "$source_id AND source != $source_id GROUP BY source",
+                {"source_id": source_id},
+            )
             await repo_query(
                 "DELETE source_embedding WHERE source = $source_id",
                 {"source_id": source_id},
             )
+            for row in dependents:
+                submit_command(
+                    "open_notebook", "embed_source", {"source_id": str(row["source"])}
+                )
             await repo_query(
                 "DELETE source_insight WHERE source = $source_id",
                 {"source_id": source_id},
             )
+            await forget_vector_parents([source_id])
             logger.debug(f"Deleted embeddings and insights for source {self.id}")
         except Exception as e:
             logger.warning(
@@ -554,6 +624,7 @@ class Source(ObjectModel):
 
 class Note(ObjectModel):
     table_name: ClassVar[str] = "note"
+    default_omit: ClassVar[set[str]] = {"embedding"}
     title: Optional[str] = None
     note_type: Optional[Literal["human", "ai"]] = None
     content: Optional[str] = None
@@ -590,6 +661,11 @@ class Note(ObjectModel):
 
         return None
 
+    async def delete(self) -> bool:
+        deleted = await super().delete()
+        await forget_vector_parents([self.id])
+        return deleted
+
     async def add_to_notebook(self, notebook_id: str) -> Any:
         if not notebook_id:
             raise InvalidInputError("Notebook ID must be provided")
@@ -625,18 +701,168 @@ class ChatSession(ObjectModel):
         return await self.relate("refers_to", source_id)
 
 
+def _group_insights_by_source(
+    rows: List[Dict[str, Any]],
+) -> Dict[str, List[SourceInsight]]:
+    grouped: Dict[str, List[SourceInsight]] = {}
+    for row in rows or []:
+        source_id = str(row.get("source", ""))
+        grouped.setdefault(source_id, []).append(SourceInsight(**row))
+    return grouped
+
+
+async def get_context_records(
+    source_ids: List[str],
+    note_ids: List[str],
+    include_insights: bool = True,
+) -> Tuple[List[Source], Dict[str, List[SourceInsight]], List[Note]]:
+    """
+    Load sources, their insights and notes for context building in one round-trip.
+
+    Returns (sources, insights grouped by source id, notes). Sources and notes
+    follow the order of the given ids; missing records are skipped. If the
+    batch fails (e.g. on one malformed id), the records are loaded one by one
+    so that only the bad ones are skipped.
+    """
+    source_ids = Source._qualify_ids(source_ids)
+    note_ids = Note._qualify_ids(note_ids)
+    source_rids = [ensure_record_id(sid) for sid in source_ids]
+
+    statements: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+    if source_ids:
+        statements.append(("SELECT * FROM $source_ids", {"source_ids": source_rids}))
+        if include_insights:
+            statements.append(
+                (
+                    "SELECT * OMIT embedding FROM source_insight WHERE source IN $source_ids",
+                    {"source_ids": source_rids},
+                )
+            )
+    if note_ids:
+        statements.append(
+            (
+                "SELECT * OMIT embedding FROM $note_ids",
+                {"note_ids": [ensure_record_id(nid) for nid in note_ids]},
+            )
+        )
+    if not statements:
+        return [], {}, []
+
+    try:
+        results = iter(await repo_query_many(statements))
+        sources: List[Source] = []
+        insights: Dict[str, List[SourceInsight]] = {}
+        notes: List[Note] = []
+        if source_ids:
+            sources = Source._order_by_ids(next(results), source_ids)
+            if include_insights:
+                insights = _group_insights_by_source(next(results))
+        if note_ids:
+            notes = Note._order_by_ids(next(results), note_ids)
+        return sources, insights, notes
+    except Exception as e:
+        logger.warning(f"Batch load of context records failed ({e}); loading each")
+
+    try:
+        sources = [s for s in [await _get_or_none(Source, i) for i in source_ids] if s]
+        notes = [n for n in [await _get_or_none(Note, i) for i in note_ids] if n]
+        insights = {}
+        if include_insights and sources:
+            insights = await SourceInsight.get_for_sources(
+                [source.id for source in sources if source.id]
+            )
+        return sources, insights, notes
+    except Exception as e:
+        logger.error(f"Error loading context records: {str(e)}")
+        logger.exception(e)
+        raise DatabaseOperationError(e)
+
+
+async def _get_or_none(model_cls: Type[T], record_id: str) -> Optional[T]:
+    try:
+        return await model_cls.get(record_id)
+    except Exception as e:
+        logger.warning(f"Skipping context record {record_id}: {str(e)}")
+        return None
+
+
+def _search_scope(
+    notebook_id: Optional[str], source_ids: Optional[List[str]]
+) -> Dict[str, Any]:
+    """$notebook and $source_ids for the scoped search functions (migration 18)."""
+    return {
+        "notebook": ensure_record_id(notebook_id) if notebook_id else None,
+        "source_ids": (
+            [ensure_record_id(source_id) for source_id in source_ids]
+            if source_ids is not None
+            else None
+        ),
+    }
+
+
+async def _local_vector_hits(
+    embed: List[float],
+    results: int,
+    source: bool,
+    note: bool,
+    minimum_score: float,
+    scope: Dict[str, Any],
+) -> Optional[List[Dict[str, Any]]]:
+    """Vector hits from the local index, or None when it cannot answer."""
+    if vector_search_backend() != "local":
+        return None
+    try:
+        scope_ids = None
+        if scope["notebook"] is not None or scope["source_ids"] is not None:
+            scope_ids = await repo_query(
+                "RETURN fn::search_scope($notebook, $source_ids)", scope
+            )
+        return await local_vector_search(
+            embed, results, source, note, minimum_score, scope_ids
+        )
+    except Exception as e:
+        logger.warning(f"Local vector search failed, using SurrealDB: {e}")
+        return None
+
+
+async def _two_stage_vars(embed: List[float], results: int) -> Optional[Dict[str, Any]]:
+    """Vars of fn::vector_search_two_stage, or None until every row has a head."""
+    dims = head_dimensions()
+    if not dims or len(embed) <= dims or not await embedding_heads_ready(dims):
+        return None
+    return {"embed_head": embed[:dims], "rerank_candidates": rerank_candidates(results)}
+
+
 async def text_search(
-    keyword: str, results: int, source: bool = True, note: bool = True
+    keyword: str,
+    results: int,
+    source: bool = True,
+    note: bool = True,
+    notebook_id: Optional[str] = None,
+    source_ids: Optional[List[str]] = None,
 ):
+    """
+    BM25 search over sources, insights and notes.
+
+    notebook_id limits results to the sources and notes of a notebook, and
+    source_ids to those sources (notes are then only searched when a
+    notebook is given).
+    """
     if not keyword:
         raise InvalidInputError("Search keyword cannot be empty")
     try:
         search_results = await repo_query(
             """
             select *
-            from fn::text_search($keyword, $results, $source, $note)
+            from fn::text_search($keyword, $results, $source, $note, $notebook, $source_ids)
             """,
-            {"keyword": keyword, "results": results, "source": source, "note": note},
+            {
+                "keyword": keyword,
+                "results": results,
+                "source": source,
+                "note": note,
+                **_search_scope(notebook_id, source_ids),
+            },
         )
         return search_results
     except Exception as e:
@@ -651,28 +877,169 @@ async def vector_search(
     source: bool = True,
     note: bool = True,
     minimum_score=0.2,
+    notebook_id: Optional[str] = None,
+    source_ids: Optional[List[str]] = None,
 ):
+    """
+    Embedding similarity search, scoped like text_search.
+
+    Scoped searches compare the query with the notebook's (or the listed
+    sources') embeddings only, which fn::vector_search reads through the
+    reference and artifact edges. Scans run in two stages once the storage
+    conversion has given every embedding a head (EMBEDDING_HEAD_DIMENSIONS).
+    """
     if not keyword:
         raise InvalidInputError("Search keyword cannot be empty")
     try:
-        from open_notebook.utils.embedding import generate_embedding
+        from open_notebook.utils.embedding import embed_query
 
-        # Use unified embedding function (handles chunking if query is very long)
-        embed = await generate_embedding(keyword)
+        # Repeated and paginated searches reuse the cached query embedding
+        embed = await embed_query(keyword)
+        scope = _search_scope(notebook_id, source_ids)
+        scoped = notebook_id is not None or source_ids is not None
+
+        hits = await _local_vector_hits(
+            embed, results, source, note, minimum_score, scope
+        )
+        if hits is not None:
+            return hits
+
+        # Answer from the vector indexes when they hold this dimension;
+        # otherwise (or if the index query fails) scan with fn::vector_search.
+        # Scoped searches always scan: only the scope's rows are compared
+        index_state = await get_vector_index_state()
+        if not scoped and index_state.usable_for(len(embed)):
+            try:
+                return await knn_vector_search(
+                    embed, results, source, note, minimum_score, index_state.kind
+                )
+            except Exception as e:
+                logger.warning(f"Vector index search failed, scanning instead: {e}")
+
+        vars = {
+            "embed": embed,
+            "results": results,
+            "source": source,
+            "note": note,
+            "minimum_score": minimum_score,
+            **scope,
+        }
+        two_stage = await _two_stage_vars(embed, results)
+        if two_stage is not None:
+            return await repo_query(
+                """
+                SELECT * FROM fn::vector_search_two_stage($embed, $embed_head, $results, $rerank_candidates, $source, $note, $minimum_score, $notebook, $source_ids);
+                """,
+                {**vars, **two_stage},
+            )
         search_results = await repo_query(
             """
-            SELECT * FROM fn::vector_search($embed, $results, $source, $note, $minimum_score);
+            SELECT * FROM fn::vector_search($embed, $results, $source, $note, $minimum_score, $notebook, $source_ids);
             """,
-            {
-                "embed": embed,
-                "results": results,
-                "source": source,
-                "note": note,
-                "minimum_score": minimum_score,
-            },
+            vars,
         )
         return search_results
     except Exception as e:
         logger.error(f"Error performing vector search: {str(e)}")
         logger.exception(e)
         raise DatabaseOperationError(e)
+
+
+# k in the reciprocal-rank fusion score weight / (k + rank)
+HYBRID_RRF_K = 60
+
+
+async def hybrid_search(
+    keyword: str,
+    results: int,
+    source: bool = True,
+    note: bool = True,
+    minimum_score=0.2,
+    text_weight: float = 1.0,
+    vector_weight: float = 1.0,
+    notebook_id: Optional[str] = None,
+    source_ids: Optional[List[str]] = None,
+):
+    """
+    BM25 and vector search fused with reciprocal-rank fusion, in one query.
+
+    Returns one result per source or note, ranked by its fused score
+    text_weight / (60 + BM25 rank) + vector_weight / (60 + vector rank).
+    text_score and vector_score hold the BM25 relevance and the cosine
+    similarity (0 when that ranking did not find the item). Vector hits come
+    from the local or HNSW index when one can answer, otherwise from a scan
+    like vector_search's. Scoped like text_search.
+    """
+    if not keyword:
+        raise InvalidInputError("Search keyword cannot be empty")
+    if min(text_weight, vector_weight) < 0 or text_weight + vector_weight <= 0:
+        raise InvalidInputError("Search weights must be non-negative, not both zero")
+    try:
+        from open_notebook.utils.embedding import embed_query
+
+        embed = await embed_query(keyword) if vector_weight > 0 else []
+        scope = _search_scope(notebook_id, source_ids)
+        candidates = results * 2
+        vars: Dict[str, Any] = {
+            "keyword": keyword,
+            "embed": embed,
+            "results": results,
+            "source": source,
+            "note": note,
+            "minimum_score": minimum_score,
+            "text_weight": float(text_weight),
+            "vector_weight": float(vector_weight),
+            "rrf_k": HYBRID_RRF_K,
+            "vector_hits": None,
+            **scope,
+        }
+        vector_hits = "$vector_hits"
+        if vector_weight > 0:
+            local_hits = await _local_vector_hits(
+                embed, candidates, source, note, minimum_score, scope
+            )
+            if local_hits is not None:
+                vars["vector_hits"] = [
+                    {
+                        **hit,
+                        "id": ensure_record_id(hit["id"]),
+                        "parent_id": ensure_record_id(hit["parent_id"]),
+                    }
+                    for hit in local_hits
+                ]
+            else:
+                index_state = await get_vector_index_state()
+                scoped = notebook_id is not None or source_ids is not None
+                if not scoped and index_state.usable_for(len(embed)):
+                    vector_hits = knn_hits_expression(
+                        candidates, source, note, index_state.kind
+                    )
+                    vars.update(
+                        query=embed,
+                        candidates=candidates,
+                        min_similarity=minimum_score,
+                    )
+                elif two_stage := await _two_stage_vars(embed, candidates):
+                    vector_hits = (
+                        "fn::vector_search_two_stage($embed, $embed_head, "
+                        "$candidates, $rerank_candidates, $source, $note, "
+                        "$minimum_score, $notebook, $source_ids)"
+                    )
+                    vars.update(candidates=candidates, **two_stage)
+
+        query = (
+            "RETURN fn::hybrid_search($keyword, $embed, $results, $source, $note, "
+            "$minimum_score, $text_weight, $vector_weight, $rrf_k, $notebook, "
+            "$source_ids, {vector_hits})"
+        )
+        try:
+            return await repo_query(query.format(vector_hits=vector_hits), vars)
+        except Exception as e:
+            if vector_hits == "$vector_hits":
+                raise
+            logger.warning(f"Vector index search failed, scanning instead: {e}")
+            return await repo_query(query.format(vector_hits="$vector_hits"), vars)
+    except Exception as e:
+        logger.error(f"Error performing hybrid search: {str(e)}")
+        logger.exception(e)
+        raise DatabaseOperationError(e)
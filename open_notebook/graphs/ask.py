@@ -1,5 +1,5 @@
 import operator
-from typing import Annotated, List
+from typing import Annotated, List, Optional
 
 from ai_prompter import Prompter
 from loguru import logger
@@ -8,7 +8,7 @@ from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, START, StateGraph
 from langgraph.types import Send
 from pydantic import BaseModel, Field
-from typing_extensions import TypedDict
+from typing_extensions import NotRequired, TypedDict
 
 from open_notebook.ai.provision import provision_langchain_model
 from open_notebook.domain.notebook import vector_search
@@ -23,6 +23,8 @@ class SubGraphState(TypedDict):
     results: dict
     answer: str
     ids: list  # Added for provide_answer function
+    notebook_id: Optional[str]
+    source_ids: Optional[List[str]]
 
 
 class Search(BaseModel):
@@ -42,9 +44,13 @@ class Strategy(BaseModel):
 
 class ThreadState(TypedDict):
     question: str
-    strategy: Strategy
-    answers: Annotated[list, operator.add]
-    final_answer: str
+    # Optional search scope (see vector_search)
+    notebook_id: NotRequired[Optional[str]]
+    source_ids: NotRequired[Optional[List[str]]]
+    # Filled in by the graph
+    strategy: NotRequired[Strategy]
+    answers: NotRequired[Annotated[list, operator.add]]
+    final_answer: NotRequired[str]
 
 
 async def call_model_with_messages(state: ThreadState, config: RunnableConfig) -> dict:
@@ -85,6 +91,8 @@ async def trigger_queries(state: ThreadState, config: RunnableConfig):
                 "question": state["question"],
                 "instructions": s.instructions,
                 "term": s.term,
+                "notebook_id": state.get("notebook_id"),
+                "source_ids": state.get("source_ids"),
                 # "type": s.type,
             },
         )
@@ -97,7 +105,14 @@ async def provide_answer(state: SubGraphState, config: RunnableConfig) -> dict:
     # if state["type"] == "text":
     #     results = text_search(state["term"], 10, True, True)
     # else:
-    results = await vector_search(state["term"], 10, True, True)
+    results = await vector_search(
+        state["term"],
+        10,
+        True,
+        True,
+        notebook_id=state.get("notebook_id"),
+        source_ids=state.get("source_ids"),
+    )
     if len(results) == 0:
         return {"answers": []}
     payload["results"] = results
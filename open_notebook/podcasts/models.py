@@ -14,6 +14,7 @@ class EpisodeProfile(ObjectModel):
     """
 
     table_name: ClassVar[str] = "episode_profile"
+    cache_enabled: ClassVar[bool] = True
 
     name: str = Field(..., description="Unique profile name")
     description: Optional[str] = Field(None, description="Profile description")
@@ -52,6 +53,7 @@ class SpeakerProfile(ObjectModel):
     """
 
     table_name: ClassVar[str] = "speaker_profile"
+    cache_enabled: ClassVar[bool] = True
 
     name: str = Field(..., description="Unique profile name")
     description: Optional[str] = Field(None, description="Profile description")
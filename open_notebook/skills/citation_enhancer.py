@@ -194,10 +194,10 @@ class CitationEnhancer(Skill):
         try:
             # Determine source type and fetch accordingly
             if source_id.startswith("source:"):
-                source = await Source.get(source_id)
+                source = await Source.get(source_id, fields=["full_text"])
                 return source.full_text if source else None
             elif source_id.startswith("note:"):
-                note = await Note.get(source_id)
+                note = await Note.get(source_id, fields=["content"])
                 return note.content if note else None
             elif source_id.startswith("insight:"):
                 insight = await SourceInsight.get(source_id)
@@ -326,8 +326,10 @@ Return ONLY the JSON."""
 
         for sub_query in sub_queries:
             try:
-                # Vector search for relevant content
-                results = await vector_search(sub_query, limit=5, include_embeddings=False)
+                # Vector search for relevant content in this notebook
+                results = await vector_search(
+                    sub_query, 5, notebook_id=self.notebook_id
+                )
 
                 if not results:
                     continue
@@ -3,7 +3,7 @@ Utils package for Open Notebook.
 
 To avoid circular imports, import functions directly:
 - from open_notebook.utils.context_builder import ContextBuilder
-- from open_notebook.utils import token_count, compare_versions
+- from open_notebook.utils import token_count, token_counter, compare_versions
 - from open_notebook.utils.chunking import chunk_text, detect_content_type, ContentType
 - from open_notebook.utils.embedding import generate_embedding, generate_embeddings
 - from open_notebook.utils.encryption import encrypt_value, decrypt_value
@@ -18,6 +18,7 @@ from .chunking import (
     detect_content_type_from_heuristics,
 )
 from .embedding import (
+    embed_query,
     generate_embedding,
     generate_embeddings,
     mean_pool_embeddings,
@@ -32,7 +33,7 @@ from .text_utils import (
     remove_non_ascii,
     remove_non_printable,
 )
-from .token_utils import token_cost, token_count
+from .token_utils import token_cost, token_count, token_counter
 from .version_utils import (
     compare_versions,
     get_installed_version,
@@ -48,6 +49,7 @@ __all__ = [
     "detect_content_type_from_extension",
     "detect_content_type_from_heuristics",
     # Embedding
+    "embed_query",
     "generate_embedding",
     "generate_embeddings",
     "mean_pool_embeddings",
@@ -58,6 +60,7 @@ __all__ = [
     "clean_thinking_content",
     # Token utils
     "token_count",
+    "token_counter",
     "token_cost",
     # Version utils
     "compare_versions",
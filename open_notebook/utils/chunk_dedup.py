@@ -0,0 +1,174 @@
+"""
+Near-duplicate chunk detection for source embedding.
+
+Web crawls, feeds and PDFs repeat headers, footers and boilerplate, so many
+chunks of a source (or of the sources in a notebook) are near-identical.
+Embedding each of them costs provider calls and index space, and fills
+search results with copies of the same text.
+
+Each chunk gets a 64-bit SimHash over word 3-shingles (CJK characters count
+as words). Chunks whose signatures differ in at most CHUNK_DEDUP_MAX_DISTANCE
+bits are near-duplicates. ``NearDuplicateIndex`` finds them without
+comparing all pairs: the signature is cut into max_distance + 1 bands, and
+two signatures that close must agree on at least one band.
+
+embed_source stores a near-duplicate as a source_embedding row without an
+embedding, whose ``duplicate_of`` links the row that was embedded. Vector
+search skips the row, and the link resolves citations of its text.
+
+Environment Variables:
+    CHUNK_DEDUP: "off" (default), "source" (within a source) or "notebook"
+        (also against sources sharing a notebook)
+    CHUNK_DEDUP_MAX_DISTANCE: Maximum differing signature bits, 0-16 (default: 6)
+"""
+
+import hashlib
+import os
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+DEDUP_SCOPES = ("source", "notebook")
+SIGNATURE_BITS = 64
+_MAX_DISTANCE_LIMIT = 16
+
+# CJK characters are words of their own; other word characters form runs
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af"
+_WORD = re.compile("[" + _CJK + "]|[^\\W" + _CJK + "]+")
+_SHINGLE_SIZE = 3
+
+
+def chunk_dedup_scope() -> Optional[str]:
+    """Configured dedup scope ("source" or "notebook"), or None when disabled."""
+    scope = os.getenv("CHUNK_DEDUP", "off").strip().lower()
+    if scope in DEDUP_SCOPES:
+        return scope
+    if scope not in ("", "off", "false", "0", "no"):
+        logger.warning(f"Invalid CHUNK_DEDUP value: '{scope}'. Using default: off")
+    return None
+
+
+def dedup_max_distance() -> int:
+    value = os.getenv("CHUNK_DEDUP_MAX_DISTANCE")
+    if not value:
+        return 6
+    try:
+        return min(max(int(value), 0), _MAX_DISTANCE_LIMIT)
+    except ValueError:
+        logger.warning(
+            f"Invalid CHUNK_DEDUP_MAX_DISTANCE value: '{value}'. Using default: 6"
+        )
+        return 6
+
+
+def _shingles(text: str) -> List[str]:
+    words = _WORD.findall(unicodedata.normalize("NFKC", text).lower())
+    if len(words) <= _SHINGLE_SIZE:
+        return [" ".join(words)] if words else []
+    return [
+        " ".join(words[i : i + _SHINGLE_SIZE])
+        for i in range(len(words) - _SHINGLE_SIZE + 1)
+    ]
+
+
+def simhash(text: str) -> int:
+    """64-bit SimHash of the text's word 3-shingles (0 for text without words)."""
+    shingles = _shingles(text)
+    if not shingles:
+        return 0
+    hashes = np.fromiter(
+        (
+            int.from_bytes(
+                hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little"
+            )
+            for s in shingles
+        ),
+        dtype="<u8",
+        count=len(shingles),
+    )
+    # One row of 64 bits per shingle, least significant bit first
+    bits = np.unpackbits(
+        hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little"
+    )
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority, bitorder="little").tobytes(), "little")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def to_signed64(signature: int) -> int:
+    """Signature as a signed 64-bit integer, the range SurrealDB ints hold."""
+    return signature - (1 << 64) if signature >= 1 << 63 else signature
+
+
+def from_signed64(value: int) -> int:
+    return value & ((1 << 64) - 1)
+
+
+class NearDuplicateIndex:
+    """Signatures by band, for finding one within max_distance bits."""
+
+    def __init__(self, max_distance: Optional[int] = None):
+        self.max_distance = (
+            dedup_max_distance() if max_distance is None else max_distance
+        )
+        bands = self.max_distance + 1
+        bounds = [SIGNATURE_BITS * i // bands for i in range(bands + 1)]
+        self._bands: List[Tuple[int, int]] = [
+            (start, (1 << (end - start)) - 1) for start, end in zip(bounds, bounds[1:])
+        ]
+        # Per band: band value -> [(insertion number, key, signature)]
+        self._tables: List[Dict[int, List[Tuple[int, Any, int]]]] = [
+            {} for _ in self._bands
+        ]
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, key: Any, signature: int) -> None:
+        entry = (self._size, key, signature)
+        self._size += 1
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            table.setdefault((signature >> shift) & mask, []).append(entry)
+
+    def find(self, signature: int) -> Optional[Any]:
+        """Key of the earliest added signature within max_distance, if any."""
+        best: Optional[Tuple[int, Any, int]] = None
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            for entry in table.get((signature >> shift) & mask, ()):
+                if best is not None and entry[0] >= best[0]:
+                    break  # Buckets are in insertion order
+                if hamming_distance(signature, entry[2]) <= self.max_distance:
+                    best = entry
+                    break
+        return best[1] if best else None
+
+
+def find_near_duplicates(
+    signatures: Sequence[int], index: Optional[NearDuplicateIndex] = None
+) -> Dict[int, Any]:
+    """
+    Map chunk positions to the chunk they near-duplicate.
+
+    Chunks are compared in order against the entries already in index (e.g.
+    chunks of other sources, keyed by row id) and against earlier chunks
+    that were not duplicates themselves (keyed by position).
+
+    Returns:
+        {position: position of an earlier chunk, or an index key}
+    """
+    index = index if index is not None else NearDuplicateIndex()
+    duplicates: Dict[int, Any] = {}
+    for position, signature in enumerate(signatures):
+        match = index.find(signature)
+        if match is not None:
+            duplicates[position] = match
+        else:
+            index.add(position, signature)
+    return duplicates
@@ -7,17 +7,41 @@ Supports HTML, Markdown, and plain text with appropriate splitters for each type
 Key functions:
 - detect_content_type(): Detects content type from file extension or content heuristics
 - chunk_text(): Splits text into chunks using appropriate splitter for content type
+- fits_in_chunk(): Whether text is short enough to be a single chunk
+- iter_chunks(): Streams the same chunks, with offsets, holding only a window of text
+- diff_chunks(): Matches new chunks to previously stored chunks by content hash
+
+Chunks are sized in characters by default. With OPEN_NOTEBOOK_CHUNK_UNIT=tokens
+they are sized in 'o200k_base' tokens instead: splitting runs on a cheap
+per-language token estimate, and only finished chunks are tokenized exactly
+(and re-split in the rare case they are over budget).
 
 Environment Variables:
     OPEN_NOTEBOOK_CHUNK_SIZE: Maximum chunk size in characters (default: 1200)
     OPEN_NOTEBOOK_CHUNK_OVERLAP: Overlap between chunks in characters (default: 15% of CHUNK_SIZE)
+    OPEN_NOTEBOOK_CHUNK_UNIT: "chars" (default) or "tokens"
+    OPEN_NOTEBOOK_CHUNK_TOKENS: Maximum chunk size in tokens, in token mode (default: 300)
+    OPEN_NOTEBOOK_CHUNK_TOKEN_OVERLAP: Overlap in tokens, in token mode (default: 15% of CHUNK_TOKENS)
 """
 
 import os
 import re
+from collections import deque
+from dataclasses import dataclass, field
 from enum import Enum
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import (
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
 
 from langchain_text_splitters import (
     HTMLHeaderTextSplitter,
@@ -26,6 +50,8 @@ from langchain_text_splitters import (
 )
 from loguru import logger
 
+from .token_utils import approximate_token_count, token_count, weighted_length
+
 
 def _get_chunk_size() -> int:
     """Get chunk size from environment variable or use default."""
@@ -54,44 +80,145 @@ def _get_chunk_size() -> int:
     return 1200
 
 
-def _get_chunk_overlap(chunk_size: int) -> int:
+def _get_chunk_overlap(
+    chunk_size: int,
+    env_var: str = "OPEN_NOTEBOOK_CHUNK_OVERLAP",
+    unit: str = "characters",
+) -> int:
     """Get chunk overlap from environment variable or calculate default (15% of chunk size)."""
-    overlap_str = os.getenv("OPEN_NOTEBOOK_CHUNK_OVERLAP")
+    overlap_str = os.getenv(env_var)
     if overlap_str:
         try:
             overlap = int(overlap_str)
             if overlap < 0:
-                logger.warning(
-                    f"OPEN_NOTEBOOK_CHUNK_OVERLAP ({overlap}) cannot be negative. "
-                    f"Using 0."
-                )
+                logger.warning(f"{env_var} ({overlap}) cannot be negative. Using 0.")
                 return 0
             if overlap >= chunk_size:
                 logger.warning(
-                    f"OPEN_NOTEBOOK_CHUNK_OVERLAP ({overlap}) cannot be >= chunk size ({chunk_size}). "
+                    f"{env_var} ({overlap}) cannot be >= chunk size ({chunk_size}). "
                     f"Using 15% of chunk size: {int(chunk_size * 0.15)}"
                 )
                 return int(chunk_size * 0.15)
-            logger.info(f"Using custom chunk overlap: {overlap} characters")
+            logger.info(f"Using custom chunk overlap: {overlap} {unit}")
             return overlap
         except ValueError:
             logger.warning(
-                f"Invalid OPEN_NOTEBOOK_CHUNK_OVERLAP value: '{overlap_str}'. "
+                f"Invalid {env_var} value: '{overlap_str}'. "
                 f"Using default: 15% of chunk size"
             )
     return int(chunk_size * 0.15)
 
 
+def _get_chunk_unit() -> str:
+    """Get the chunk size unit ("chars" or "tokens") from environment variable."""
+    unit = os.getenv("OPEN_NOTEBOOK_CHUNK_UNIT", "chars").strip().lower()
+    if unit in ("token", "tokens"):
+        return "tokens"
+    if unit not in ("", "char", "chars", "characters"):
+        logger.warning(
+            f"Invalid OPEN_NOTEBOOK_CHUNK_UNIT value: '{unit}'. Using default: chars"
+        )
+    return "chars"
+
+
+def _get_chunk_tokens() -> int:
+    """Get the token-mode chunk size from environment variable or use default."""
+    tokens_str = os.getenv("OPEN_NOTEBOOK_CHUNK_TOKENS")
+    if tokens_str:
+        try:
+            tokens = int(tokens_str)
+            if tokens < 32:
+                logger.warning(
+                    f"OPEN_NOTEBOOK_CHUNK_TOKENS ({tokens}) is too small. "
+                    f"Using minimum value of 32."
+                )
+                return 32
+            if tokens > 8192:
+                logger.warning(
+                    f"OPEN_NOTEBOOK_CHUNK_TOKENS ({tokens}) is very large. "
+                    f"This may exceed the input limit of some embedding models."
+                )
+            logger.info(f"Using custom chunk size: {tokens} tokens")
+            return tokens
+        except ValueError:
+            logger.warning(
+                f"Invalid OPEN_NOTEBOOK_CHUNK_TOKENS value: '{tokens_str}'. "
+                f"Using default: 300"
+            )
+    return 300
+
+
 # Constants (computed at import time from environment variables)
 CHUNK_SIZE = _get_chunk_size()
 CHUNK_OVERLAP = _get_chunk_overlap(CHUNK_SIZE)
+CHUNK_UNIT = _get_chunk_unit()
+CHUNK_TOKENS = _get_chunk_tokens()
+CHUNK_TOKEN_OVERLAP = _get_chunk_overlap(
+    CHUNK_TOKENS, "OPEN_NOTEBOOK_CHUNK_TOKEN_OVERLAP", "tokens"
+)
 HIGH_CONFIDENCE_THRESHOLD = 0.8  # Threshold for heuristics to override extension
+# Token mode: text longer than CHUNK_TOKENS * this is never a single chunk
+TOKEN_MODE_MAX_CHARS_PER_TOKEN = 8
 
 logger.debug(
-    f"Chunking configuration: CHUNK_SIZE={CHUNK_SIZE}, CHUNK_OVERLAP={CHUNK_OVERLAP}"
+    f"Chunking configuration: CHUNK_SIZE={CHUNK_SIZE}, CHUNK_OVERLAP={CHUNK_OVERLAP}, "
+    f"CHUNK_UNIT={CHUNK_UNIT}, CHUNK_TOKENS={CHUNK_TOKENS}, "
+    f"CHUNK_TOKEN_OVERLAP={CHUNK_TOKEN_OVERLAP}"
 )
 
 
+def _token_mode() -> bool:
+    return CHUNK_UNIT == "tokens"
+
+
+def _chunk_limits() -> Tuple[int, int]:
+    """(size, overlap) of a chunk, in the unit of _length_function()."""
+    if _token_mode():
+        return CHUNK_TOKENS * 4, CHUNK_TOKEN_OVERLAP * 4
+    return CHUNK_SIZE, CHUNK_OVERLAP
+
+
+def _length_function() -> Callable[[str], int]:
+    """Length used while splitting: characters, or estimated quarter tokens.
+
+    Quarter tokens add up exactly over the pieces the splitter merges, where
+    rounding every word or character to whole tokens would not.
+    """
+    return weighted_length if _token_mode() else len
+
+
+def _max_chunk_chars() -> int:
+    """Longest text that may still fit in a single chunk."""
+    if _token_mode():
+        return CHUNK_TOKENS * TOKEN_MODE_MAX_CHARS_PER_TOKEN
+    return CHUNK_SIZE
+
+
+def _overlap_chars() -> int:
+    """Upper bound of the overlap between consecutive chunks, in characters."""
+    if _token_mode():
+        # A character weighs at least a quarter token; exact tokens rarely cover
+        # more than eight characters, and a miss only makes the span best effort
+        return CHUNK_TOKEN_OVERLAP * TOKEN_MODE_MAX_CHARS_PER_TOKEN
+    return CHUNK_OVERLAP
+
+
+def fits_in_chunk(text: str) -> bool:
+    """
+    Whether text is short enough to be used as a single chunk.
+
+    In character mode this is len(text) <= CHUNK_SIZE. In token mode the
+    text is only tokenized when the estimate does not already rule it out.
+    """
+    if len(text) > _max_chunk_chars():
+        return False
+    if not _token_mode():
+        return True
+    if approximate_token_count(text) > 2 * CHUNK_TOKENS:
+        return False
+    return token_count(text) <= CHUNK_TOKENS
+
+
 class ContentType(Enum):
     """Content type for chunking strategy selection."""
 
@@ -353,27 +480,56 @@ def _get_markdown_splitter() -> MarkdownHeaderTextSplitter:
     )
 
 
+_PLAIN_SEPARATORS = ["\n\n", "\n", ". ", ", ", " ", ""]
+
+
 def _get_plain_splitter() -> RecursiveCharacterTextSplitter:
-    """Get plain text splitter using CHUNK_SIZE and CHUNK_OVERLAP constants."""
+    """Get plain text splitter for the configured chunk unit and size."""
+    chunk_size, chunk_overlap = _chunk_limits()
     return RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        length_function=len,
-        separators=["\n\n", "\n", ". ", ", ", " ", ""],
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=_length_function(),
+        separators=_PLAIN_SEPARATORS,
     )
 
 
+def _get_exact_token_splitter() -> RecursiveCharacterTextSplitter:
+    """Get a plain text splitter that tokenizes every candidate split."""
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_TOKENS,
+        chunk_overlap=CHUNK_TOKEN_OVERLAP,
+        length_function=token_count,
+        separators=_PLAIN_SEPARATORS,
+    )
+
+
+def _fit_to_budget(chunk: str) -> List[str]:
+    """
+    Check a finished chunk against the exact token budget (token mode only).
+
+    Chunks are split on approximate token counts; the few that turn out to be
+    over CHUNK_TOKENS are re-split with exact counts.
+    """
+    if not _token_mode() or token_count(chunk) <= CHUNK_TOKENS:
+        return [chunk]
+    sub_chunks = _get_exact_token_splitter().split_text(chunk)
+    return [c.strip() for c in sub_chunks if c and c.strip()]
+
+
 def _apply_secondary_chunking(chunks: List[str]) -> List[str]:
     """
-    Apply secondary chunking to ensure no chunk exceeds CHUNK_SIZE.
+    Apply secondary chunking to ensure no chunk exceeds the chunk size.
 
     Used when primary splitters (HTML/Markdown) produce oversized chunks.
     """
     result = []
     secondary_splitter = _get_plain_splitter()
+    length_function = _length_function()
+    chunk_size, _ = _chunk_limits()
 
     for chunk in chunks:
-        if len(chunk) > CHUNK_SIZE:
+        if length_function(chunk) > chunk_size:
             # Split oversized chunk
             sub_chunks = secondary_splitter.split_text(chunk)
             result.extend(sub_chunks)
@@ -383,35 +539,8 @@ def _apply_secondary_chunking(chunks: List[str]) -> List[str]:
     return result
 
 
-def chunk_text(
-    text: str,
-    content_type: Optional[ContentType] = None,
-    file_path: Optional[str] = None,
-) -> List[str]:
-    """
-    Split text into chunks using appropriate splitter for content type.
-
-    Args:
-        text: The text to chunk
-        content_type: Optional explicit content type (auto-detected if not provided)
-        file_path: Optional file path for content type detection
-
-    Returns:
-        List of text chunks, each <= CHUNK_SIZE characters
-    """
-    if not text or not text.strip():
-        return []
-
-    # Short text doesn't need chunking
-    if len(text) <= CHUNK_SIZE:
-        return [text]
-
-    # Detect content type if not provided
-    if content_type is None:
-        content_type = detect_content_type(text, file_path)
-
-    logger.debug(f"Chunking text with content type: {content_type.value}")
-
+def _split_chunks(text: str, content_type: ContentType) -> List[str]:
+    """Run the splitter for content_type and return stripped, non-empty chunks."""
     # Select appropriate splitter
     if content_type == ContentType.HTML:
         splitter = _get_html_splitter()
@@ -440,6 +569,386 @@ def chunk_text(
 
     # Filter out empty chunks
     chunks = [c.strip() for c in chunks if c and c.strip()]
+    if _token_mode():
+        chunks = [sub for chunk in chunks for sub in _fit_to_budget(chunk)]
+    return chunks
+
+
+def chunk_text(
+    text: str,
+    content_type: Optional[ContentType] = None,
+    file_path: Optional[str] = None,
+) -> List[str]:
+    """
+    Split text into chunks using appropriate splitter for content type.
+
+    Args:
+        text: The text to chunk
+        content_type: Optional explicit content type (auto-detected if not provided)
+        file_path: Optional file path for content type detection
+
+    Returns:
+        List of text chunks, each <= CHUNK_SIZE characters (or CHUNK_TOKENS
+        tokens in token mode)
+    """
+    if not text or not text.strip():
+        return []
+
+    # Short text doesn't need chunking
+    if fits_in_chunk(text):
+        return [text]
+
+    # Detect content type if not provided
+    if content_type is None:
+        content_type = detect_content_type(text, file_path)
+
+    logger.debug(f"Chunking text with content type: {content_type.value}")
+
+    chunks = _split_chunks(text, content_type)
 
     logger.debug(f"Created {len(chunks)} chunks from {len(text)} characters")
     return chunks
+
+
+# Text read ahead by iter_chunks before splitting; bounds memory per window
+STREAM_WINDOW = max(CHUNK_SIZE * 50, 65536)
+# Heuristic content type detection looks at this many leading characters
+_DETECTION_SAMPLE = 5000
+
+
+@dataclass(frozen=True)
+class TextChunk:
+    """A chunk and its [start, end) character span in the source text.
+
+    Plain text chunks are exact substrings of the source. Markdown and HTML
+    splitters normalise whitespace, so their spans are located on a best
+    effort basis (first and last line of the chunk).
+    """
+
+    text: str
+    start: int
+    end: int
+
+
+def iter_chunks(
+    source: Union[str, Iterable[str]],
+    content_type: Optional[ContentType] = None,
+    file_path: Optional[str] = None,
+    window: int = STREAM_WINDOW,
+) -> Iterator[TextChunk]:
+    """
+    Yield the chunks chunk_text() would return, without materialising them.
+
+    source can be a string or any iterable of text fragments (e.g. a file
+    read in blocks). Only a window of text is held at a time:
+    - plain text is split into separator-delimited pieces that are merged
+      on the fly, exactly like the recursive splitter does;
+    - Markdown is cut into windows at top-level headers that the header
+      splitter would never merge across;
+    - HTML needs a DOM, so it is read completely and chunked at once.
+
+    The chunk texts are identical to chunk_text() for the same input.
+    """
+    parts = _iter_parts(source, window)
+    head: List[str] = []
+    head_len = 0
+    exhausted = True
+    for part in parts:
+        head.append(part)
+        head_len += len(part)
+        if head_len > max(_max_chunk_chars(), _DETECTION_SAMPLE):
+            exhausted = False
+            break
+    buffer = "".join(head)
+
+    if exhausted:
+        if buffer.strip() and fits_in_chunk(buffer):
+            yield TextChunk(buffer, 0, len(buffer))
+            return
+        if not buffer.strip():
+            return
+
+    # The buffer holds at least the detection sample, so this matches chunk_text
+    if content_type is None:
+        content_type = detect_content_type(buffer, file_path)
+    logger.debug(f"Streaming chunks with content type: {content_type.value}")
+
+    if content_type == ContentType.MARKDOWN:
+        yield from _iter_markdown_chunks(buffer, parts, window)
+    elif content_type == ContentType.PLAIN:
+        yield from _iter_plain_chunks(buffer, parts)
+    else:
+        text = buffer + "".join(parts)
+        yield from _locate_chunks(text, _split_chunks(text, content_type), 0)
+
+
+def _iter_parts(source: Union[str, Iterable[str]], size: int) -> Iterator[str]:
+    if isinstance(source, str):
+        for start in range(0, len(source), size):
+            yield source[start : start + size]
+        return
+    for part in source:
+        if part:
+            yield part
+
+
+def _locate_chunks(
+    text: str, chunks: Iterable[str], offset: int
+) -> Iterator[TextChunk]:
+    """Attach spans to chunks that appear in text in order (possibly overlapping)."""
+    cursor = 0
+    for chunk in chunks:
+        start = text.find(chunk, cursor)
+        if start != -1:
+            end = start + len(chunk)
+            # Overlapping chunks start after the previous one, at most
+            # the chunk overlap before its end
+            cursor = max(start + 1, end - _overlap_chars())
+        else:
+            # Normalised by a header splitter; locate by first and last line
+            first = chunk.split("\n", 1)[0].strip()
+            last = chunk.rsplit("\n", 1)[-1].strip()
+            found = text.find(first, cursor)
+            start = found if found != -1 else cursor
+            found = text.find(last, start)
+            end = found + len(last) if found != -1 else start + len(chunk)
+            cursor = start + 1
+        yield TextChunk(chunk, offset + start, offset + end)
+
+
+def _iter_plain_chunks(buffer: str, parts: Iterator[str]) -> Iterator[TextChunk]:
+    # Like the recursive splitter, split on the first separator that occurs
+    # anywhere in the text; until "\n\n" shows up that needs the whole text
+    separators = _get_plain_splitter()._separators
+    top = separators[0]
+    scanned = 0
+    while buffer.find(top, scanned) == -1:
+        part = next(parts, None)
+        if part is None:
+            break
+        scanned = max(len(buffer) - len(top) + 1, 0)
+        buffer += part
+
+    for index, separator in enumerate(separators):
+        if not separator or separator in buffer:
+            break
+    if not separator:
+        # No separator at all: every character is a piece, as in the splitter
+        text = buffer + "".join(parts)
+        yield from _locate_chunks(text, _split_chunks(text, ContentType.PLAIN), 0)
+        return
+
+    chunks = _merge_pieces(
+        _iter_pieces(buffer, parts, separator), separators[index + 1 :]
+    )
+    yield from _fit_chunks(chunks) if _token_mode() else chunks
+
+
+def _fit_chunks(chunks: Iterator[TextChunk]) -> Iterator[TextChunk]:
+    """Apply _fit_to_budget to streamed chunks, keeping their spans."""
+    for chunk in chunks:
+        sub_chunks = _fit_to_budget(chunk.text)
+        if sub_chunks == [chunk.text]:
+            yield chunk
+            continue
+        # Sub-chunks are substrings of the chunk, in order
+        cursor = 0
+        for sub_chunk in sub_chunks:
+            start = max(chunk.text.find(sub_chunk, cursor), cursor)
+            cursor = start + 1
+            start += chunk.start
+            yield TextChunk(sub_chunk, start, start + len(sub_chunk))
+
+
+def _iter_pieces(
+    buffer: str, parts: Iterator[str], separator: str
+) -> Iterator[Tuple[str, int]]:
+    """Yield (piece, offset) pairs, each piece starting with its separator."""
+    offset = 0  # Position of buffer[0] in the source
+    piece_start = 0
+    search_from = 0
+    while True:
+        found = buffer.find(separator, search_from)
+        if found == -1:
+            part = next(parts, None)
+            if part is None:
+                break
+            # Drop consumed text so memory stays bounded by the current piece
+            old_len = len(buffer) - piece_start
+            buffer = buffer[piece_start:] + part
+            offset += piece_start
+            search_from = max(
+                search_from - piece_start, old_len - len(separator) + 1, 0
+            )
+            piece_start = 0
+            continue
+        if found > piece_start:
+            yield buffer[piece_start:found], offset + piece_start
+        piece_start = found
+        search_from = found + len(separator)
+    if piece_start < len(buffer):
+        yield buffer[piece_start:], offset + piece_start
+
+
+def _merge_pieces(
+    pieces: Iterator[Tuple[str, int]], sub_separators: List[str]
+) -> Iterator[TextChunk]:
+    """Online version of the recursive splitter's merge of top-level pieces.
+
+    Pieces are packed greedily up to the chunk size, keeping up to the chunk
+    overlap of trailing pieces for the next chunk. Pieces too large for a
+    chunk end the current run and are split recursively on their own.
+    """
+    splitter = _get_plain_splitter()
+    length_function = _length_function()
+    chunk_size, chunk_overlap = _chunk_limits()
+    current: Deque[Tuple[str, int]] = deque()
+    total = 0
+
+    def emit() -> Iterator[TextChunk]:
+        raw = "".join(piece for piece, _ in current)
+        chunk = raw.strip()
+        if chunk:
+            start = current[0][1] + len(raw) - len(raw.lstrip())
+            yield TextChunk(chunk, start, start + len(chunk))
+
+    for piece, offset in pieces:
+        length = length_function(piece)
+        if length < chunk_size:
+            if total + length > chunk_size and current:
+                yield from emit()
+                while total > chunk_overlap or (
+                    total + length > chunk_size and total > 0
+                ):
+                    total -= length_function(current.popleft()[0])
+            current.append((piece, offset))
+            total += length
+            continue
+        if current:
+            yield from emit()
+            current.clear()
+            total = 0
+        sub_chunks = (
+            splitter._split_text(piece, sub_separators) if sub_separators else [piece]
+        )
+        yield from _locate_chunks(
+            piece, (c.strip() for c in sub_chunks if c and c.strip()), offset
+        )
+    if current:
+        yield from emit()
+
+
+def _markdown_header(line: str) -> Optional[Tuple[int, str]]:
+    """(level, text) if the stripped line is a #, ## or ### header."""
+    for sep in ("###", "##", "#"):
+        if line.startswith(sep) and (len(line) == len(sep) or line[len(sep)] == " "):
+            return len(sep), line[len(sep) :].strip()
+    return None
+
+
+def _iter_markdown_chunks(
+    buffer: str, parts: Iterator[str], window: int
+) -> Iterator[TextChunk]:
+    """Split Markdown window by window.
+
+    A window ends before a "#" header line (outside code blocks) where the
+    header splitter starts a fresh section: its header stack is reset there,
+    and the new section cannot be merged into the previous one because a
+    header was already seen and the section's metadata differs. Every
+    section therefore lies inside one window and splits identically.
+    """
+    offset = 0  # Position of buffer[0] in the source
+    window_start = 0
+    line_start = 0
+    in_code_block = False
+    opening_fence = ""
+    headers: Dict[int, str] = {}
+    while True:
+        newline = buffer.find("\n", line_start)
+        if newline == -1:
+            part = next(parts, None)
+            if part is None:
+                break
+            buffer = buffer[window_start:] + part
+            offset += window_start
+            line_start -= window_start
+            window_start = 0
+            continue
+
+        # Mirror MarkdownHeaderTextSplitter's per-line handling
+        line = "".join(filter(str.isprintable, buffer[line_start:newline].strip()))
+        if not in_code_block:
+            if line.startswith("```") and line.count("```") == 1:
+                in_code_block, opening_fence = True, "```"
+            elif line.startswith("~~~"):
+                in_code_block, opening_fence = True, "~~~"
+        elif line.startswith(opening_fence):
+            in_code_block, opening_fence = False, ""
+        header = None if in_code_block else _markdown_header(line)
+
+        if header is not None:
+            level, title = header
+            if (
+                level == 1
+                and headers
+                and headers != {1: title}
+                and line_start - window_start >= window
+            ):
+                text = buffer[window_start:line_start]
+                yield from _locate_chunks(
+                    text,
+                    _split_chunks(text, ContentType.MARKDOWN),
+                    offset + window_start,
+                )
+                window_start = line_start
+            headers = {lvl: t for lvl, t in headers.items() if lvl < level}
+            headers[level] = title
+        line_start = newline + 1
+
+    text = buffer[window_start:]
+    yield from _locate_chunks(
+        text, _split_chunks(text, ContentType.MARKDOWN), offset + window_start
+    )
+
+
+@dataclass
+class ChunkDiff:
+    """How to turn a source's stored chunks into its new chunks."""
+
+    embed: List[int] = field(default_factory=list)  # New chunk indices to embed
+    reorder: List[Tuple[Any, int]] = field(default_factory=list)  # (row id, order)
+    stale: List[Any] = field(default_factory=list)  # Row ids to delete
+    kept: Dict[int, Any] = field(default_factory=dict)  # Chunk index -> reused row id
+
+
+def diff_chunks(
+    existing: List[Dict[str, Any]], chunk_hashes: List[str], model_key: Optional[str]
+) -> ChunkDiff:
+    """Match new chunks to stored source_embedding rows by content hash.
+
+    A stored row is reused only if it was embedded by the current model.
+    Repeated chunks match stored rows one-to-one, in document order.
+    """
+    reusable: Dict[str, List[Dict[str, Any]]] = {}
+    for row in sorted(existing, key=lambda row: row.get("order") or 0):
+        if (
+            model_key
+            and row.get("content_hash")
+            and row.get("embedding_model") == model_key
+        ):
+            reusable.setdefault(row["content_hash"], []).append(row)
+
+    diff = ChunkDiff()
+    kept = set()
+    for idx, key in enumerate(chunk_hashes):
+        candidates = reusable.get(key)
+        if not candidates:
+            diff.embed.append(idx)
+            continue
+        row = candidates.pop(0)
+        kept.add(str(row["id"]))
+        diff.kept[idx] = row["id"]
+        if row.get("order") != idx:
+            diff.reorder.append((row["id"], idx))
+    diff.stale = [row["id"] for row in existing if str(row["id"]) not in kept]
+    return diff
@@ -12,10 +12,16 @@ from typing import Any, Dict, List, Literal, Optional
 
 from loguru import logger
 
-from open_notebook.domain.notebook import Note, Notebook, Source
+from open_notebook.domain.notebook import (
+    Note,
+    Notebook,
+    Source,
+    SourceInsight,
+    get_context_records,
+)
 from open_notebook.exceptions import DatabaseOperationError, NotFoundError
 
-from .token_utils import token_count
+from .token_utils import token_counter
 
 
 @dataclass
@@ -26,14 +32,9 @@ class ContextItem:
     type: Literal["source", "note", "insight"]
     content: Dict[str, Any]
     priority: int = 0
+    # Filled in by ContextBuilder.count_tokens() if not provided
     token_count: Optional[int] = None
 
-    def __post_init__(self):
-        """Calculate token count for the content if not provided."""
-        if self.token_count is None:
-            content_str = str(self.content)
-            self.token_count = token_count(content_str)
-
 
 @dataclass
 class ContextConfig:
@@ -127,6 +128,7 @@ class ContextBuilder:
 
             # Apply post-processing
             self.remove_duplicates()
+            self.count_tokens()
             self.prioritize()
 
             if self.max_tokens:
@@ -140,7 +142,11 @@ class ContextBuilder:
             raise DatabaseOperationError(f"Failed to build context: {str(e)}")
 
     async def _add_source_context(
-        self, source_id: str, inclusion_level: str = "insights"
+        self,
+        source_id: str,
+        inclusion_level: str = "insights",
+        source: Optional[Source] = None,
+        insights: Optional[List[SourceInsight]] = None,
     ) -> None:
         """
         Add source and its insights to context.
@@ -148,17 +154,15 @@ class ContextBuilder:
         Args:
             source_id: ID of the source
             inclusion_level: "insights", "full content", or "not in"
+            source: Already-loaded source, skips fetching it again
+            insights: Already-loaded insights for the source, skips fetching them again
         """
         if inclusion_level == "not in":
             return
 
         try:
-            # Ensure source ID has table prefix
-            full_source_id = (
-                source_id if source_id.startswith("source:") else f"source:{source_id}"
-            )
-
-            source = await Source.get(full_source_id)
+            if source is None:
+                source = await Source.get(self._full_id("source", source_id))
             if not source:
                 logger.warning(f"Source {source_id} not found")
                 return
@@ -167,7 +171,11 @@ class ContextBuilder:
             context_size: Literal["short", "long"] = (
                 "long" if "full content" in inclusion_level else "short"
             )
-            source_context = await source.get_context(context_size=context_size)
+            if insights is None:
+                insights = await source.get_insights()
+            source_context = await source.get_context(
+                context_size=context_size, insights=insights
+            )
 
             # Add source item
             priority = (self.context_config.priority_weights or {}).get("source", 100)
@@ -181,7 +189,6 @@ class ContextBuilder:
 
             # Add insights if requested and available
             if self.include_insights and "insights" in inclusion_level:
-                insights = await source.get_insights()
                 for insight in insights:
                     insight_priority = (self.context_config.priority_weights or {}).get(
                         "insight", 75
@@ -219,31 +226,63 @@ class ContextBuilder:
             if not notebook:
                 raise NotFoundError(f"Notebook {notebook_id} not found")
 
-            # Process sources from context config or get all
+            # Resolve which sources and notes to include
             config_sources = self.context_config.sources
             if config_sources:
-                for source_id, status in config_sources.items():
-                    await self._add_source_context(source_id, status)
+                source_levels = {
+                    self._full_id("source", source_id): status
+                    for source_id, status in config_sources.items()
+                    if status != "not in"
+                }
             else:
                 # Default: get all sources with insights
                 sources = await notebook.get_sources()
-                for source in sources:
-                    if source.id:
-                        await self._add_source_context(source.id, "insights")
+                source_levels = {
+                    source.id: "insights" for source in sources if source.id
+                }
 
-            # Process notes from context config or get all
+            note_levels: Dict[str, str] = {}
             if self.include_notes:
                 config_notes = self.context_config.notes
                 if config_notes:
-                    for note_id, status in config_notes.items():
-                        if "not in" not in status:
-                            await self._add_note_context(note_id, status)
+                    note_levels = {
+                        self._full_id("note", note_id): status
+                        for note_id, status in config_notes.items()
+                        if "not in" not in status
+                    }
                 else:
                     # Default: get all notes with short content
                     notes = await notebook.get_notes()
-                    for note in notes:
-                        if note.id:
-                            await self._add_note_context(note.id, "full content")
+                    note_levels = {note.id: "full content" for note in notes if note.id}
+
+            # Load every source, insight and note in one round-trip instead of
+            # one query per item
+            (
+                loaded_sources,
+                insights_by_source,
+                loaded_notes,
+            ) = await get_context_records(
+                list(source_levels), list(note_levels), include_insights=True
+            )
+
+            for source in loaded_sources:
+                if source.id:
+                    await self._add_source_context(
+                        source.id,
+                        source_levels[source.id],
+                        source=source,
+                        insights=insights_by_source.get(source.id, []),
+                    )
+            for missing_id in set(source_levels) - {s.id for s in loaded_sources}:
+                logger.warning(f"Source {missing_id} not found")
+
+            for note in loaded_notes:
+                if note.id:
+                    await self._add_note_context(
+                        note.id, note_levels[note.id], note=note
+                    )
+            for missing_id in set(note_levels) - {n.id for n in loaded_notes}:
+                logger.warning(f"Note {missing_id} not found")
 
             logger.debug(f"Added notebook context for {notebook_id}")
 
@@ -252,7 +291,10 @@ class ContextBuilder:
             raise
 
     async def _add_note_context(
-        self, note_id: str, inclusion_level: str = "full content"
+        self,
+        note_id: str,
+        inclusion_level: str = "full content",
+        note: Optional[Note] = None,
     ) -> None:
         """
         Add note to context.
@@ -260,15 +302,14 @@ class ContextBuilder:
         Args:
             note_id: ID of the note
             inclusion_level: "full content" or "not in"
+            note: Already-loaded note, skips fetching it again
         """
         if inclusion_level == "not in":
             return
 
         try:
-            # Ensure note ID has table prefix
-            full_note_id = note_id if note_id.startswith("note:") else f"note:{note_id}"
-
-            note = await Note.get(full_note_id)
+            if note is None:
+                note = await Note.get(self._full_id("note", note_id))
             if not note:
                 logger.warning(f"Note {note_id} not found")
                 return
@@ -293,6 +334,13 @@ class ContextBuilder:
         except Exception as e:
             logger.error(f"Error adding note context for {note_id}: {str(e)}")
 
+    @staticmethod
+    def _full_id(table: str, record_id: str) -> str:
+        """Ensure a record ID has its table prefix."""
+        return (
+            record_id if record_id.startswith(f"{table}:") else f"{table}:{record_id}"
+        )
+
     async def _process_custom_params(self) -> None:
         """Process any additional custom parameters."""
         # Hook for future extensions - can be overridden in subclasses
@@ -312,6 +360,15 @@ class ContextBuilder:
         self.items.append(item)
         logger.debug(f"Added item {item.id} with priority {item.priority}")
 
+    def count_tokens(self) -> None:
+        """Count tokens of all items that have no count yet, in one batch."""
+        pending = [item for item in self.items if item.token_count is None]
+        if not pending:
+            return
+        counts = token_counter.count_batch(str(item.content) for item in pending)
+        for item, count in zip(pending, counts):
+            item.token_count = count
+
     def prioritize(self) -> None:
         """Sort items by priority (higher priority first)."""
         self.items.sort(key=lambda x: x.priority, reverse=True)
@@ -327,6 +384,7 @@ class ContextBuilder:
         if not max_tokens:
             return
 
+        self.count_tokens()
         total_tokens = sum(item.token_count or 0 for item in self.items)
 
         if total_tokens <= max_tokens:
@@ -385,6 +443,7 @@ class ContextBuilder:
                 insights.append(item.content)
 
         # Calculate total tokens
+        self.count_tokens()
         total_tokens = sum(item.token_count or 0 for item in self.items)
 
         response = {
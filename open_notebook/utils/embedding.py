@@ -3,24 +3,46 @@ Unified embedding utilities for Open Notebook.
 
 Provides centralized embedding generation with support for:
 - Single text embedding (with automatic chunking and mean pooling for large texts)
-- Batch text embedding (multiple texts in a single API call)
+- Batch text embedding, split into provider-sized batches sent concurrently
 - Mean pooling for combining multiple embeddings into one
+- A persistent per-model cache so unchanged text is never re-embedded
+- Search query embedding with an in-process LRU for repeated queries
 
 All embedding operations in the application should use these functions
 to ensure consistent behavior and proper handling of large content.
+
+Environment Variables:
+    EMBEDDING_BATCH_MAX_ITEMS: Override the provider's max texts per request
+    EMBEDDING_BATCH_MAX_TOKENS: Override the provider's max tokens per request
+    EMBEDDING_CONCURRENCY: Batches sent to the provider at once (default: 4)
+    EMBEDDING_BATCH_ATTEMPTS: Attempts per batch before failing (default: 3).
+        The embed_* commands retry a failed call up to 5 times on top of
+        this, so one batch may be sent up to 5 x EMBEDDING_BATCH_ATTEMPTS
+        times; set it to 1 to leave retrying to the commands.
 """
 
-from typing import TYPE_CHECKING, List, Optional
+import asyncio
+import random
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
 
 import numpy as np
 from loguru import logger
 
-from .chunking import CHUNK_SIZE, ContentType, chunk_text
+from .chunking import ContentType, chunk_text, fits_in_chunk
+from .embedding_cache import (
+    embedding_cache_enabled,
+    get_embedding_cache,
+    model_cache_key,
+    text_hash,
+)
+from .env import env_int
+from .query_embedding_cache import get_query_embedding_cache, query_persist_enabled
 
 # Lazy import to avoid circular dependency:
 # utils -> embedding -> models -> key_provider -> provider_config -> utils
 if TYPE_CHECKING:
-    from open_notebook.ai.models import ModelManager
+    pass
 
 
 async def mean_pool_embeddings(embeddings: List[List[float]]) -> List[float]:
@@ -34,6 +56,7 @@ async def mean_pool_embeddings(embeddings: List[List[float]]) -> List[float]:
 
     This approach ensures the final embedding has the same properties as
     individual embeddings (unit length) regardless of input count.
+    Computed in float32: model outputs carry no more precision than that.
 
     Args:
         embeddings: List of embedding vectors (each is a list of floats)
@@ -49,14 +72,14 @@ async def mean_pool_embeddings(embeddings: List[List[float]]) -> List[float]:
 
     if len(embeddings) == 1:
         # Single embedding - just normalize and return
-        arr = np.array(embeddings[0], dtype=np.float64)
+        arr = np.array(embeddings[0], dtype=np.float32)
         norm = np.linalg.norm(arr)
         if norm > 0:
             arr = arr / norm
         return arr.tolist()
 
     # Convert to numpy array
-    arr = np.array(embeddings, dtype=np.float64)
+    arr = np.array(embeddings, dtype=np.float32)
 
     # Verify all embeddings have same dimension
     if arr.ndim != 2:
@@ -80,17 +103,21 @@ async def mean_pool_embeddings(embeddings: List[List[float]]) -> List[float]:
 
 
 async def generate_embeddings(
-    texts: List[str], command_id: Optional[str] = None
+    texts: List[str], command_id: Optional[str] = None, use_cache: bool = True
 ) -> List[List[float]]:
     """
-    Generate embeddings for multiple texts in a single API call.
+    Generate embeddings for multiple texts with as few API calls as possible.
 
     This is more efficient than calling generate_embedding() multiple times
-    when you have multiple texts to embed (e.g., source chunks).
+    when you have multiple texts to embed (e.g., source chunks). Texts already
+    in the embedding cache for the current model are not sent to the provider;
+    the rest are split to fit the provider's per-request limits and the
+    batches are sent concurrently.
 
     Args:
         texts: List of text strings to embed
         command_id: Optional command ID for error logging context
+        use_cache: Set to False to bypass the persistent embedding cache
 
     Returns:
         List of embedding vectors, one per input text
@@ -111,21 +138,172 @@ async def generate_embeddings(
             "No embedding model configured. Please configure one in the Models section."
         )
 
+    model_key = (
+        model_cache_key(embedding_model)
+        if use_cache and embedding_cache_enabled()
+        else None
+    )
+    if model_key is None:
+        return await _embed_texts(embedding_model, texts, command_id)
+
+    cache = get_embedding_cache()
+    hashes = [text_hash(text) for text in texts]
+    vectors: Dict[str, List[float]] = {}
+    try:
+        vectors = await cache.get_many(model_key, hashes)
+    except Exception as e:
+        cache.stats.errors += 1
+        logger.warning(f"Embedding cache lookup failed, embedding all texts: {e}")
+
+    # Each distinct uncached text is sent to the provider once
+    missing: Dict[str, str] = {}
+    for key, text in zip(hashes, texts):
+        if key not in vectors:
+            missing.setdefault(key, text)
+    logger.debug(
+        f"Embedding cache: {len(texts) - len(missing)}/{len(texts)} texts cached "
+        f"for {model_key}"
+    )
+
+    if missing:
+        fresh = await _embed_texts(embedding_model, list(missing.values()), command_id)
+        # Rounded to float32 as the cache stores them, so a text gets the same
+        # vector whether or not it was cached
+        new_vectors = dict(
+            zip(missing.keys(), np.asarray(fresh, dtype=np.float32).tolist())
+        )
+        try:
+            await cache.put_many(model_key, new_vectors)
+        except Exception as e:
+            cache.stats.errors += 1
+            logger.warning(f"Failed to store embeddings in cache: {e}")
+        vectors.update(new_vectors)
+
+    return [vectors[key] for key in hashes]
+
+
+@dataclass(frozen=True)
+class EmbeddingBatchLimits:
+    """Per-request limits of an embedding provider."""
+
+    max_items: int
+    max_tokens: int
+
+
+# Conservative per-request limits by Esperanto provider name
+PROVIDER_BATCH_LIMITS: Dict[str, EmbeddingBatchLimits] = {
+    "openai": EmbeddingBatchLimits(max_items=2048, max_tokens=300_000),
+    "azure": EmbeddingBatchLimits(max_items=2048, max_tokens=300_000),
+    "openai-compatible": EmbeddingBatchLimits(max_items=256, max_tokens=100_000),
+    "google": EmbeddingBatchLimits(max_items=100, max_tokens=100_000),
+    "vertex": EmbeddingBatchLimits(max_items=250, max_tokens=20_000),
+    "mistral": EmbeddingBatchLimits(max_items=128, max_tokens=16_000),
+    "voyage": EmbeddingBatchLimits(max_items=1000, max_tokens=120_000),
+    "jina": EmbeddingBatchLimits(max_items=512, max_tokens=100_000),
+    "ollama": EmbeddingBatchLimits(max_items=512, max_tokens=1_000_000),
+}
+DEFAULT_BATCH_LIMITS = EmbeddingBatchLimits(max_items=256, max_tokens=100_000)
+
+
+def get_batch_limits(provider: Optional[str]) -> EmbeddingBatchLimits:
+    """Provider limits, overridable with EMBEDDING_BATCH_MAX_ITEMS/_MAX_TOKENS."""
+    limits = PROVIDER_BATCH_LIMITS.get(str(provider), DEFAULT_BATCH_LIMITS)
+    return EmbeddingBatchLimits(
+        max_items=env_int("EMBEDDING_BATCH_MAX_ITEMS", limits.max_items, minimum=1),
+        max_tokens=env_int("EMBEDDING_BATCH_MAX_TOKENS", limits.max_tokens, minimum=1),
+    )
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap upper-bound token estimate (about 3 UTF-8 bytes per token).
+
+    Overestimates English (~4 bytes/token) and treats each CJK character as a
+    token, so batches stay under provider limits without running a tokenizer
+    over every chunk.
+    """
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+def split_embedding_batches(
+    texts: List[str], limits: EmbeddingBatchLimits
+) -> List[Tuple[int, int]]:
+    """Split texts into [start, end) ranges within the item and token limits.
+
+    A single text over the token limit still gets a batch of its own.
+    """
+    batches: List[Tuple[int, int]] = []
+    start = 0
+    tokens = 0
+    for idx, text in enumerate(texts):
+        size = estimate_tokens(text)
+        if idx > start and (
+            idx - start >= limits.max_items or tokens + size > limits.max_tokens
+        ):
+            batches.append((start, idx))
+            start, tokens = idx, 0
+        tokens += size
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+async def _embed_texts(
+    embedding_model: Any, texts: List[str], command_id: Optional[str]
+) -> List[List[float]]:
+    """Send texts to the provider in limit-sized batches, several at a time.
+
+    Only a failed batch is retried (with exponential-jitter backoff); once a
+    batch exhausts its attempts the others are cancelled. Results are
+    reassembled in input order.
+    """
     model_name = getattr(embedding_model, "model_name", "unknown")
 
     # Log text sizes for debugging
     text_sizes = [len(t) for t in texts]
+    limits = get_batch_limits(getattr(embedding_model, "provider", None))
+    batches = split_embedding_batches(texts, limits)
+    concurrency = env_int("EMBEDDING_CONCURRENCY", 4, minimum=1)
+    retries = env_int("EMBEDDING_BATCH_ATTEMPTS", 3, minimum=1)
     logger.debug(
         f"Generating embeddings for {len(texts)} texts "
         f"(sizes: min={min(text_sizes)}, max={max(text_sizes)}, "
-        f"total={sum(text_sizes)} chars)"
+        f"total={sum(text_sizes)} chars) in {len(batches)} batches"
     )
 
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(start: int, end: int) -> List[List[float]]:
+        batch = texts[start:end]
+        async with semaphore:
+            for attempt in range(1, retries + 1):
+                try:
+                    return await embedding_model.aembed(batch)
+                except Exception as e:
+                    if attempt == retries:
+                        raise
+                    delay = min(0.5 * 2 ** (attempt - 1), 8.0) * (0.5 + random.random())
+                    logger.debug(
+                        f"Embedding batch {start}-{end} failed "
+                        f"(attempt {attempt}/{retries}), retrying in {delay:.1f}s: {e}"
+                    )
+                    await asyncio.sleep(delay)
+        return []  # pragma: no cover - loop always returns or raises
+
     try:
-        # Single API call for all texts
-        embeddings = await embedding_model.aembed(texts)
-        logger.debug(f"Generated {len(embeddings)} embeddings")
-        return embeddings
+        try:
+            async with asyncio.TaskGroup() as group:
+                tasks = [group.create_task(run(start, end)) for start, end in batches]
+        except ExceptionGroup as errors:
+            # The first failed batch cancelled the others
+            raise errors.exceptions[0] from None
+        embeddings = []
+        for (start, end), task in zip(batches, tasks):
+            output = task.result()
+            if len(output) != end - start:
+                raise ValueError(
+                    f"got {len(output)} embeddings for batch of {end - start}"
+                )
+            embeddings.extend(output)
     except Exception as e:
         # Log at debug level - the calling command will log at appropriate level
         # based on whether retries are exhausted
@@ -139,22 +317,26 @@ async def generate_embeddings(
             f"Failed to generate embeddings using model '{model_name}': {e}"
         ) from e
 
+    logger.debug(f"Generated {len(embeddings)} embeddings")
+    return embeddings
+
 
 async def generate_embedding(
     text: str,
     content_type: Optional[ContentType] = None,
     file_path: Optional[str] = None,
     command_id: Optional[str] = None,
+    use_cache: bool = True,
 ) -> List[float]:
     """
     Generate a single embedding for text, handling large content via chunking and mean pooling.
 
-    For short text (<= CHUNK_SIZE):
+    For short text (fits in one chunk):
         - Embeds directly and returns the embedding
 
-    For long text (> CHUNK_SIZE):
+    For long text:
         - Chunks the text using appropriate splitter for content type
-        - Embeds all chunks in a single API call
+        - Embeds all chunks with one generate_embeddings() call
         - Combines embeddings via mean pooling
 
     Args:
@@ -162,6 +344,7 @@ async def generate_embedding(
         content_type: Optional explicit content type for chunking
         file_path: Optional file path for content type detection
         command_id: Optional command ID for error logging context
+        use_cache: Set to False to bypass the persistent embedding cache
 
     Returns:
         Single embedding vector (list of floats)
@@ -173,35 +356,86 @@ async def generate_embedding(
     if not text or not text.strip():
         raise ValueError("Cannot generate embedding for empty text")
 
-    text = text.strip()
-
-    # Check if chunking is needed
-    if len(text) <= CHUNK_SIZE:
-        # Short text - embed directly
-        logger.debug(f"Embedding short text ({len(text)} chars) directly")
-        embeddings = await generate_embeddings([text], command_id=command_id)
-        return embeddings[0]
-
-    # Long text - chunk and mean pool
-    logger.debug(f"Text exceeds chunk size ({len(text)} chars), chunking...")
-
-    chunks = chunk_text(text, content_type=content_type, file_path=file_path)
-
-    if not chunks:
-        raise ValueError("Text chunking produced no chunks")
+    chunks = split_for_embedding(text, content_type=content_type, file_path=file_path)
 
     if len(chunks) == 1:
-        # Single chunk after splitting
-        embeddings = await generate_embeddings(chunks, command_id=command_id)
+        embeddings = await generate_embeddings(
+            chunks, command_id=command_id, use_cache=use_cache
+        )
         return embeddings[0]
 
     logger.debug(f"Embedding {len(chunks)} chunks and mean pooling")
 
-    # Embed all chunks in single API call
-    embeddings = await generate_embeddings(chunks, command_id=command_id)
+    # Embed all chunks together
+    embeddings = await generate_embeddings(
+        chunks, command_id=command_id, use_cache=use_cache
+    )
 
     # Mean pool to get single embedding
     pooled = await mean_pool_embeddings(embeddings)
 
     logger.debug(f"Mean pooled {len(embeddings)} embeddings into single vector")
     return pooled
+
+
+async def embed_query(query: str) -> List[float]:
+    """
+    Embed a search query, reusing recent embeddings of the same query.
+
+    Looks the query up in the in-process query embedding cache first (keyed
+    by model and normalised text) and only calls generate_embedding() on a
+    miss. Use this instead of generate_embedding() for search queries.
+
+    Raises:
+        ValueError: If query is empty or no embedding model configured
+    """
+    if not query or not query.strip():
+        raise ValueError("Cannot generate embedding for empty text")
+
+    # Lazy import to avoid circular dependency
+    from open_notebook.ai.models import model_manager
+
+    cache = get_query_embedding_cache()
+    model_key = None
+    if cache.enabled:
+        embedding_model = await model_manager.get_embedding_model()
+        model_key = model_cache_key(embedding_model) if embedding_model else None
+    if model_key is not None:
+        cached = cache.get(model_key, query)
+        if cached is not None:
+            return cached
+
+    embedding = await generate_embedding(query, use_cache=query_persist_enabled())
+    if model_key is not None:
+        cache.put(model_key, query, embedding)
+    return embedding
+
+
+def split_for_embedding(
+    text: str,
+    content_type: Optional[ContentType] = None,
+    file_path: Optional[str] = None,
+) -> List[str]:
+    """
+    Split text into the chunks generate_embedding() embeds and pools.
+
+    Short text (see fits_in_chunk()) is a single chunk; longer text is chunked
+    with the splitter for its content type.
+
+    Raises:
+        ValueError: If text is empty or chunking produced no chunks
+    """
+    text = text.strip()
+    if not text:
+        raise ValueError("Cannot generate embedding for empty text")
+
+    # Check if chunking is needed
+    if fits_in_chunk(text):
+        logger.debug(f"Embedding short text ({len(text)} chars) directly")
+        return [text]
+
+    logger.debug(f"Text exceeds chunk size ({len(text)} chars), chunking...")
+    chunks = chunk_text(text, content_type=content_type, file_path=file_path)
+    if not chunks:
+        raise ValueError("Text chunking produced no chunks")
+    return chunks
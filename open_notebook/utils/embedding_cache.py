@@ -0,0 +1,230 @@
+"""
+Persistent, content-addressed cache of embedding vectors.
+
+Re-embedding an unchanged source, re-saving a note or rebuilding all
+embeddings sends text to the provider that was already embedded before.
+``generate_embeddings`` consults this cache first and only sends misses to
+the provider.
+
+Entries are keyed by (model key, SHA-256 of the normalised text), so each
+embedding model keeps its own vectors. Vectors are stored as float32 blobs
+in a local SQLite file shared by the API and the worker (WAL mode). When the
+entry limit is exceeded, the least recently used entries are evicted.
+
+Environment Variables:
+    EMBEDDING_CACHE_ENABLED: Set to "false" to always call the provider (default: true)
+    EMBEDDING_CACHE_MAX_ENTRIES: Maximum cached vectors across all models (default: 50000)
+    EMBEDDING_CACHE_PATH: SQLite file (default: <DATA_FOLDER>/sqlite-db/embedding-cache.sqlite)
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from open_notebook.config import EMBEDDING_CACHE_FILE
+
+# Evict down to this fraction of the limit so eviction doesn't run per write
+_EVICT_TO = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embedding_cache (
+    model TEXT NOT NULL,
+    text_hash TEXT NOT NULL,
+    dims INTEGER NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, text_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used
+    ON embedding_cache (last_used);
+"""
+
+
+def embedding_cache_enabled() -> bool:
+    return os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() not in (
+        "false",
+        "0",
+        "no",
+    )
+
+
+def text_hash(text: str) -> str:
+    """Hash of the normalised text (NFC, unified newlines, stripped)."""
+    normalised = unicodedata.normalize("NFC", text).replace("\r\n", "\n").strip()
+    return hashlib.sha256(normalised.encode("utf-8")).hexdigest()
+
+
+def model_cache_key(embedding_model: Any) -> Optional[str]:
+    """Identify an Esperanto embedding model, or None if it can't be keyed."""
+    model_name = getattr(embedding_model, "model_name", None)
+    provider = getattr(embedding_model, "provider", None)
+    if not isinstance(model_name, str) or not isinstance(provider, str):
+        return None
+    return f"{provider}:{model_name}"
+
+
+@dataclass
+class EmbeddingCacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    errors: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class EmbeddingCache:
+    """SQLite-backed map from (model, text hash) to an embedding vector."""
+
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None):
+        self.path = path or os.getenv("EMBEDDING_CACHE_PATH") or EMBEDDING_CACHE_FILE
+        if max_entries is None:
+            try:
+                max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "50000"))
+            except ValueError:
+                logger.warning(
+                    "Invalid EMBEDDING_CACHE_MAX_ENTRIES. Using default: 50000"
+                )
+                max_entries = 50000
+        self.max_entries = max_entries
+        self.stats = EmbeddingCacheStats()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get_many_sync(
+        self, model: str, hashes: Sequence[str]
+    ) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            conn = self._connection()
+            # Stay below SQLite's bound-parameter limit
+            for start in range(0, len(unique), 500):
+                batch = unique[start : start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT text_hash, vector FROM embedding_cache "
+                    f"WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model, *batch],
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? "
+                    "WHERE model = ? AND text_hash = ?",
+                    [(now, model, key) for key in found],
+                )
+                conn.commit()
+            self.stats.hits += sum(1 for key in hashes if key in found)
+            self.stats.misses += sum(1 for key in hashes if key not in found)
+        return found
+
+    def put_many_sync(self, model: str, entries: Mapping[str, Sequence[float]]) -> None:
+        if not entries or self.max_entries <= 0:
+            return
+        now = time.time()
+        rows = []
+        for key, vector in entries.items():
+            arr = np.asarray(vector, dtype=np.float32)
+            rows.append((model, key, int(arr.shape[0]), arr.tobytes(), now))
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache "
+                "(model, text_hash, dims, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.stats.writes += len(rows)
+            (count,) = conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()
+            if count > self.max_entries:
+                excess = count - int(self.max_entries * _EVICT_TO)
+                conn.execute(
+                    "DELETE FROM embedding_cache WHERE rowid IN ("
+                    "SELECT rowid FROM embedding_cache ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+                self.stats.evictions += excess
+            conn.commit()
+
+    async def get_many(
+        self, model: str, hashes: Sequence[str]
+    ) -> Dict[str, List[float]]:
+        return await asyncio.to_thread(self.get_many_sync, model, hashes)
+
+    async def put_many(
+        self, model: str, entries: Mapping[str, Sequence[float]]
+    ) -> None:
+        await asyncio.to_thread(self.put_many_sync, model, entries)
+
+    def clear(self, model: Optional[str] = None) -> None:
+        with self._lock:
+            conn = self._connection()
+            if model is None:
+                conn.execute("DELETE FROM embedding_cache")
+            else:
+                conn.execute("DELETE FROM embedding_cache WHERE model = ?", (model,))
+            conn.commit()
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = asdict(self.stats)
+        data.update(
+            max_entries=self.max_entries,
+            hit_ratio=round(self.stats.hit_ratio, 4),
+            path=self.path,
+        )
+        try:
+            with self._lock:
+                rows = (
+                    self._connection()
+                    .execute(
+                        "SELECT model, COUNT(*) FROM embedding_cache GROUP BY model"
+                    )
+                    .fetchall()
+                )
+            data["entries"] = {model: count for model, count in rows}
+        except sqlite3.Error as e:
+            data["entries"] = {}
+            data["error"] = str(e)
+        return data
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_embedding_cache: Optional[EmbeddingCache] = None
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """Process-wide embedding cache."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache()
+    return _embedding_cache
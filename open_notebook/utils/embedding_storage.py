@@ -0,0 +1,192 @@
+"""
+Storage format for embedding vectors.
+
+By default embeddings are stored as float arrays on ``source_embedding``,
+``source_insight`` and ``note``. With ``EMBEDDING_STORAGE_FORMAT=int8`` each
+vector is scalar-quantised instead: components become integers in
+[-127, 127] and a per-vector ``embedding_scale`` is stored next to them
+(``value ~= int * scale``). Small integers are far cheaper than float64
+values in SurrealDB storage, over the websocket (CBOR) and when decoding
+results.
+
+Cosine similarity does not depend on vector length, so SurrealDB's
+``vector::similarity::cosine`` (and ``fn::vector_search``) rank int8 rows
+against a float query directly. Only code that needs actual values has to
+dequantise them, with ``decode_embedding``.
+
+With ``EMBEDDING_HEAD_DIMENSIONS`` set, every row also gets an
+``embedding_head``: the first N components, int8-quantised. For
+Matryoshka-trained models (OpenAI text-embedding-3, nomic-embed, ...) this
+prefix is itself a usable embedding. Vector search then runs in two stages:
+it ranks all rows by their head and re-scores only the best candidates with
+the full vector (see ``fn::vector_search_two_stage``).
+
+``convert_embedding_storage`` rewrites existing rows, including their heads.
+Before quantising, it measures recall@10 of int8 against full precision on a
+sample and refuses to convert below ``EMBEDDING_INT8_MIN_RECALL``.
+
+Environment Variables:
+    EMBEDDING_STORAGE_FORMAT: "float" (default) or "int8"
+    EMBEDDING_INT8_MIN_RECALL: Minimum recall@10 required to quantise (default: 0.95)
+    EMBEDDING_HEAD_DIMENSIONS: Components kept for two-stage search, e.g. 256 (default: 0, off)
+"""
+
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+STORAGE_FORMATS = ("float", "int8")
+_INT8_MAX = 127
+
+
+def storage_format() -> str:
+    value = os.getenv("EMBEDDING_STORAGE_FORMAT", "float").lower()
+    if value not in STORAGE_FORMATS:
+        logger.warning(
+            f"Invalid EMBEDDING_STORAGE_FORMAT value: '{value}'. Using default: float"
+        )
+        return "float"
+    return value
+
+
+def min_int8_recall() -> float:
+    value = os.getenv("EMBEDDING_INT8_MIN_RECALL", "0.95")
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(
+            f"Invalid EMBEDDING_INT8_MIN_RECALL value: '{value}'. Using default: 0.95"
+        )
+        return 0.95
+
+
+def head_dimensions() -> int:
+    value = os.getenv("EMBEDDING_HEAD_DIMENSIONS", "0")
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        logger.warning(
+            f"Invalid EMBEDDING_HEAD_DIMENSIONS value: '{value}'. Using default: 0"
+        )
+        return 0
+
+
+def quantize_int8(
+    vector: Union[Sequence[float], np.ndarray],
+) -> Tuple[List[int], float]:
+    """Symmetric per-vector int8 quantisation; returns (values, scale)."""
+    arr = np.asarray(vector, dtype=np.float32)
+    peak = float(np.max(np.abs(arr))) if arr.size else 0.0
+    if peak == 0.0:
+        return [0] * arr.size, 0.0
+    scale = peak / _INT8_MAX
+    return np.rint(arr / scale).astype(np.int8).tolist(), scale
+
+
+def dequantize_int8(values: Sequence[int], scale: float) -> List[float]:
+    return (np.asarray(values, dtype=np.float32) * np.float32(scale)).tolist()
+
+
+def embedding_head(
+    vector: Sequence[float], dims: Optional[int] = None
+) -> Optional[List[int]]:
+    """int8 prefix of a vector for two-stage search, or None when disabled.
+
+    Only cosine similarity is computed on heads, so the scale is dropped.
+    """
+    dims = head_dimensions() if dims is None else dims
+    if not dims or len(vector) <= dims:
+        return None
+    return quantize_int8(vector[:dims])[0]
+
+
+def encode_embedding(
+    vector: Sequence[float], format: Optional[str] = None
+) -> Dict[str, Any]:
+    """Fields to write for an embedding in the configured storage format.
+
+    ``embedding_scale`` is always present: None (NONE in SurrealDB) removes a
+    stale scale when a row goes back to float storage. ``embedding_head`` is
+    added while EMBEDDING_HEAD_DIMENSIONS is set.
+    """
+    if (format or storage_format()) == "int8":
+        values, scale = quantize_int8(vector)
+        encoded: Dict[str, Any] = {"embedding": values, "embedding_scale": scale}
+    else:
+        encoded = {"embedding": list(vector), "embedding_scale": None}
+    head = embedding_head(vector)
+    if head is not None:
+        encoded["embedding_head"] = head
+    return encoded
+
+
+def decode_embedding(row: Dict[str, Any]) -> Optional[List[float]]:
+    """Float vector of a row read with ``embedding`` (and ``embedding_scale``)."""
+    values = row.get("embedding")
+    if not values:
+        return None
+    scale = row.get("embedding_scale")
+    if scale is None:
+        return [float(v) for v in values]
+    return dequantize_int8(values, scale)
+
+
+def _top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    norms = np.linalg.norm(corpus, axis=1, keepdims=True)
+    normalized = corpus / np.where(norms > 0, norms, 1.0)
+    scores = queries @ normalized.T
+    k = min(k, corpus.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return top
+
+
+def int8_recall_at_k(
+    vectors: Sequence[Sequence[float]],
+    queries: Sequence[Sequence[float]],
+    k: int = 10,
+) -> float:
+    """Share of the full-precision top-k neighbours int8 storage still finds."""
+    if not len(vectors) or not len(queries):
+        return 1.0
+    corpus = np.asarray(vectors, dtype=np.float32)
+    quantized = np.asarray(
+        [dequantize_int8(*quantize_int8(vector)) for vector in corpus],
+        dtype=np.float32,
+    )
+    query_arr = np.asarray(queries, dtype=np.float32)
+    expected = _top_k(corpus, query_arr, k)
+    actual = _top_k(quantized, query_arr, k)
+    hits = sum(
+        len(set(exp.tolist()) & set(act.tolist())) for exp, act in zip(expected, actual)
+    )
+    return hits / expected.size
+
+
+def head_recall_at_k(
+    vectors: Sequence[Sequence[float]],
+    queries: Sequence[Sequence[float]],
+    dims: int,
+    candidates: int,
+    k: int = 10,
+) -> float:
+    """Share of the exact top-k that two-stage search still finds.
+
+    Stage one keeps the ``candidates`` best rows by int8 head similarity,
+    stage two re-ranks them with the full vectors.
+    """
+    if not len(vectors) or not len(queries):
+        return 1.0
+    corpus = np.asarray(vectors, dtype=np.float32)
+    query_arr = np.asarray(queries, dtype=np.float32)
+    heads = np.asarray(
+        [quantize_int8(vector[:dims])[0] for vector in corpus], dtype=np.float32
+    )
+    shortlist = _top_k(heads, query_arr[:, :dims], candidates)
+    expected = _top_k(corpus, query_arr, k)
+    hits = 0
+    for query, rows, exp in zip(query_arr, shortlist, expected):
+        reranked = rows[_top_k(corpus[rows], query[None, :], k)[0]]
+        hits += len(set(exp.tolist()) & set(reranked.tolist()))
+    return hits / expected.size
@@ -0,0 +1,38 @@
+"""
+Numeric settings read from environment variables.
+
+An unset or empty variable gives the default; an unparsable value logs a
+warning and gives the default as well, so a typo never stops the app.
+"""
+
+import os
+
+from loguru import logger
+
+
+def env_int(name: str, default: int, minimum: int = 0) -> int:
+    """Read an integer setting, raised to minimum when set below it."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        parsed = int(value)
+    except ValueError:
+        logger.warning(f"Invalid {name} value: '{value}'. Using default: {default}")
+        return default
+    if parsed < minimum:
+        logger.warning(f"{name} ({parsed}) is below {minimum}. Using {minimum}.")
+        return minimum
+    return parsed
+
+
+def env_float(name: str, default: float) -> float:
+    """Read a float setting."""
+    value = os.getenv(name)
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        logger.warning(f"Invalid {name} value: '{value}'. Using default: {default}")
+        return default
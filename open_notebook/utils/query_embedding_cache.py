@@ -0,0 +1,137 @@
+"""
+In-process LRU of search query embeddings.
+
+Every vector search embeds its query first, which costs a provider round-trip
+(typically 100-400 ms). Users repeat searches and page through results, and
+the ask graph and research assistant embed the same or similar sub-queries
+again and again. ``embed_query`` keeps recent query vectors in memory,
+keyed by embedding model and normalised query text (NFC, whitespace
+collapsed), so repeated searches skip the provider entirely.
+
+A miss falls through to ``generate_embedding``, which consults the persistent
+embedding cache (unless ``QUERY_EMBEDDING_PERSIST=false``), so queries also
+survive restarts and are shared between the API and the worker.
+
+Environment Variables:
+    QUERY_EMBEDDING_CACHE_SIZE: Maximum cached queries, 0 disables (default: 512)
+    QUERY_EMBEDDING_CACHE_TTL: Seconds an entry stays valid (default: 3600)
+    QUERY_EMBEDDING_PERSIST: Set to "false" to keep queries out of the persistent cache
+"""
+
+import os
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from open_notebook.utils.env import env_float, env_int
+
+
+def query_persist_enabled() -> bool:
+    return os.getenv("QUERY_EMBEDDING_PERSIST", "true").lower() not in (
+        "false",
+        "0",
+        "no",
+    )
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query: NFC with runs of whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+@dataclass
+class QueryEmbeddingCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class QueryEmbeddingCache:
+    """Thread-safe LRU + TTL map from (model, normalised query) to a vector."""
+
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[float] = None):
+        self.max_size = int(
+            max_size
+            if max_size is not None
+            else env_int("QUERY_EMBEDDING_CACHE_SIZE", 512)
+        )
+        self.ttl = (
+            ttl if ttl is not None else env_float("QUERY_EMBEDDING_CACHE_TTL", 3600)
+        )
+        self.stats = QueryEmbeddingCacheStats()
+        # float32 halves the footprint of Python float lists
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0 and self.ttl > 0
+
+    def get(self, model: str, query: str) -> Optional[List[float]]:
+        key = (model, normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return None
+            expires_at, vector = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+        return vector.tolist()
+
+    def put(self, model: str, query: str, vector: List[float]) -> None:
+        if not self.enabled:
+            return
+        key = (model, normalize_query(query))
+        stored = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, stored)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        data = asdict(self.stats)
+        data.update(
+            size=size,
+            max_size=self.max_size,
+            ttl=self.ttl,
+            hit_ratio=round(self.stats.hit_ratio, 4),
+        )
+        return data
+
+
+_query_embedding_cache: Optional[QueryEmbeddingCache] = None
+
+
+def get_query_embedding_cache() -> QueryEmbeddingCache:
+    """Process-wide query embedding cache."""
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        _query_embedding_cache = QueryEmbeddingCache()
+    return _query_embedding_cache
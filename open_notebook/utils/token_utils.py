@@ -1,9 +1,18 @@
 """
 Token utilities for Open Notebook.
 Handles token counting and cost calculations for language models.
+
+All counting goes through the module-level ``token_counter``, which loads the
+'o200k_base' encoder once and reuses it:
+- count() / count_batch(): exact counts (the batch runs on tiktoken's threads)
+- estimate(): character-class estimate that never runs the tokenizer
+- exceeds(): threshold check that only tokenizes text near the threshold
 """
 
 import os
+import re
+import threading
+from typing import Any, Iterable, List, Optional
 
 from open_notebook.config import TIKTOKEN_CACHE_DIR
 
@@ -11,6 +20,130 @@ from open_notebook.config import TIKTOKEN_CACHE_DIR
 # tokenizer encodings are cached persistently in the data folder
 os.environ["TIKTOKEN_CACHE_DIR"] = TIKTOKEN_CACHE_DIR
 
+ENCODING_NAME = "o200k_base"
+# For natural-language text in the scripts weighted_length() knows, the exact
+# count stays within this factor of the estimate; exceeds() tokenizes
+# anything closer to the threshold than that
+ESTIMATE_ERROR_FACTOR = 1.5
+
+
+# CJK ideographs, kana, Hangul and full-width forms: about one token each
+_WIDE_CHARS = re.compile(
+    "[\u1100-\u11ff\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff"
+    "\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]"
+)
+
+
+def weighted_length(input_string: str) -> int:
+    """
+    Length of a string in quarter tokens of the 'o200k_base' encoding, estimated.
+
+    ASCII characters count 1 (about four per token), characters of other
+    alphabets (Cyrillic, Greek, Arabic, ...) count 2 and CJK characters
+    count 4. Unlike a rounded token estimate, the weight of a concatenation
+    is the sum of the weights of its parts.
+
+    Args:
+        input_string (str): The input string to weigh.
+
+    Returns:
+        int: The estimated number of tokens, times four.
+    """
+    ascii_chars = len(input_string.encode("ascii", "ignore"))
+    if ascii_chars == len(input_string):
+        return ascii_chars
+    wide_chars = len(_WIDE_CHARS.findall(input_string))
+    other_chars = len(input_string) - ascii_chars - wide_chars
+    return ascii_chars + 2 * other_chars + 4 * wide_chars
+
+
+def approximate_token_count(input_string: str) -> int:
+    """
+    Estimate the 'o200k_base' token count from character classes, without encoding.
+
+    Follows the tokenizer across languages where len() does not: CJK text
+    has about four times as many tokens per character as English.
+
+    Args:
+        input_string (str): The input string to estimate tokens for.
+
+    Returns:
+        int: The estimated number of tokens.
+    """
+    return (weighted_length(input_string) + 3) // 4
+
+
+class TokenCounter:
+    """Token counting with a lazily loaded, shared tiktoken encoder."""
+
+    def __init__(self, encoding_name: str = ENCODING_NAME):
+        self.encoding_name = encoding_name
+        self._encoding: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    def _get_encoding(self) -> Any:
+        """Load the encoder on first use. Raises ImportError without tiktoken."""
+        if self._encoding is None:
+            with self._lock:
+                if self._encoding is None:
+                    import tiktoken
+
+                    self._encoding = tiktoken.get_encoding(self.encoding_name)
+        return self._encoding
+
+    @staticmethod
+    def _fallback_count(text: str) -> int:
+        # Simple word count estimation when tiktoken is not installed
+        return int(len(text.split()) * 1.3)
+
+    def count(self, text: str) -> int:
+        """Exact token count. Special-token strings in text count as plain text."""
+        try:
+            encoding = self._get_encoding()
+        except ImportError:
+            return self._fallback_count(text)
+        return len(encoding.encode_ordinary(text))
+
+    def count_batch(self, texts: Iterable[str], num_threads: int = 8) -> List[int]:
+        """Exact token counts of many texts, encoded in parallel by tiktoken."""
+        texts = list(texts)
+        if len(texts) <= 1:
+            return [self.count(text) for text in texts]
+        try:
+            encoding = self._get_encoding()
+        except ImportError:
+            return [self._fallback_count(text) for text in texts]
+        return [
+            len(tokens)
+            for tokens in encoding.encode_ordinary_batch(texts, num_threads=num_threads)
+        ]
+
+    def estimate(self, text: str) -> int:
+        """Cheap estimate, see approximate_token_count()."""
+        return approximate_token_count(text)
+
+    def exceeds(self, text: str, threshold: int) -> bool:
+        """
+        Whether text has more than threshold tokens, tokenizing only if close.
+
+        A token is at least one UTF-8 byte, so text of at most threshold / 4
+        characters never exceeds it. Otherwise the estimate decides unless it
+        is within ESTIMATE_ERROR_FACTOR of the threshold, where the exact
+        count is used.
+        """
+        if len(text) * 4 <= threshold:
+            return False
+        estimate = approximate_token_count(text)
+        if estimate > threshold * ESTIMATE_ERROR_FACTOR:
+            return True
+        if estimate * ESTIMATE_ERROR_FACTOR <= threshold:
+            return False
+        return self.count(text) > threshold
+
+
+# Process-wide token counter; the encoder is loaded on first use
+token_counter = TokenCounter()
+
 
 def token_count(input_string: str) -> int:
     """
@@ -22,15 +155,7 @@ def token_count(input_string: str) -> int:
     Returns:
         int: The number of tokens in the input string.
     """
-    try:
-        import tiktoken
-
-        encoding = tiktoken.get_encoding("o200k_base")
-        tokens = encoding.encode(input_string)
-        return len(tokens)
-    except ImportError:
-        # Fallback: simple word count estimation
-        return int(len(input_string.split()) * 1.3)
+    return token_counter.count(input_string)
 
 
 def token_cost(token_count: int, cost_per_million: float = 0.150) -> float:
@@ -18,6 +18,9 @@ from open_notebook.domain.workflow import (
 )
 from open_notebook.workflows.engine import WorkflowEngine
 
+# Page size when streaming execution history for statistics
+STATS_BATCH_SIZE = 500
+
 
 class WorkflowService:
     """Service for workflow operations.
@@ -204,23 +207,25 @@ class WorkflowService:
         self,
         workflow_id: Optional[str] = None,
     ) -> Dict[str, Any]:
-        """Get execution statistics."""
-        executions = await self.list_executions(workflow_id, limit=1000)
-
-        if not executions:
-            return {
-                "total": 0,
-                "by_status": {},
-                "avg_duration": 0,
-                "success_rate": 0,
-            }
+        """Get execution statistics.
 
+        Executions are streamed in pages with only the columns the stats need,
+        so the whole history is covered without holding it in memory.
+        """
+        total = 0
         by_status: Dict[str, int] = {}
         total_duration = 0
         duration_count = 0
         successful = 0
 
-        for exec in executions:
+        executions = WorkflowExecution.iter_all(
+            batch_size=STATS_BATCH_SIZE,
+            where="workflow_definition_id = $workflow_id" if workflow_id else None,
+            vars={"workflow_id": workflow_id} if workflow_id else None,
+            fields=["workflow_definition_id", "status", "started_at", "completed_at"],
+        )
+        async for exec in executions:
+            total += 1
             status = exec.status.value
             by_status[status] = by_status.get(status, 0) + 1
 
@@ -231,9 +236,17 @@ class WorkflowService:
             if exec.status == WorkflowStatus.SUCCESS:
                 successful += 1
 
+        if not total:
+            return {
+                "total": 0,
+                "by_status": {},
+                "avg_duration": 0,
+                "success_rate": 0,
+            }
+
         return {
-            "total": len(executions),
+            "total": total,
             "by_status": by_status,
             "avg_duration": total_duration / duration_count if duration_count > 0 else 0,
-            "success_rate": successful / len(executions),
+            "success_rate": successful / total,
         }
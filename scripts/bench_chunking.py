@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Chunk-count and token-histogram benchmark for character vs token chunking.
+
+Chunks synthetic English, Chinese, Japanese, Russian, code and mixed-language
+documents in character mode (CHUNK_SIZE) and in token mode (CHUNK_TOKENS),
+and reports the number of chunks, the distribution of their exact
+'o200k_base' token counts and the time taken. Token mode is also timed
+against a splitter that tokenizes every candidate split.
+
+Usage:
+    python scripts/bench_chunking.py [--paragraphs 400] [--tokens 300]
+"""
+
+import argparse
+import random
+import time
+from typing import Callable, Dict, List
+
+from open_notebook.utils import chunking
+from open_notebook.utils.chunking import ContentType, chunk_text
+from open_notebook.utils.token_utils import token_count
+
+SENTENCES: Dict[str, List[str]] = {
+    "english": [
+        "Retrieval quality depends on how documents are split into chunks.",
+        "Each chunk is embedded separately and stored next to its source.",
+        "Overlap keeps sentences that straddle a boundary searchable.",
+        "Short chunks are precise, long chunks carry more context.",
+    ],
+    "chinese": [
+        "检索质量取决于文档如何被切分成块。",
+        "每个块都会单独生成向量并与原始来源一起存储。",
+        "重叠部分可以让跨越边界的句子仍然能够被检索到。",
+        "较短的块更精确，较长的块包含更多上下文。",
+    ],
+    "japanese": [
+        "検索の品質は文書をどのようにチャンクに分割するかに左右されます。",
+        "各チャンクは個別に埋め込まれ、元のソースと一緒に保存されます。",
+        "重なりがあることで境界をまたぐ文も検索できます。",
+    ],
+    "russian": [
+        "Качество поиска зависит от того, как документы делятся на фрагменты.",
+        "Каждый фрагмент встраивается отдельно и хранится рядом с источником.",
+        "Перекрытие сохраняет возможность поиска предложений на границе.",
+    ],
+    "code": [
+        "def split(text, size):\n    return [text[i:i + size] for i in range(0, len(text), size)]",
+        "for idx, chunk in enumerate(chunks):\n    store(idx, embed(chunk))",
+        "if not chunk.strip():\n    continue",
+    ],
+}
+
+
+def make_document(languages: List[str], paragraphs: int, seed: int = 0) -> str:
+    """Paragraphs of 2-12 sentences, cycling through the given languages."""
+    rng = random.Random(seed)
+    out = []
+    for i in range(paragraphs):
+        pool = SENTENCES[languages[i % len(languages)]]
+        sentences = [rng.choice(pool) for _ in range(rng.randint(2, 12))]
+        out.append(" ".join(sentences))
+    return "\n\n".join(out)
+
+
+def histogram(counts: List[int], budget: int) -> str:
+    """Token counts per bucket of a quarter of the budget."""
+    bucket = max(budget // 4, 1)
+    bins: Dict[int, int] = {}
+    for count in counts:
+        bins[count // bucket] = bins.get(count // bucket, 0) + 1
+    return " ".join(
+        f"{b * bucket}-{(b + 1) * bucket - 1}:{bins[b]}" for b in sorted(bins)
+    )
+
+
+def percentile(values: List[int], fraction: float) -> int:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run(
+    label: str, unit: str, split: Callable[[str], List[str]], text: str, budget: int
+) -> None:
+    chunking.CHUNK_UNIT = unit
+    start = time.perf_counter()
+    chunks = split(text)
+    elapsed = time.perf_counter() - start
+    counts = [token_count(chunk) for chunk in chunks]
+    over = sum(1 for count in counts if count > budget)
+    print(
+        f"  {label:<12} chunks={len(chunks):5d} "
+        f"tokens min/p50/p90/max={min(counts)}/{percentile(counts, 0.5)}/"
+        f"{percentile(counts, 0.9)}/{max(counts)} over={over} "
+        f"time={elapsed * 1000:8.1f} ms"
+    )
+    print(f"  {'':<12} histogram {histogram(counts, budget)}")
+
+
+def split_plain(text: str) -> List[str]:
+    return chunk_text(text, ContentType.PLAIN)
+
+
+def split_exact(text: str) -> List[str]:
+    """Token splitting that runs the tokenizer on every candidate split."""
+    return chunking._get_exact_token_splitter().split_text(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--paragraphs", type=int, default=400)
+    parser.add_argument("--tokens", type=int, default=300)
+    args = parser.parse_args()
+
+    chunking.CHUNK_TOKENS = args.tokens
+    chunking.CHUNK_TOKEN_OVERLAP = int(args.tokens * 0.15)
+
+    corpora = {
+        "english": ["english"],
+        "chinese": ["chinese"],
+        "japanese": ["japanese"],
+        "russian": ["russian"],
+        "code": ["code"],
+        "mixed": ["english", "chinese", "russian", "japanese", "code"],
+    }
+    print(f"CHUNK_SIZE={chunking.CHUNK_SIZE} chars, CHUNK_TOKENS={args.tokens} tokens")
+    for name, languages in corpora.items():
+        text = make_document(languages, args.paragraphs)
+        print(f"{name}: {len(text)} chars, {token_count(text)} tokens")
+        for unit in ("chars", "tokens"):
+            run(unit, unit, split_plain, text, args.tokens)
+        run("exact-split", "tokens", split_exact, text, args.tokens)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for SurrealDB result decoding.
+
+Compares the previous recursive parse_record_ids (which rebuilt every dict
+and list, including each float of every embedding) with the in-place
+decoder in open_notebook.database.decoding on embedding-heavy rows.
+
+Usage:
+    python scripts/bench_decoding.py [--rows 300] [--dim 1536] [--repeat 5]
+"""
+
+import argparse
+import random
+import timeit
+from typing import Any, Dict, List
+
+from surrealdb import RecordID  # type: ignore
+
+from open_notebook.database.decoding import decode_result
+
+
+def legacy_parse_record_ids(obj: Any) -> Any:
+    """The recursive decoder this benchmark measures against."""
+    if isinstance(obj, dict):
+        return {k: legacy_parse_record_ids(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [legacy_parse_record_ids(item) for item in obj]
+    elif isinstance(obj, RecordID):
+        return str(obj)
+    return obj
+
+
+def make_rows(rows: int, dim: int) -> List[Dict[str, Any]]:
+    """Build source_embedding-shaped rows as the driver returns them."""
+    rng = random.Random(0)
+    return [
+        {
+            "id": RecordID("source_embedding", f"chunk{i}"),
+            "source": RecordID("source", f"src{i % 10}"),
+            "order": i,
+            "content": "lorem ipsum " * 50,
+            "embedding": [rng.random() for _ in range(dim)],
+        }
+        for i in range(rows)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=300)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    template = make_rows(args.rows, args.dim)
+
+    def fresh() -> List[Dict[str, Any]]:
+        # The new decoder mutates in place, so each run gets its own copy
+        return [{**row, "embedding": row["embedding"]} for row in template]
+
+    legacy = min(
+        timeit.repeat(
+            lambda: legacy_parse_record_ids(template), number=1, repeat=args.repeat
+        )
+    )
+    batches = [fresh() for _ in range(args.repeat)]
+    current = min(
+        timeit.repeat(
+            lambda: decode_result(batches.pop()), number=1, repeat=args.repeat
+        )
+    )
+
+    assert decode_result(fresh()) == legacy_parse_record_ids(template)
+
+    print(f"rows={args.rows} dim={args.dim}")
+    print(f"legacy parse_record_ids: {legacy * 1000:8.2f} ms")
+    print(f"decode_result:           {current * 1000:8.2f} ms")
+    print(f"speed-up:                {legacy / current:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
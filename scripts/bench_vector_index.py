@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Recall and latency of vector index (KNN) search against the full scan.
+
+Loads clustered random vectors into a scratch table of the configured
+SurrealDB database and answers the same top-k queries two ways: scanning
+every row with vector::similarity::cosine, as fn::vector_search does, and
+with the KNN operator over an HNSW or M-tree index. Reports latency
+percentiles per query and recall@k against exact NumPy neighbours, for each
+ef value. The scratch table is removed afterwards.
+
+Usage:
+    python scripts/bench_vector_index.py [--rows 20000] [--dim 768] \\
+        [--queries 50] [--k 10] [--kind hnsw] [--ef 16,40,64,128]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+from open_notebook.database.bulk import repo_insert_bulk
+from open_notebook.database.repository import repo_query
+from open_notebook.database.vector_index import index_definition, knn_operator
+
+TABLE = "bench_vector_index"
+
+
+def make_vectors(
+    rows: int, dim: int, queries: int, seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Corpus and query vectors drawn around shared cluster centres."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(max(rows // 400, 8), dim))
+
+    def sample(n: int) -> np.ndarray:
+        picks = rng.integers(0, len(centres), n)
+        return (centres[picks] + rng.normal(scale=0.7, size=(n, dim))).astype(
+            np.float32
+        )
+
+    return sample(rows), sample(queries)
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    corpus = corpus / np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    scores = queries @ corpus.T
+    return [set(row[:k].tolist()) for row in np.argsort(-scores, axis=1)]
+
+
+async def run_queries(
+    query: str, vectors: np.ndarray
+) -> Tuple[List[float], List[List[Dict[str, Any]]]]:
+    latencies, results = [], []
+    for vector in vectors:
+        start = time.perf_counter()
+        rows = await repo_query(query, {"query": vector.tolist()})
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(rows)
+    return latencies, results
+
+
+def report(label: str, latencies: List[float], results, truth: List[set], k: int):
+    recall = np.mean(
+        [
+            len({row["n"] for row in rows} & expected) / k
+            for rows, expected in zip(results, truth)
+        ]
+    )
+    p50, p95 = np.percentile(latencies, [50, 95])
+    print(
+        f"  {label:<14} recall@{k}={recall:.3f} "
+        f"latency p50={p50:8.1f} ms p95={p95:8.1f} ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kind", choices=["hnsw", "mtree"], default="hnsw")
+    parser.add_argument("--ef", default="16,40,64,128")
+    args = parser.parse_args()
+
+    corpus, queries = make_vectors(args.rows, args.dim, args.queries)
+    truth = exact_top_k(corpus, queries, args.k)
+
+    await repo_query(f"REMOVE TABLE IF EXISTS {TABLE}")
+    try:
+        start = time.perf_counter()
+        await repo_insert_bulk(
+            TABLE,
+            [{"n": i, "embedding": vector.tolist()} for i, vector in enumerate(corpus)],
+        )
+        print(
+            f"Loaded {args.rows} x {args.dim} vectors "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+        latencies, results = await run_queries(
+            f"SELECT n, vector::similarity::cosine(embedding, $query) AS similarity "
+            f"FROM {TABLE} ORDER BY similarity DESC LIMIT {args.k}",
+            queries,
+        )
+        report("full scan", latencies, results, truth, args.k)
+
+        start = time.perf_counter()
+        await repo_query(index_definition(f"idx_{TABLE}", TABLE, args.dim, args.kind))
+        print(f"  Built {args.kind} index in {time.perf_counter() - start:.1f}s")
+
+        ef_values = [int(ef) for ef in args.ef.split(",")]
+        for ef in ef_values if args.kind == "hnsw" else [None]:
+            operator = knn_operator(args.k, args.kind, ef)
+            latencies, results = await run_queries(
+                f"SELECT n, vector::distance::knn() AS distance FROM {TABLE} "
+                f"WHERE embedding {operator} $query",
+                queries,
+            )
+            report(f"knn {operator}", latencies, results, truth, args.k)
+    finally:
+        await repo_query(f"REMOVE TABLE IF EXISTS {TABLE}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -6,6 +6,15 @@ Tests content type detection and text chunking functionality.
 
 import pytest
 
+from open_notebook.utils import chunking
+from open_notebook.utils.chunk_dedup import (
+    NearDuplicateIndex,
+    find_near_duplicates,
+    from_signed64,
+    hamming_distance,
+    simhash,
+    to_signed64,
+)
 from open_notebook.utils.chunking import (
     CHUNK_SIZE,
     ContentType,
@@ -13,7 +22,11 @@ from open_notebook.utils.chunking import (
     detect_content_type,
     detect_content_type_from_extension,
     detect_content_type_from_heuristics,
+    diff_chunks,
+    fits_in_chunk,
+    iter_chunks,
 )
+from open_notebook.utils.token_utils import approximate_token_count
 
 # ============================================================================
 # TEST SUITE 1: Content Type Detection from Extension
@@ -292,5 +305,243 @@ Content for section 2.
             assert len(chunk) <= CHUNK_SIZE + 300
 
 
+
+# ============================================================================
+# TEST SUITE 5: Chunk Diffing
+# ============================================================================
+
+MODEL = "openai:small"
+
+
+class TestDiffChunks:
+    """Test suite for matching new chunks to stored chunk rows."""
+
+    @staticmethod
+    def _rows(hashes, model=MODEL):
+        return [
+            {
+                "id": f"source_embedding:r{i}",
+                "order": i,
+                "content_hash": h,
+                "embedding_model": model,
+            }
+            for i, h in enumerate(hashes)
+        ]
+
+    def test_unchanged_text_reuses_everything(self):
+        diff = diff_chunks(self._rows(["a", "b", "c"]), ["a", "b", "c"], MODEL)
+        assert diff.embed == [] and diff.reorder == [] and diff.stale == []
+
+    def test_prepend_and_edit(self):
+        diff = diff_chunks(self._rows(["a", "b", "c"]), ["new", "a", "b2", "c"], MODEL)
+        assert diff.embed == [0, 2]
+        assert diff.reorder == [("source_embedding:r0", 1), ("source_embedding:r2", 3)]
+        assert diff.stale == ["source_embedding:r1"]
+
+    def test_repeated_chunks_match_one_to_one(self):
+        diff = diff_chunks(self._rows(["a"]), ["a", "a"], MODEL)
+        assert diff.embed == [1]
+        assert diff.stale == []
+
+    def test_other_model_or_legacy_rows_are_replaced(self):
+        rows = self._rows(["a"], model="ollama:nomic") + [
+            {"id": "source_embedding:legacy", "order": 1}
+        ]
+        diff = diff_chunks(rows, ["a", "b"], MODEL)
+        assert diff.embed == [0, 1]
+        assert diff.stale == ["source_embedding:r0", "source_embedding:legacy"]
+
+    def test_kept_maps_chunks_to_reused_rows(self):
+        diff = diff_chunks(self._rows(["a", "b"]), ["b", "new", "a"], MODEL)
+        assert diff.kept == {0: "source_embedding:r1", 2: "source_embedding:r0"}
+
+
+# ============================================================================
+# TEST SUITE 6: Streaming Chunker
+# ============================================================================
+
+
+def _fragments(text, size):
+    return (text[i : i + size] for i in range(0, len(text), size))
+
+
+class TestIterChunks:
+    """Test suite for the streaming chunker."""
+
+    PLAIN = "".join(
+        f"Paragraph {i}. " + "Some words, more words and a sentence. " * (i % 40)
+        + ("\n\n" if i % 3 else "\n")
+        + ("x" * 3000 if i % 97 == 0 else "")
+        for i in range(400)
+    )
+    MARKDOWN = "\n".join(
+        f"# Chapter {i}\n\nIntro text. " * 1
+        + "Body sentence, with words. " * (i * 7 % 120)
+        + f"\n## Section {i}\n- item\n- item\n```\n# not a header\n```\n"
+        for i in range(150)
+    )
+
+    @pytest.mark.parametrize("window", [2000, 20000])
+    def test_plain_matches_chunk_text(self, window):
+        expected = chunk_text(self.PLAIN, ContentType.PLAIN)
+        for source in (self.PLAIN, _fragments(self.PLAIN, 777)):
+            chunks = list(iter_chunks(source, ContentType.PLAIN, window=window))
+            assert [c.text for c in chunks] == expected
+
+    def test_plain_offsets_are_exact(self):
+        for chunk in iter_chunks(_fragments(self.PLAIN, 1000), ContentType.PLAIN):
+            assert self.PLAIN[chunk.start : chunk.end] == chunk.text
+
+    @pytest.mark.parametrize("window", [2000, 20000])
+    def test_markdown_matches_chunk_text(self, window):
+        expected = chunk_text(self.MARKDOWN, ContentType.MARKDOWN)
+        for source in (self.MARKDOWN, _fragments(self.MARKDOWN, 1500)):
+            chunks = list(iter_chunks(source, ContentType.MARKDOWN, window=window))
+            assert [c.text for c in chunks] == expected
+
+    def test_detection_and_short_text(self):
+        assert [c.text for c in iter_chunks(_fragments(self.MARKDOWN, 300))] == (
+            chunk_text(self.MARKDOWN)
+        )
+        assert [c.text for c in iter_chunks("  short  ")] == ["  short  "]
+        assert list(iter_chunks(["   ", "\n"])) == []
+
+
+# ============================================================================
+# TEST SUITE 7: Token-Based Chunking
+# ============================================================================
+
+
+def _exact_tokens(text):
+    # Stand-in for tiktoken: about three UTF-8 bytes per token, which is above
+    # the estimate for English, so chunks built on estimates get re-split
+    return len(text.encode("utf-8")) // 3 + 1
+
+
+@pytest.fixture
+def token_mode(monkeypatch):
+    monkeypatch.setattr(chunking, "CHUNK_UNIT", "tokens")
+    monkeypatch.setattr(chunking, "CHUNK_TOKENS", 120)
+    monkeypatch.setattr(chunking, "CHUNK_TOKEN_OVERLAP", 18)
+    monkeypatch.setattr(chunking, "token_count", _exact_tokens)
+
+
+class TestTokenChunking:
+    """Test suite for the token-based chunking mode."""
+
+    ENGLISH = "An English sentence about chunking, with some words. " * 8
+    CHINESE = "这是一个用于测试分块的中文句子，包含一些词语。" * 12
+    MIXED = "".join(
+        text + separator
+        for text, separator in zip(
+            [CHINESE, ENGLISH] * 30, ["\n", "\n\n", "\n\n"] * 20
+        )
+    )
+
+    def test_approximate_token_count(self):
+        assert approximate_token_count("") == 0
+        assert approximate_token_count("abcd" * 10) == 10
+        assert approximate_token_count("中文" * 10) == 20
+        assert approximate_token_count("привет") == 3
+
+    def test_chunks_fit_token_budget(self, token_mode):
+        chunks = chunk_text(self.MIXED, ContentType.PLAIN)
+        assert chunks
+        assert all(_exact_tokens(chunk) <= 120 for chunk in chunks)
+        chinese = [c for c in chunks if c[0] == "这"]
+        english = [c for c in chunks if c[0] == "A"]
+        # Same token budget, far fewer characters per CJK chunk
+        assert max(map(len, chinese)) * 2 < max(map(len, english))
+
+    def test_fits_in_chunk(self, token_mode):
+        assert fits_in_chunk("word " * 60)
+        assert not fits_in_chunk("word " * 80)
+        assert not fits_in_chunk(self.CHINESE)
+        assert chunk_text("word " * 60) == ["word " * 60]
+
+    def test_streaming_matches_chunk_text(self, token_mode):
+        for text, content_type in (
+            (self.MIXED, ContentType.PLAIN),
+            (TestIterChunks.PLAIN, ContentType.PLAIN),
+            (TestIterChunks.MARKDOWN, ContentType.MARKDOWN),
+        ):
+            expected = chunk_text(text, content_type)
+            chunks = list(iter_chunks(_fragments(text, 999), content_type))
+            assert [c.text for c in chunks] == expected
+        for chunk in iter_chunks(self.MIXED, ContentType.PLAIN):
+            assert self.MIXED[chunk.start : chunk.end] == chunk.text
+
+
+# ============================================================================
+# TEST SUITE 8: Near-Duplicate Chunk Detection
+# ============================================================================
+
+
+class TestChunkDedup:
+    """Test suite for SimHash signatures and near-duplicate lookup."""
+
+    FOOTER = (
+        "Copyright 2024 Example News. All rights reserved. Subscribe to our "
+        "newsletter for daily updates on science, technology and culture. "
+    )
+    ARTICLE = (
+        "The committee met on Tuesday to discuss the budget for the new "
+        "library, which is expected to open next spring after two years of "
+        "construction delays caused by supply shortages."
+    )
+
+    def test_near_duplicates_have_close_signatures(self):
+        a = simhash(self.FOOTER + "Page 1 of 12.")
+        b = simhash(self.FOOTER + "Page 7 of 12.")
+        assert hamming_distance(a, b) <= 16
+        assert hamming_distance(a, simhash(self.ARTICLE)) > 16
+
+    def test_signature_ignores_case_and_width(self):
+        assert simhash("Hello World again") == simhash("hello ｗｏｒｌｄ AGAIN")
+        assert simhash("") == 0
+
+    def test_cjk_text_is_shingled_by_character(self):
+        assert simhash("检索质量取决于文档如何被切分") != simhash("每个块都会单独生成向量")
+
+    def test_signed_roundtrip(self):
+        for signature in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+            stored = to_signed64(signature)
+            assert -(1 << 63) <= stored < 1 << 63
+            assert from_signed64(stored) == signature
+
+    def test_index_finds_earliest_within_distance(self):
+        index = NearDuplicateIndex(max_distance=3)
+        index.add("far", 0xFFFF)
+        index.add("first", 0b1011)
+        index.add("second", 0b1000)
+        assert index.find(0b1000) == "first"
+        assert index.find(0xFFFF_0000_0000) is None
+        assert len(index) == 3
+
+    def test_index_finds_matches_in_any_band(self):
+        index = NearDuplicateIndex(max_distance=3)
+        signature = 0x0123_4567_89AB_CDEF
+        index.add("row", signature)
+        # One flipped bit in each of three bands still leaves one band intact
+        assert index.find(signature ^ (1 | 1 << 20 | 1 << 40)) == "row"
+        assert index.find(signature ^ (1 | 1 << 20 | 1 << 40 | 1 << 60)) is None
+
+    def test_find_near_duplicates(self):
+        signatures = [0b0000, 0xF0F0_0000, 0b0001, 0xF0F0_0001, 0b0011]
+        assert find_near_duplicates(signatures, NearDuplicateIndex(2)) == {
+            2: 0,
+            3: 1,
+            4: 0,
+        }
+
+    def test_preloaded_index_keys(self):
+        index = NearDuplicateIndex(max_distance=0)
+        index.add("source_embedding:other", 42)
+        assert find_near_duplicates([42, 7, 7], index) == {
+            0: "source_embedding:other",
+            2: 1,
+        }
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -5,6 +5,7 @@ This test suite focuses on validation logic, business rules, and data structures
 that can be tested without database mocking.
 """
 
+import sys
 import tempfile
 from pathlib import Path
 from unittest.mock import AsyncMock, patch
@@ -12,12 +13,28 @@ from unittest.mock import AsyncMock, patch
 import pytest
 from pydantic import ValidationError
 
-from open_notebook.ai.models import ModelManager
+from open_notebook.ai import models as ai_models
+from open_notebook.ai.models import ModelManager, invalidate_model_cache
+from open_notebook.database.sync_hooks import (
+    SyncEvent,
+    SyncEventType,
+    get_sync_registry,
+    reset_sync_registry,
+)
+from open_notebook.domain import base as domain_base
 from open_notebook.domain.base import RecordModel
 from open_notebook.domain.content_settings import ContentSettings
-from open_notebook.domain.notebook import Asset, Note, Notebook, Source
+from open_notebook.domain.entity_cache import EntityCache
+from open_notebook.domain.notebook import (
+    Asset,
+    Note,
+    Notebook,
+    Source,
+    SourceInsight,
+    get_context_records,
+)
 from open_notebook.domain.transformation import Transformation
-from open_notebook.exceptions import InvalidInputError
+from open_notebook.exceptions import InvalidInputError, NotFoundError
 from open_notebook.podcasts.models import EpisodeProfile, SpeakerProfile
 
 # ============================================================================
@@ -68,6 +85,32 @@ class TestModelManager:
         assert manager1 is not manager2
         assert id(manager1) != id(manager2)
 
+    @pytest.mark.asyncio
+    async def test_resolved_models_are_cached_per_kwargs(self):
+        invalidate_model_cache()
+        resolve = AsyncMock(side_effect=lambda model_id, **kwargs: object())
+        with patch.object(ModelManager, "_resolve_model", resolve):
+            first = await ModelManager().get_model("model:m1")
+            second = await ModelManager().get_model("model:m1")
+            tuned = await ModelManager().get_model("model:m1", temperature=0.1)
+
+            assert first is second
+            assert tuned is not first
+            assert resolve.await_count == 2
+
+            invalidate_model_cache()
+            assert await ModelManager().get_model("model:m1") is not first
+        invalidate_model_cache()
+
+    @pytest.mark.asyncio
+    async def test_model_changes_invalidate_cache(self):
+        ai_models._resolved_models[("model:m1", "[]")] = (float("inf"), object())
+        with patch.object(domain_base, "repo_delete", new_callable=AsyncMock):
+            await ai_models.Model(
+                id="model:m1", name="m", provider="openai", type="language"
+            ).delete()
+        assert not ai_models._resolved_models
+
 
 # ============================================================================
 # TEST SUITE 3: Notebook Domain Logic
@@ -201,6 +244,110 @@ class TestSourceDomain:
             assert result is True
             mock_delete.assert_called_once()
 
+    @pytest.mark.asyncio
+    async def test_insight_delete_forgets_its_vector(self):
+        """Deleting one insight drops it from the local vector index too."""
+        insight = SourceInsight(
+            id="source_insight:one", insight_type="Summary", content="text"
+        )
+
+        with (
+            patch.object(
+                SourceInsight.__bases__[0],
+                "delete",
+                new_callable=AsyncMock,
+                return_value=True,
+            ),
+            patch(
+                "open_notebook.domain.notebook.forget_vectors", new_callable=AsyncMock
+            ) as forget,
+        ):
+            assert await insight.delete() is True
+        forget.assert_awaited_once_with(["source_insight:one"])
+
+    @pytest.mark.asyncio
+    async def test_context_records_skip_bad_ids_when_batch_fails(self):
+        """One bad id no longer fails the whole batch of context records."""
+
+        async def get_source(record_id):
+            if record_id == "source:bad":
+                raise NotFoundError("Source not found")
+            return Source(id=record_id, title="S")
+
+        with (
+            patch(
+                "open_notebook.domain.notebook.repo_query_many",
+                AsyncMock(side_effect=RuntimeError("Parse error")),
+            ),
+            patch.object(Source, "get", side_effect=get_source),
+            patch.object(
+                Note, "get", AsyncMock(return_value=Note(id="note:n", content="c"))
+            ),
+            patch.object(
+                SourceInsight, "get_for_sources", AsyncMock(return_value={})
+            ) as insights,
+        ):
+            sources, _, notes = await get_context_records(
+                ["source:a", "source:bad", "b"], ["n"]
+            )
+
+        assert [source.id for source in sources] == ["source:a", "source:b"]
+        assert [note.id for note in notes] == ["note:n"]
+        insights.assert_awaited_once_with(["source:a", "source:b"])
+
+    def test_projection_clause(self):
+        """fields/omit build the SELECT projection; id is always selected."""
+        assert Source._select_clause() == "*"
+        assert Source._select_clause(fields=["title"]) == "id, title"
+        assert Source._select_clause(omit=["full_text"]) == "* OMIT full_text"
+        assert Note._select_clause() == "* OMIT embedding"
+
+        with pytest.raises(InvalidInputError):
+            Source._select_clause(fields=["title; DELETE source"])
+        with pytest.raises(InvalidInputError):
+            Source._select_clause(fields=["title"], omit=["full_text"])
+
+    @pytest.mark.asyncio
+    async def test_omitted_fields_are_not_saved(self):
+        """Saving a projected source leaves the omitted columns untouched."""
+        with patch.object(
+            domain_base, "repo_query", new_callable=AsyncMock
+        ) as mock_query:
+            mock_query.return_value = [{"id": "source:abc", "title": "Old"}]
+            source = await Source.get("source:abc", omit=["full_text"])
+
+        assert "OMIT full_text" in mock_query.call_args.args[0]
+        assert not source.is_loaded("full_text")
+        assert source.is_loaded("title")
+
+        source.title = "New"
+        with patch.object(
+            domain_base, "repo_update", new_callable=AsyncMock
+        ) as mock_update:
+            mock_update.return_value = [{"id": "source:abc", "title": "New"}]
+            await source.save()
+
+        saved = mock_update.call_args.args[2]
+        assert saved["title"] == "New"
+        assert "full_text" not in saved
+
+    @pytest.mark.asyncio
+    async def test_load_fields_fetches_once(self):
+        """Unloaded fields are fetched on demand and then served from memory."""
+        source = Source(id="source:abc", title="T")
+        source._mark_unloaded({"full_text"})
+
+        with patch.object(
+            domain_base, "repo_query", new_callable=AsyncMock
+        ) as mock_query:
+            mock_query.return_value = [{"full_text": "body", "embedding": [0.1]}]
+            assert await source.load_fields("full_text") == {"full_text": "body"}
+            assert source.full_text == "body"
+            assert source.is_loaded("full_text")
+
+            await source.load_fields("full_text")
+            assert mock_query.call_count == 1
+
 
 # ============================================================================
 # TEST SUITE 5: Note Domain
@@ -241,6 +388,27 @@ class TestNoteDomain:
         note2 = Note(title="Test", content=None)
         assert note2.content is None
 
+    @pytest.mark.asyncio
+    async def test_iter_all_streams_pages(self):
+        """iter_all yields models page by page using keyset cursors."""
+        pages = [
+            [{"id": "note:a", "content": "one"}, {"id": "note:b", "content": "two"}],
+            [{"id": "note:c", "content": "three"}],
+        ]
+
+        async def fake_query(query, vars=None):
+            fake_query.calls.append((query, vars))
+            return pages.pop(0)
+
+        fake_query.calls = []
+        repository = sys.modules[domain_base.repo_scan.__module__]
+        with patch.object(repository, "repo_query", fake_query):
+            notes = [note async for note in Note.iter_all(batch_size=2)]
+
+        assert [note.id for note in notes] == ["note:a", "note:b", "note:c"]
+        assert fake_query.calls[0][0].startswith("SELECT * OMIT embedding FROM note")
+        assert "id > $_scan_id" in fake_query.calls[1][0]
+
 
 # ============================================================================
 # TEST SUITE 6: Podcast Domain Validation
@@ -394,5 +562,123 @@ class TestEpisodeProfile:
         assert profile.num_segments == 5
 
 
+# ============================================================================
+# TEST SUITE 10: Entity Cache
+# ============================================================================
+
+
+class TestEntityCache:
+    """Test suite for the in-process ObjectModel entity cache."""
+
+    def test_lru_eviction_and_copies(self):
+        cache = EntityCache(max_size=2, ttl=60)
+        cache.put("model:a", {"id": "model:a", "tags": ["x"]})
+        cache.put("model:b", {"id": "model:b"})
+        row = cache.get("model:a")
+        row["tags"].append("y")
+        cache.put("model:c", {"id": "model:c"})
+
+        # "b" was least recently used; the caller's mutation did not leak in
+        assert cache.get("model:b") is None
+        assert cache.get("model:a")["tags"] == ["x"]
+        assert cache.stats.evictions == 1
+
+    def test_ttl_expiry(self):
+        cache = EntityCache(max_size=10, ttl=60)
+        cache.put("model:a", {"id": "model:a"})
+        with patch.object(
+            sys.modules[EntityCache.__module__].time, "monotonic", return_value=1e12
+        ):
+            assert cache.get("model:a") is None
+        assert cache.stats.expirations == 1
+
+    @pytest.mark.asyncio
+    async def test_sync_events_invalidate(self):
+        reset_sync_registry()
+        cache = EntityCache(max_size=10, ttl=60)
+        cache.put("notebook:n1", {"id": "notebook:n1"})
+        await get_sync_registry().emit(
+            SyncEvent(SyncEventType.NOTEBOOK_UPDATED, "core", "notebook", "n1")
+        )
+        assert cache.get("notebook:n1") is None
+        assert cache.stats.invalidations == 1
+        reset_sync_registry()
+
+    @pytest.mark.asyncio
+    async def test_get_uses_cache_for_opted_in_tables(self):
+        cache = EntityCache(max_size=10, ttl=60)
+        row = {
+            "id": "transformation:t1",
+            "name": "t",
+            "title": "T",
+            "description": "d",
+            "prompt": "p",
+            "apply_default": False,
+        }
+        query = AsyncMock(return_value=[row])
+        with (
+            patch.object(domain_base, "get_entity_cache", return_value=cache),
+            patch.object(domain_base, "repo_query", query),
+        ):
+            first = await Transformation.get("transformation:t1")
+            second = await Transformation.get("transformation:t1")
+            await Transformation.get("transformation:t1", fields=["name"])
+
+        assert first.name == second.name == "t"
+        # Second plain get is a hit; projected gets always go to the database
+        assert query.await_count == 2
+        assert cache.stats.hits == 1
+
+    @pytest.mark.asyncio
+    async def test_uncached_tables_and_delete(self):
+        cache = EntityCache(max_size=10, ttl=60)
+        query = AsyncMock(return_value=[{"id": "note:n1", "content": "c"}])
+        with (
+            patch.object(domain_base, "get_entity_cache", return_value=cache),
+            patch.object(domain_base, "repo_query", query),
+            patch.object(domain_base, "repo_delete", new_callable=AsyncMock),
+        ):
+            await Note.get("note:n1")
+            await Note.get("note:n1")
+            cache.put("transformation:t1", {"id": "transformation:t1"})
+            transformation = Transformation(
+                id="transformation:t1",
+                name="t",
+                title="T",
+                description="d",
+                prompt="p",
+                apply_default=False,
+            )
+            await transformation.delete()
+
+        assert query.await_count == 2
+        assert cache.snapshot()["size"] == 0
+
+    @pytest.mark.asyncio
+    async def test_delete_invalidates_rows_cached_while_deleting(self):
+        cache = EntityCache(max_size=10, ttl=60)
+
+        async def racing_delete(record_id):
+            # Another request reads the row before the delete commits
+            cache.put("transformation:t1", {"id": "transformation:t1"})
+            return True
+
+        with (
+            patch.object(domain_base, "get_entity_cache", return_value=cache),
+            patch.object(domain_base, "repo_delete", racing_delete),
+        ):
+            transformation = Transformation(
+                id="transformation:t1",
+                name="t",
+                title="T",
+                description="d",
+                prompt="p",
+                apply_default=False,
+            )
+            assert await transformation.delete() is True
+
+        assert cache.get("transformation:t1") is None
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -4,12 +4,31 @@ Unit tests for the open_notebook.utils.embedding module.
 Tests embedding generation and mean pooling functionality.
 """
 
+import asyncio
+
 import pytest
 
 from open_notebook.utils.embedding import (
+    EmbeddingBatchLimits,
+    embed_query,
     generate_embedding,
     generate_embeddings,
     mean_pool_embeddings,
+    split_embedding_batches,
+    split_for_embedding,
+)
+from open_notebook.utils.embedding_cache import EmbeddingCache, text_hash
+from open_notebook.utils.embedding_storage import (
+    decode_embedding,
+    dequantize_int8,
+    encode_embedding,
+    head_recall_at_k,
+    int8_recall_at_k,
+    quantize_int8,
+)
+from open_notebook.utils.query_embedding_cache import (
+    QueryEmbeddingCache,
+    normalize_query,
 )
 
 # ============================================================================
@@ -55,6 +74,7 @@ class TestMeanPoolEmbeddings:
         # Result should be same direction, just normalized
         # Original is already normalized if we normalize it
         import numpy as np
+
         orig_norm = np.linalg.norm(embedding)
         expected = [v / orig_norm for v in embedding]
         for i in range(4):
@@ -76,6 +96,7 @@ class TestMeanPoolEmbeddings:
         result = await mean_pool_embeddings(embeddings)
         # Check result is unit length
         import numpy as np
+
         norm = np.linalg.norm(result)
         assert abs(norm - 1.0) < 0.001
 
@@ -83,6 +104,7 @@ class TestMeanPoolEmbeddings:
     async def test_high_dimensional(self):
         """Test mean pooling with high-dimensional embeddings."""
         import numpy as np
+
         # Create random embeddings of dimension 768 (typical embedding size)
         np.random.seed(42)
         embeddings = [
@@ -96,6 +118,14 @@ class TestMeanPoolEmbeddings:
         norm = np.linalg.norm(result)
         assert abs(norm - 1.0) < 0.001
 
+    @pytest.mark.asyncio
+    async def test_pools_in_float32(self):
+        """Pooled values are float32, like the vectors that are searched."""
+        import numpy as np
+
+        result = await mean_pool_embeddings([[0.1, 0.2, 0.3], [0.3, 0.2, 0.1]])
+        assert result == np.asarray(result, dtype=np.float32).tolist()
+
 
 # ============================================================================
 # TEST SUITE 2: Generate Embeddings (requires mocking)
@@ -190,9 +220,9 @@ class TestGenerateEmbedding:
         mock_model = MagicMock()
         # Return multiple embeddings (one per chunk)
         mock_model.aembed = AsyncMock(
-            return_value=[
-                [1.0, 0.0, 0.0],
-                [0.0, 1.0, 0.0],
+            side_effect=lambda batch: [
+                [1.0, 0.0, 0.0] if i % 2 == 0 else [0.0, 1.0, 0.0]
+                for i in range(len(batch))
             ]
         )
 
@@ -229,5 +259,320 @@ class TestGenerateEmbedding:
             assert len(result) == 3
 
 
+# ============================================================================
+# TEST SUITE 4: Embedding Cache
+# ============================================================================
+
+
+class TestEmbeddingCache:
+    """Test suite for the persistent embedding cache."""
+
+    def test_text_hash_normalises(self):
+        assert text_hash("  a\r\nb ") == text_hash("a\nb")
+        assert text_hash("a") != text_hash("b")
+
+    def test_vectors_are_kept_per_model(self, tmp_path):
+        cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"), max_entries=10)
+        cache.put_many_sync("openai:small", {"h1": [0.5, 0.25]})
+
+        assert cache.get_many_sync("openai:small", ["h1", "h2"]) == {"h1": [0.5, 0.25]}
+        assert cache.get_many_sync("ollama:nomic", ["h1"]) == {}
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 2
+
+    def test_lru_eviction(self, tmp_path):
+        cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"), max_entries=10)
+        for i in range(10):
+            cache.put_many_sync("m", {f"h{i}": [float(i)]})
+        cache.get_many_sync("m", ["h0"])  # Keep the oldest entry warm
+        cache.put_many_sync("m", {"h10": [10.0]})
+
+        remaining = cache.get_many_sync("m", [f"h{i}" for i in range(11)])
+        assert len(remaining) == 9
+        assert "h0" in remaining and "h1" not in remaining
+        assert cache.stats.evictions == 2
+
+    @pytest.mark.asyncio
+    async def test_generate_embeddings_only_sends_misses(self, tmp_path):
+        from unittest.mock import AsyncMock, MagicMock, patch
+
+        cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"))
+        mock_model = MagicMock(model_name="small", provider="openai")
+        mock_model.aembed = AsyncMock(return_value=[[1.0, 0.0], [0.0, 1.0]])
+
+        with (
+            patch(
+                "open_notebook.ai.models.model_manager.get_embedding_model",
+                new_callable=AsyncMock,
+                return_value=mock_model,
+            ),
+            patch(
+                "open_notebook.utils.embedding.get_embedding_cache",
+                return_value=cache,
+            ),
+        ):
+            await generate_embeddings(["a", "b"])
+            mock_model.aembed.reset_mock()
+            mock_model.aembed.return_value = [[0.5, 0.5]]
+
+            result = await generate_embeddings(["b", "c", "a", "c"])
+
+        mock_model.aembed.assert_called_once_with(["c"])
+        assert result == [[0.0, 1.0], [0.5, 0.5], [1.0, 0.0], [0.5, 0.5]]
+
+    @pytest.mark.asyncio
+    async def test_misses_are_rounded_like_hits(self, tmp_path):
+        from unittest.mock import AsyncMock, MagicMock, patch
+
+        cache = EmbeddingCache(path=str(tmp_path / "cache.sqlite"))
+        mock_model = MagicMock(model_name="small", provider="openai")
+        mock_model.aembed = AsyncMock(return_value=[[0.1, 0.2]])
+
+        with (
+            patch(
+                "open_notebook.ai.models.model_manager.get_embedding_model",
+                new_callable=AsyncMock,
+                return_value=mock_model,
+            ),
+            patch(
+                "open_notebook.utils.embedding.get_embedding_cache",
+                return_value=cache,
+            ),
+        ):
+            miss = await generate_embeddings(["a"])
+            hit = await generate_embeddings(["a"])
+
+        assert mock_model.aembed.await_count == 1
+        assert miss == hit
+
+
+# ============================================================================
+# TEST SUITE 5: Embedding Batching
+# ============================================================================
+
+
+class TestEmbeddingBatching:
+    """Test suite for provider-limited, concurrent embedding batches."""
+
+    def test_split_respects_item_and_token_limits(self):
+        limits = EmbeddingBatchLimits(max_items=3, max_tokens=100)
+        texts = ["a" * 30] * 7 + ["b" * 600, "c"]
+        # 30 bytes ~ 11 tokens, so the item limit applies first
+        assert split_embedding_batches(texts, limits) == [
+            (0, 3),
+            (3, 6),
+            (6, 7),
+            (7, 8),  # Oversized text gets its own batch
+            (8, 9),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_batches_retry_and_keep_order(self, monkeypatch):
+        from unittest.mock import AsyncMock, MagicMock, patch
+
+        monkeypatch.setenv("EMBEDDING_BATCH_MAX_ITEMS", "2")
+        monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+        failed = set()
+
+        async def aembed(batch):
+            if batch[0] == "t2" and "t2" not in failed:
+                failed.add("t2")
+                raise RuntimeError("rate limited")
+            return [[float(text[1:])] for text in batch]
+
+        mock_model = MagicMock(model_name="small", provider="openai")
+        mock_model.aembed = AsyncMock(side_effect=aembed)
+
+        with (
+            patch(
+                "open_notebook.ai.models.model_manager.get_embedding_model",
+                new_callable=AsyncMock,
+                return_value=mock_model,
+            ),
+            patch("open_notebook.utils.embedding.asyncio.sleep", new=AsyncMock()),
+        ):
+            result = await generate_embeddings([f"t{i}" for i in range(5)])
+
+        assert result == [[0.0], [1.0], [2.0], [3.0], [4.0]]
+        # Three batches plus one retry of the failed batch only
+        assert mock_model.aembed.await_count == 4
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_cancels_the_others(self, monkeypatch):
+        from unittest.mock import AsyncMock, MagicMock, patch
+
+        monkeypatch.setenv("EMBEDDING_BATCH_MAX_ITEMS", "1")
+        monkeypatch.setenv("EMBEDDING_BATCH_ATTEMPTS", "1")
+        monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+        cancelled = []
+
+        async def aembed(batch):
+            if batch == ["bad"]:
+                raise RuntimeError("quota exceeded")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(batch[0])
+                raise
+            return [[1.0]]
+
+        mock_model = MagicMock(model_name="small", provider="openai")
+        mock_model.aembed = AsyncMock(side_effect=aembed)
+
+        with patch(
+            "open_notebook.ai.models.model_manager.get_embedding_model",
+            new_callable=AsyncMock,
+            return_value=mock_model,
+        ):
+            with pytest.raises(RuntimeError, match="quota exceeded"):
+                await generate_embeddings(["slow1", "bad", "slow2"])
+
+        assert sorted(cancelled) == ["slow1", "slow2"]
+
+    @pytest.mark.asyncio
+    async def test_single_batch_count_is_checked(self, monkeypatch):
+        from unittest.mock import AsyncMock, MagicMock, patch
+
+        monkeypatch.setenv("EMBEDDING_CACHE_ENABLED", "false")
+        mock_model = MagicMock(model_name="small", provider="openai")
+        mock_model.aembed = AsyncMock(return_value=[[1.0]])
+
+        with patch(
+            "open_notebook.ai.models.model_manager.get_embedding_model",
+            new_callable=AsyncMock,
+            return_value=mock_model,
+        ):
+            with pytest.raises(RuntimeError, match="got 1 embeddings for batch of 2"):
+                await generate_embeddings(["a", "b"])
+
+    def test_split_for_embedding(self):
+        assert split_for_embedding("  short  ") == ["short"]
+        chunks = split_for_embedding("This is a sentence. " * 200)
+        assert len(chunks) > 1
+        with pytest.raises(ValueError, match="empty"):
+            split_for_embedding("   ")
+
+
+# ============================================================================
+# TEST SUITE 6: Embedding Storage
+# ============================================================================
+
+
+class TestEmbeddingStorage:
+    """Test suite for int8 embedding storage."""
+
+    def test_quantize_round_trip(self):
+        vector = [0.5, -0.25, 0.125, 0.0]
+        values, scale = quantize_int8(vector)
+        assert max(abs(v) for v in values) == 127
+        restored = dequantize_int8(values, scale)
+        assert all(abs(a - b) <= scale / 2 + 1e-6 for a, b in zip(vector, restored))
+
+    def test_zero_vector(self):
+        assert quantize_int8([0.0, 0.0]) == ([0, 0], 0.0)
+
+    def test_encode_float_clears_scale(self):
+        encoded = encode_embedding([0.1, 0.2], "float")
+        assert encoded == {"embedding": [0.1, 0.2], "embedding_scale": None}
+
+    def test_encode_uses_configured_format(self, monkeypatch):
+        monkeypatch.setenv("EMBEDDING_STORAGE_FORMAT", "int8")
+        encoded = encode_embedding([0.1, -0.2])
+        assert encoded["embedding"] == [64, -127]
+        assert encoded["embedding_scale"] == pytest.approx(0.2 / 127)
+
+    def test_decode_embedding(self):
+        assert decode_embedding({"embedding": [1, 2]}) == [1.0, 2.0]
+        assert decode_embedding({"embedding": [127], "embedding_scale": 0.5}) == [
+            pytest.approx(63.5)
+        ]
+        assert decode_embedding({"embedding": None}) is None
+
+    def test_int8_recall(self):
+        import numpy as np
+
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(500, 64)).tolist()
+        queries = rng.normal(size=(20, 64)).tolist()
+        assert int8_recall_at_k(vectors, queries, k=10) > 0.9
+
+    def test_encode_adds_head_when_enabled(self, monkeypatch):
+        monkeypatch.setenv("EMBEDDING_HEAD_DIMENSIONS", "2")
+        encoded = encode_embedding([0.1, -0.2, 0.3], "float")
+        assert encoded["embedding_head"] == [64, -127]
+        # Vectors no longer than the head are searched in one stage
+        assert "embedding_head" not in encode_embedding([0.1, 0.2], "float")
+
+    def test_head_recall(self):
+        import numpy as np
+
+        rng = np.random.default_rng(0)
+        decay = np.linspace(3.0, 0.2, 64)  # Leading components carry most signal
+        vectors = (rng.normal(size=(500, 64)) * decay).tolist()
+        queries = (rng.normal(size=(20, 64)) * decay).tolist()
+        recall = head_recall_at_k(vectors, queries, dims=16, candidates=100, k=10)
+        assert recall > 0.9
+
+
+# ============================================================================
+# TEST SUITE 7: Query Embedding Cache
+# ============================================================================
+
+
+class TestQueryEmbeddingCache:
+    """Test suite for the in-process query embedding LRU."""
+
+    def test_normalize_query(self):
+        assert normalize_query("  what   is\n RAG? ") == "what is RAG?"
+
+    def test_lru_eviction_and_models(self):
+        cache = QueryEmbeddingCache(max_size=2, ttl=60)
+        cache.put("openai:small", "a", [1.0])
+        cache.put("openai:large", "a", [2.0])
+        assert cache.get("openai:small", " a ") == [1.0]
+        cache.put("openai:small", "b", [3.0])
+        # "openai:large"/"a" was least recently used
+        assert cache.get("openai:large", "a") is None
+        assert cache.stats.evictions == 1
+
+    def test_ttl_expiry(self):
+        cache = QueryEmbeddingCache(max_size=10, ttl=60)
+        cache.put("m", "q", [0.5])
+        key = ("m", "q")
+        cache._entries[key] = (0.0, cache._entries[key][1])
+        assert cache.get("m", "q") is None
+        assert cache.stats.expirations == 1
+
+    @pytest.mark.asyncio
+    async def test_embed_query_skips_provider_on_repeat(self):
+        from unittest.mock import AsyncMock, MagicMock, patch
+
+        from open_notebook.utils import embedding as embedding_module
+
+        mock_model = MagicMock(model_name="small", provider="openai")
+        mock_model.aembed = AsyncMock(return_value=[[0.25, 0.5]])
+
+        with (
+            patch(
+                "open_notebook.ai.models.model_manager.get_embedding_model",
+                new_callable=AsyncMock,
+                return_value=mock_model,
+            ),
+            patch.object(
+                embedding_module,
+                "get_query_embedding_cache",
+                return_value=QueryEmbeddingCache(max_size=10, ttl=60),
+            ),
+            patch.object(
+                embedding_module, "embedding_cache_enabled", return_value=False
+            ),
+        ):
+            first = await embed_query("vector search")
+            second = await embed_query("vector   search")
+
+        assert first == second == [0.25, 0.5]
+        assert mock_model.aembed.await_count == 1
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
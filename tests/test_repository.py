@@ -0,0 +1,1456 @@
+"""
+Unit tests for the open_notebook.database repository layer.
+
+SurrealDB is replaced with an in-memory fake connection so these tests
+exercise pooling and result handling without a running database.
+"""
+
+import asyncio
+import os
+import sys
+import time
+from contextlib import asynccontextmanager, contextmanager
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+import pytest
+from surrealdb import AsyncSurreal, RecordID  # type: ignore
+
+from open_notebook.database import local_vector_index, vector_index
+from open_notebook.database.bulk import BulkWriter, estimate_payload_size
+from open_notebook.database.decoding import decode_result
+from open_notebook.database.instrumentation import (
+    QueryMetrics,
+    fingerprint,
+    get_query_metrics,
+    render_prometheus,
+)
+from open_notebook.database.pool import ConnectionPool, PoolConfig, PoolTimeoutError
+from open_notebook.database.repository import repo_query, repo_query_many, repo_scan
+from open_notebook.database.write_coalescer import WriteCoalescer, coalesced_create
+
+
+class FakeSurreal:
+    """Minimal stand-in for AsyncSurreal that records calls."""
+
+    instances: list = []
+
+    def __init__(self, url):
+        self.url = url
+        self.closed = False
+        self.signins = 0
+        self.uses = []
+        self.queries = []
+        self.recv_task = None
+        FakeSurreal.instances.append(self)
+
+    async def signin(self, vars):
+        self.signins += 1
+
+    async def use(self, namespace, database):
+        self.uses.append((namespace, database))
+
+    async def query(self, query, vars=None):
+        if self.closed:
+            raise ConnectionError("socket closed")
+        self.queries.append((query, vars))
+        return [{"ok": True}]
+
+    async def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_surreal():
+    FakeSurreal.instances = []
+    return FakeSurreal
+
+
+class FakeRawConnection:
+    """Connection returning a canned query_raw response."""
+
+    def __init__(self, results):
+        self.results = results
+        self.calls = []
+
+    async def query_raw(self, query, vars=None):
+        self.calls.append((query, vars))
+        return {"result": self.results}
+
+
+def patch_db_connection(connection):
+    @asynccontextmanager
+    async def fake_db_connection(*args, **kwargs):
+        yield connection
+
+    repository = sys.modules[repo_query_many.__module__]
+    return patch.object(repository, "db_connection", fake_db_connection)
+
+
+@asynccontextmanager
+async def memory_database():
+    """Embedded in-memory SurrealDB serving as the repository connection."""
+    connection = AsyncSurreal("mem://")
+    await connection.use("test", "test")
+    try:
+        with patch_db_connection(connection):
+            yield connection
+    finally:
+        await connection.close()
+
+
+def make_config(**overrides) -> PoolConfig:
+    values = dict(
+        url="ws://test/rpc",
+        username="root",
+        password="root",
+        namespace="ns",
+        database="db",
+        min_size=1,
+        max_size=2,
+        acquire_timeout=0.1,
+        health_check_interval=30.0,
+        max_idle_time=300.0,
+    )
+    values.update(overrides)
+    return PoolConfig(**values)
+
+
+# ============================================================================
+# TEST SUITE 1: Connection Pool
+# ============================================================================
+
+
+class TestConnectionPool:
+    """Test suite for the SurrealDB connection pool."""
+
+    @pytest.mark.asyncio
+    async def test_connections_are_reused(self, fake_surreal):
+        """Sequential checkouts reuse one authenticated connection."""
+        pool = ConnectionPool(make_config(), fake_surreal)
+        for _ in range(5):
+            async with pool.connection() as db:
+                await db.query("RETURN 1")
+
+        assert len(fake_surreal.instances) == 1
+        conn = fake_surreal.instances[0]
+        assert conn.signins == 1
+        assert conn.uses == [("ns", "db")]
+        assert pool.stats.checkouts == 5
+        assert pool.stats.connections_opened == 1
+
+    @pytest.mark.asyncio
+    async def test_max_size_blocks_and_times_out(self, fake_surreal):
+        """Checkouts beyond max_size wait and then raise PoolTimeoutError."""
+        pool = ConnectionPool(make_config(max_size=1), fake_surreal)
+        conn = await pool.acquire()
+        with pytest.raises(PoolTimeoutError):
+            await pool.acquire()
+        assert pool.stats.acquire_timeouts == 1
+        await pool.release(conn)
+
+        # Slot is free again after release
+        async with pool.connection():
+            pass
+
+    @pytest.mark.asyncio
+    async def test_connection_error_discards_connection(self, fake_surreal):
+        """A dropped socket is closed and replaced on the next checkout."""
+        pool = ConnectionPool(make_config(), fake_surreal)
+        with pytest.raises(ConnectionError):
+            async with pool.connection() as db:
+                await db.close()
+                await db.query("RETURN 1")
+
+        async with pool.connection() as db:
+            assert not db.closed
+
+        assert pool.stats.discarded == 1
+        assert pool.stats.connections_opened == 2
+
+    @pytest.mark.asyncio
+    async def test_statement_error_keeps_connection(self, fake_surreal):
+        """Query-level errors do not cost a reconnect."""
+        pool = ConnectionPool(make_config(), fake_surreal)
+        with pytest.raises(RuntimeError):
+            async with pool.connection():
+                raise RuntimeError("transaction conflict")
+
+        async with pool.connection():
+            pass
+        assert pool.stats.connections_opened == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_health_check_reconnects(self, fake_surreal):
+        """Idle connections failing the ping are replaced transparently."""
+        pool = ConnectionPool(make_config(health_check_interval=0.0), fake_surreal)
+        async with pool.connection() as db:
+            first = db
+        first.closed = True  # Simulate the server dropping the idle socket
+
+        async with pool.connection() as db:
+            assert db is not first
+        assert pool.stats.health_check_failures == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_checkouts_respect_max_size(self, fake_surreal):
+        """Concurrent users never open more than max_size connections."""
+        pool = ConnectionPool(make_config(max_size=2, acquire_timeout=5), fake_surreal)
+
+        async def worker():
+            async with pool.connection() as db:
+                await asyncio.sleep(0.01)
+                await db.query("RETURN 1")
+
+        await asyncio.gather(*(worker() for _ in range(10)))
+        assert pool.stats.connections_opened <= 2
+        assert pool.stats.checkouts == 10
+        assert pool.stats.in_use == 0
+
+
+# ============================================================================
+# TEST SUITE 2: Batched Queries
+# ============================================================================
+
+
+class TestRepoQueryMany:
+    """Test suite for multi-statement batched queries."""
+
+    @pytest.mark.asyncio
+    async def test_results_are_demultiplexed(self):
+        """Each statement gets its own result list, in order."""
+        connection = FakeRawConnection(
+            [
+                {"status": "OK", "result": [{"id": "source:1"}]},
+                {"status": "OK", "result": []},
+                {"status": "OK", "result": {"id": "note:1"}},
+            ]
+        )
+        with patch_db_connection(connection):
+            results = await repo_query_many(
+                [
+                    ("SELECT * FROM $a;", {"a": 1}),
+                    "SELECT * FROM note",
+                    ("SELECT * FROM $b", {"b": 2, "a": 1}),
+                ]
+            )
+
+        assert results == [[{"id": "source:1"}], [], [{"id": "note:1"}]]
+        assert len(connection.calls) == 1
+        query, vars = connection.calls[0]
+        assert query.count(";") == 3
+        assert vars == {"a": 1, "b": 2}
+
+    @pytest.mark.asyncio
+    async def test_conflicting_parameters_rejected(self):
+        """The same parameter name cannot carry two values in one batch."""
+        with pytest.raises(ValueError, match="different values"):
+            await repo_query_many([("RETURN $a", {"a": 1}), ("RETURN $a", {"a": 2})])
+
+    @pytest.mark.asyncio
+    async def test_statement_error_raises(self):
+        """A failed statement surfaces as RuntimeError like repo_query."""
+        connection = FakeRawConnection(
+            [
+                {"status": "OK", "result": []},
+                {"status": "ERR", "result": "Transaction conflict"},
+            ]
+        )
+        with patch_db_connection(connection):
+            with pytest.raises(RuntimeError, match="conflict"):
+                await repo_query_many(["RETURN 1", "RETURN 2"])
+
+    @pytest.mark.asyncio
+    async def test_transaction_returns_statement_results(self):
+        """A committed transaction yields one result per statement."""
+        async with memory_database():
+            results = await repo_query_many(
+                [
+                    ("CREATE item:1 SET x = $x RETURN NONE", {"x": 1}),
+                    "SELECT x FROM item",
+                ],
+                transaction=True,
+            )
+            assert results == [[], [{"x": 1}]]
+
+    @pytest.mark.asyncio
+    async def test_failed_transaction_raises_its_cause(self):
+        """A failed transaction writes nothing and reports the failing statement."""
+        async with memory_database():
+            with pytest.raises(RuntimeError, match="already exists"):
+                await repo_query_many(
+                    ["CREATE item:1 SET x = 1", "CREATE item:1 SET x = 2"],
+                    transaction=True,
+                )
+            assert await repo_query("SELECT * FROM item") == []
+
+
+# ============================================================================
+# TEST SUITE 3: Keyset Scans
+# ============================================================================
+
+
+class FakePagedQuery:
+    """repo_query stand-in returning canned pages and recording calls."""
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.calls = []
+
+    async def __call__(self, query, vars=None):
+        self.calls.append((query, dict(vars or {})))
+        return self.pages.pop(0) if self.pages else []
+
+
+def patch_repo_query(fake):
+    repository = sys.modules[repo_scan.__module__]
+    return patch.object(repository, "repo_query", fake)
+
+
+async def collect_pages(**kwargs):
+    return [page async for page in repo_scan(**kwargs)]
+
+
+class TestRepoScan:
+    """Test suite for keyset-paginated table scans."""
+
+    @pytest.mark.asyncio
+    async def test_pages_continue_after_last_id(self):
+        """Each page starts after the previous page's last id."""
+        fake = FakePagedQuery(
+            [
+                [{"id": "note:a"}, {"id": "note:b"}],
+                [{"id": "note:c"}, {"id": "note:d"}],
+                [{"id": "note:e"}],
+            ]
+        )
+        with patch_repo_query(fake):
+            pages = await collect_pages(table="note", projection="id", batch_size=2)
+
+        assert [len(page) for page in pages] == [2, 2, 1]
+        assert len(fake.calls) == 3
+        first_query, first_vars = fake.calls[0]
+        assert "WHERE" not in first_query
+        assert first_query.endswith("ORDER BY id ASC LIMIT $_scan_limit")
+        second_query, second_vars = fake.calls[1]
+        assert "WHERE id > $_scan_id" in second_query
+        assert second_vars["_scan_id"] == RecordID("note", "b")
+        assert fake.calls[2][1]["_scan_id"] == RecordID("note", "d")
+
+    @pytest.mark.asyncio
+    async def test_order_field_cursor_and_filter(self):
+        """Ordering by a field adds it to the projection and breaks ties by id."""
+        fake = FakePagedQuery(
+            [[{"id": "note:a", "updated": 5}], [{"id": "note:b", "updated": 3}], []]
+        )
+        with patch_repo_query(fake):
+            await collect_pages(
+                table="note",
+                projection="title",
+                where="note_type = $kind",
+                vars={"kind": "human"},
+                batch_size=1,
+                order_by="updated desc",
+            )
+
+        query, vars = fake.calls[1]
+        assert query.startswith("SELECT title, id, updated FROM note")
+        assert "(note_type = $kind) AND (updated < $_scan_value OR " in query
+        assert "ORDER BY updated DESC, id DESC" in query
+        assert vars["_scan_value"] == 5
+        assert vars["kind"] == "human"
+
+    @pytest.mark.asyncio
+    async def test_short_page_ends_scan(self):
+        """A page smaller than batch_size is the last one."""
+        fake = FakePagedQuery([[{"id": "note:a"}]])
+        with patch_repo_query(fake):
+            pages = await collect_pages(table="note", batch_size=10)
+        assert len(pages) == 1
+        assert len(fake.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_unsupported_order_rejected(self):
+        """Only a single field with an optional direction is accepted."""
+        with pytest.raises(ValueError):
+            await collect_pages(table="note", order_by="updated desc, title")
+
+
+# ============================================================================
+# TEST SUITE 4: Result Decoding
+# ============================================================================
+
+
+class TestResultDecoding:
+    """Test suite for RecordID decoding of query results."""
+
+    def test_record_ids_become_strings(self):
+        """Top-level, nested and listed RecordIDs are converted."""
+        result = decode_result(
+            [
+                {
+                    "id": RecordID("chat_session", "abc"),
+                    "refs": [
+                        RecordID("source", "one"),
+                        {"in": RecordID("note", "two")},
+                    ],
+                    "meta": {"owner": RecordID("notebook", "three")},
+                }
+            ]
+        )
+        assert result == [
+            {
+                "id": "chat_session:abc",
+                "refs": ["source:one", {"in": "note:two"}],
+                "meta": {"owner": "notebook:three"},
+            }
+        ]
+
+    def test_embeddings_pass_through_untouched(self):
+        """Numeric arrays are returned as the same list object."""
+        embedding = [0.1, 0.2, 0.3]
+        row = {
+            "id": RecordID("source_embedding", "one"),
+            "source": RecordID("source", "nine"),
+            "embedding": embedding,
+        }
+        decoded = decode_result(row)
+
+        assert decoded is row
+        assert decoded["embedding"] is embedding
+        assert decoded["source"] == "source:nine"
+
+    def test_aliased_projection_rows_are_decoded(self):
+        """Link fields not listed for the row's table are still converted."""
+        row = {
+            "id": RecordID("source", "one"),
+            "parent_id": RecordID("source_embedding", "seven"),
+            "similarity": 0.9,
+        }
+        assert decode_result(row) == {
+            "id": "source:one",
+            "parent_id": "source_embedding:seven",
+            "similarity": 0.9,
+        }
+
+    def test_scalars_are_returned_unchanged(self):
+        """Non-container results decode to themselves."""
+        assert decode_result(None) is None
+        assert decode_result(3) == 3
+        assert decode_result(RecordID("note", "one")) == "note:one"
+
+
+# ============================================================================
+# TEST SUITE 5: Bulk Writer
+# ============================================================================
+
+
+class FakeBatchQuery:
+    """repo_query_many stand-in that can fail the first attempts of a batch."""
+
+    def __init__(self, conflicts=0, error="Transaction conflict: can be retried"):
+        self.conflicts = conflicts
+        self.error = error
+        self.batches = []
+
+    async def __call__(self, statements, transaction=False):
+        assert transaction
+        if self.conflicts:
+            self.conflicts -= 1
+            raise RuntimeError(self.error)
+        query, vars = statements[0]
+        assert query.endswith("RETURN NONE")
+        self.batches.append(vars["rows"])
+        return [[]]
+
+
+def patch_repo_query_many(fake):
+    bulk = sys.modules[BulkWriter.__module__]
+    return patch.object(bulk, "repo_query_many", fake)
+
+
+class TestBulkWriter:
+    """Test suite for chunked bulk inserts."""
+
+    def test_split_respects_row_and_byte_limits(self):
+        """Batches close on whichever limit is hit first."""
+        rows = [{"embedding": [0.1] * 100} for _ in range(10)]
+        row_size = estimate_payload_size(rows[0])
+
+        by_rows = BulkWriter("t", max_rows=4, max_bytes=10**9).split(rows)
+        assert [len(b) for b in by_rows] == [4, 4, 2]
+
+        by_bytes = BulkWriter("t", max_rows=100, max_bytes=row_size * 3).split(rows)
+        assert [len(b) for b in by_bytes] == [3, 3, 3, 1]
+
+        oversized = BulkWriter("t", max_rows=100, max_bytes=1).split(rows[:2])
+        assert [len(b) for b in oversized] == [1, 1]
+
+    @pytest.mark.asyncio
+    async def test_write_reports_throughput(self):
+        """All rows are written and counted across batches."""
+        fake = FakeBatchQuery()
+        rows = [{"n": i} for i in range(7)]
+        with patch_repo_query_many(fake):
+            stats = await BulkWriter("t", max_rows=3, concurrency=2).write(rows)
+
+        assert sorted(row["n"] for batch in fake.batches for row in batch) == list(
+            range(7)
+        )
+        assert stats.rows == 7
+        assert stats.batches == 3
+        assert stats.rows_per_sec > 0
+
+    @pytest.mark.asyncio
+    async def test_conflicting_batch_is_retried(self):
+        """A transaction conflict retries only that batch."""
+        fake = FakeBatchQuery(conflicts=2)
+        with patch_repo_query_many(fake):
+            with patch("asyncio.sleep", new=fake_sleep):
+                stats = await BulkWriter("t", max_rows=10).write([{"n": 1}])
+
+        assert stats.retries == 2
+        assert fake.batches == [[{"n": 1}]]
+
+    @pytest.mark.asyncio
+    async def test_other_errors_are_not_retried(self):
+        """Non-conflict errors surface immediately."""
+        fake = FakeBatchQuery(conflicts=1, error="Found field 'x' not allowed")
+        with patch_repo_query_many(fake):
+            with pytest.raises(RuntimeError, match="not allowed"):
+                await BulkWriter("t").write([{"n": 1}])
+        assert fake.batches == []
+
+    @pytest.mark.asyncio
+    async def test_batches_are_inserted_into_a_real_database(self):
+        """Every transactional batch commits and the write succeeds."""
+        rows = [{"id": RecordID("chunk", i), "n": i} for i in range(7)]
+        async with memory_database():
+            stats = await BulkWriter("chunk", max_rows=3).write(rows)
+            stored = await repo_query("SELECT VALUE n FROM chunk ORDER BY n")
+
+        assert stats.batches == 3
+        assert stored == list(range(7))
+
+
+async def fake_sleep(delay):
+    return None
+
+
+# ============================================================================
+# TEST SUITE 6: Query Instrumentation
+# ============================================================================
+
+
+class FakeQueryConnection:
+    """Connection whose query() returns a canned result."""
+
+    def __init__(self, result):
+        self.result = result
+
+    async def query(self, query, vars=None):
+        return self.result
+
+
+class TestQueryInstrumentation:
+    """Test suite for statement fingerprints and query metrics."""
+
+    def test_fingerprint_normalises_literals(self):
+        """Literals, numbers and record ids collapse to placeholders."""
+        assert (
+            fingerprint(
+                "SELECT *  FROM source:abc WHERE title = 'x' -- note\n LIMIT 10;"
+            )
+            == "SELECT * FROM source:? WHERE title = ? LIMIT ?"
+        )
+        assert fingerprint(
+            "RELATE note:⟨a-b⟩->artifact->notebook:xyz CONTENT $data"
+        ) == ("RELATE note:?->artifact->notebook:? CONTENT $data")
+        assert fingerprint("SELECT * FROM fn::vector_search($q, 10)") == (
+            "SELECT * FROM fn::vector_search($q, ?)"
+        )
+
+    def test_overflow_fingerprints_are_grouped(self):
+        """New fingerprints beyond the cap are recorded under 'other'."""
+        metrics = QueryMetrics(max_fingerprints=1)
+        metrics.observe("query", "A", 0.01)
+        metrics.observe("query", "B", 0.02)
+        metrics.observe("query", "A", 0.01)
+        snapshot = metrics.snapshot()
+        assert snapshot[("query", "A")].count == 2
+        assert snapshot[("query", "other")].count == 1
+
+    @pytest.mark.asyncio
+    async def test_repo_query_is_recorded(self):
+        """repo_query records latency, rows and payload under its fingerprint."""
+        get_query_metrics().reset()
+        connection = FakeQueryConnection([{"id": RecordID("note", "a")}] * 3)
+        with patch_db_connection(connection):
+            await repo_query("SELECT * FROM note WHERE x = 1")
+
+        [entry] = get_query_metrics().top()
+        assert entry["fingerprint"] == "SELECT * FROM note WHERE x = ?"
+        assert entry["count"] == 1
+        assert entry["rows"] == 3
+        assert entry["response_bytes"] > 0
+        assert entry["errors"] == 0
+
+    @pytest.mark.asyncio
+    async def test_string_results_count_as_errors(self):
+        """SurrealDB error strings increment the error counter."""
+        get_query_metrics().reset()
+        connection = FakeQueryConnection("There was a problem")
+        with patch_db_connection(connection):
+            with pytest.raises(RuntimeError):
+                await repo_query("RETURN 1")
+
+        [entry] = get_query_metrics().top()
+        assert entry["errors"] == 1
+
+    def test_prometheus_rendering(self):
+        """Histogram buckets are cumulative and labels are escaped."""
+        metrics = get_query_metrics()
+        metrics.reset()
+        metrics.observe("query", 'SELECT "?"', 0.003, rows=2)
+        metrics.observe("query", 'SELECT "?"', 0.2, rows=1)
+
+        text = render_prometheus({"ns/db": _pool_stats()})
+        labels = 'operation="query",fingerprint="SELECT \\"?\\""'
+        assert (
+            f'open_notebook_db_query_duration_seconds_bucket{{{labels},le="0.005"}} 1'
+            in text
+        )
+        assert (
+            f'open_notebook_db_query_duration_seconds_bucket{{{labels},le="+Inf"}} 2'
+            in text
+        )
+        assert f"open_notebook_db_query_rows_total{{{labels}}} 3" in text
+        assert 'open_notebook_db_pool_checkouts_total{pool="ns/db"} 4' in text
+        metrics.reset()
+
+
+def _pool_stats():
+    return {
+        "checkouts": 4,
+        "connections_opened": 1,
+        "connections_closed": 0,
+        "health_check_failures": 0,
+        "discarded": 0,
+        "acquire_timeouts": 0,
+        "wait_time_total": 0.0,
+        "in_use": 0,
+        "idle": 1,
+    }
+
+
+# ============================================================================
+# TEST SUITE 7: Write Coalescer
+# ============================================================================
+
+
+class FakeWriteBackend:
+    """Records coalesced writes; rows with bad=True are rejected."""
+
+    def __init__(self):
+        self.inserts = []
+        self.batches = []
+
+    async def repo_query(self, query, vars=None):
+        if query.startswith("INSERT INTO"):
+            rows = vars["rows"]
+            if any(row.get("bad") for row in rows):
+                raise RuntimeError("Found field 'bad' not allowed")
+            self.inserts.append(rows)
+            return [{"id": f"t:{row['n']}", **row} for row in rows]
+        self.inserts.append([vars["data"]])
+        return [{"id": "t:direct", **vars["data"]}]
+
+    async def repo_query_many(self, statements, transaction=False):
+        self.batches.append((statements, transaction))
+        return [[] for _ in statements]
+
+
+@contextmanager
+def patch_write_backend(backend):
+    module = sys.modules[WriteCoalescer.__module__]
+    with patch.object(module, "repo_query", backend.repo_query):
+        with patch.object(module, "repo_query_many", backend.repo_query_many):
+            yield
+
+
+class TestWriteCoalescer:
+    """Test suite for per-table write coalescing."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_creates_share_one_insert(self):
+        """Concurrent creates are flushed as one INSERT and each gets its row."""
+        backend = FakeWriteBackend()
+        coalescer = WriteCoalescer("t", max_batch=10, max_delay=0.01)
+        with patch_write_backend(backend):
+            created = await asyncio.gather(
+                *(coalescer.create({"n": i}) for i in range(5))
+            )
+
+        assert [row["id"] for row in created] == [f"t:{i}" for i in range(5)]
+        assert len(backend.inserts) == 1
+        assert coalescer.stats.flushes == 1
+
+    @pytest.mark.asyncio
+    async def test_merges_run_in_one_transaction(self):
+        """Batched merges use distinct parameters inside one transaction."""
+        backend = FakeWriteBackend()
+        coalescer = WriteCoalescer("note", max_batch=10, max_delay=0.01)
+        with patch_write_backend(backend):
+            await asyncio.gather(
+                coalescer.merge("note:a", {"embedding": [0.1]}),
+                coalescer.merge("note:b", {"embedding": [0.2]}),
+            )
+
+        [(statements, transaction)] = backend.batches
+        assert transaction is True
+        assert [query for query, _ in statements] == [
+            "UPDATE $id_0 MERGE $data_0 RETURN NONE",
+            "UPDATE $id_1 MERGE $data_1 RETURN NONE",
+        ]
+        assert statements[1][1]["id_1"] == RecordID("note", "b")
+
+    @pytest.mark.asyncio
+    async def test_merge_batch_commits_once_in_a_real_database(self):
+        """A transaction of several merges succeeds without the per-row fallback."""
+        coalescer = WriteCoalescer("note", max_batch=10, max_delay=0.01)
+        async with memory_database():
+            await repo_query("CREATE note:a, note:b SET title = 'x'")
+            await asyncio.gather(
+                coalescer.merge("note:a", {"embedding": [0.1]}),
+                coalescer.merge("note:b", {"embedding": [0.2]}),
+            )
+            stored = await repo_query("SELECT VALUE embedding FROM note:a, note:b")
+
+        assert stored == [[0.1], [0.2]]
+        assert coalescer.stats.flushes == 1
+        assert coalescer.stats.fallbacks == 0
+
+    @pytest.mark.asyncio
+    async def test_bad_row_only_fails_its_caller(self):
+        """A rejected batch is retried row by row."""
+        backend = FakeWriteBackend()
+        coalescer = WriteCoalescer("t", max_batch=10, max_delay=0.01)
+        with patch_write_backend(backend):
+            results = await asyncio.gather(
+                coalescer.create({"n": 1}),
+                coalescer.create({"n": 2, "bad": True}),
+                coalescer.create({"n": 3}),
+                return_exceptions=True,
+            )
+
+        assert results[0]["id"] == "t:1"
+        assert isinstance(results[1], RuntimeError)
+        assert results[2]["id"] == "t:3"
+        assert coalescer.stats.fallbacks == 1
+
+    @pytest.mark.asyncio
+    async def test_disabled_table_writes_directly(self, monkeypatch):
+        """Without opt-in, coalesced_create issues a plain CREATE."""
+        monkeypatch.delenv("SURREAL_WRITE_COALESCE_TABLES", raising=False)
+        backend = FakeWriteBackend()
+        with patch_write_backend(backend):
+            created = await coalesced_create("t", {"n": 1})
+        assert created["id"] == "t:direct"
+
+
+# ============================================================================
+# TEST SUITE 8: Vector Index
+# ============================================================================
+
+
+class FakeVectorIndexBackend:
+    """Stores the vector index state record and counts mismatched rows."""
+
+    def __init__(self, state=None, mismatched=0):
+        self.state = state
+        self.mismatched = mismatched
+        self.statements = []
+        self.submitted = []
+
+    async def repo_query(self, query, vars=None):
+        self.statements.append(query)
+        if query.startswith("SELECT * FROM ONLY"):
+            return self.state
+        return []
+
+    async def repo_query_many(self, statements, transaction=False):
+        self.statements.extend(s if isinstance(s, str) else s[0] for s in statements)
+        if "count()" in str(statements[0]):
+            return [[{"rows": self.mismatched}] for _ in statements]
+        return [[] for _ in statements]
+
+    async def repo_upsert(self, table, id, data, add_timestamp=False):
+        self.state = dict(data)
+        return [self.state]
+
+    def submit_command(self, app, name, args):
+        self.submitted.append(name)
+
+
+@contextmanager
+def patch_vector_index(backend):
+    with (
+        patch.object(vector_index, "repo_query", backend.repo_query),
+        patch.object(vector_index, "repo_query_many", backend.repo_query_many),
+        patch.object(vector_index, "repo_upsert", backend.repo_upsert),
+        patch.object(vector_index, "submit_command", backend.submit_command),
+        patch.object(vector_index, "_cached_state", None),
+        patch.object(vector_index, "_builds_submitted", {}),
+    ):
+        yield
+
+
+class TestVectorIndex:
+    """Test suite for the HNSW/M-tree vector index state and KNN search."""
+
+    def test_index_definition_and_operator(self, monkeypatch):
+        monkeypatch.setenv("VECTOR_INDEX_EF", "40")
+        assert vector_index.index_definition("idx", "note", 768, "hnsw") == (
+            "DEFINE INDEX OVERWRITE idx ON TABLE note FIELDS embedding "
+            "HNSW DIMENSION 768 DIST COSINE EFC 150 M 12"
+        )
+        assert vector_index.knn_operator(10, "hnsw") == "<|10,40|>"
+        assert vector_index.knn_operator(100, "hnsw") == "<|100,100|>"
+        assert vector_index.knn_operator(10, "mtree") == "<|10|>"
+
+    def test_merge_groups_hits_like_vector_search(self):
+        rows = [
+            {
+                "id": "source:a",
+                "parent_id": "source:a",
+                "title": "A",
+                "content": "one",
+                "similarity": 0.5,
+            },
+            {
+                "id": "source:a",
+                "parent_id": "source:a",
+                "title": "A",
+                "content": "two",
+                "similarity": 0.9,
+            },
+            {
+                "id": "note:n",
+                "parent_id": "note:n",
+                "title": "N",
+                "content": "three",
+                "similarity": 0.7,
+            },
+            {
+                "id": "note:m",
+                "parent_id": "note:m",
+                "title": "M",
+                "content": "low",
+                "similarity": 0.1,
+            },
+        ]
+        merged = vector_index.merge_search_results(rows, 5, 0.2)
+        assert [hit["id"] for hit in merged] == ["source:a", "note:n"]
+        assert merged[0]["similarity"] == 0.9
+        assert merged[0]["matches"] == ["one", "two"]
+        assert len(vector_index.merge_search_results(rows, 1, 0.2)) == 1
+
+    def test_knn_hits_expression_inlines_one_select_per_table(self):
+        expression = vector_index.knn_hits_expression(20, True, False, "hnsw")
+        assert expression.count("FROM source_embedding") == 1
+        assert expression.count("FROM source_insight") == 1
+        assert "FROM note" not in expression
+        # Over-fetches chunks so that grouping still leaves 20 items
+        assert "embedding <|100,100|> $query" in expression
+        assert expression.endswith("LIMIT $candidates)")
+        assert vector_index.knn_hits_expression(20, False, False, "hnsw") == "[]"
+
+    @pytest.mark.asyncio
+    async def test_new_dimension_drops_index_and_queues_one_build(self, monkeypatch):
+        monkeypatch.delenv("VECTOR_INDEX", raising=False)
+        backend = FakeVectorIndexBackend(
+            {"kind": "hnsw", "dimension": 1536, "status": "ready"}
+        )
+        with patch_vector_index(backend):
+            await vector_index.ensure_vector_index(768)
+            await vector_index.ensure_vector_index(768)
+
+        assert any(q.startswith("REMOVE INDEX") for q in backend.statements)
+        assert backend.state["status"] == "missing"
+        assert backend.submitted == ["build_vector_index"]
+
+    @pytest.mark.asyncio
+    async def test_matching_index_is_left_alone(self, monkeypatch):
+        monkeypatch.delenv("VECTOR_INDEX", raising=False)
+        backend = FakeVectorIndexBackend(
+            {"kind": "hnsw", "dimension": 768, "status": "ready"}
+        )
+        with patch_vector_index(backend):
+            await vector_index.ensure_vector_index(768)
+            state = await vector_index.get_vector_index_state()
+
+        assert state.usable_for(768) and not state.usable_for(1536)
+        assert backend.submitted == []
+        assert len(backend.statements) == 1  # Cached after the first read
+
+    @pytest.mark.asyncio
+    async def test_stale_build_is_queued_again(self, monkeypatch):
+        monkeypatch.delenv("VECTOR_INDEX", raising=False)
+        monkeypatch.setenv("VECTOR_INDEX_BUILD_TIMEOUT", "60")
+        backend = FakeVectorIndexBackend(
+            {
+                "kind": "hnsw",
+                "dimension": 768,
+                "status": "building",
+                "started_at": time.time() - 10,
+            }
+        )
+        with patch_vector_index(backend):
+            await vector_index.ensure_vector_index(768)
+            assert backend.submitted == []
+
+            backend.state["started_at"] = time.time() - 120
+            vector_index._cached_state = None
+            await vector_index.ensure_vector_index(768)
+
+        assert backend.submitted == ["build_vector_index"]
+
+    @pytest.mark.asyncio
+    async def test_finished_build_can_be_queued_again(self, monkeypatch):
+        from commands.embedding_commands import (
+            BuildVectorIndexInput,
+            build_vector_index_command,
+        )
+
+        monkeypatch.delenv("VECTOR_INDEX", raising=False)
+        backend = FakeVectorIndexBackend()
+        with (
+            patch_vector_index(backend),
+            patch(
+                "commands.embedding_commands.build_vector_index",
+                AsyncMock(side_effect=RuntimeError("boom")),
+            ),
+        ):
+            await vector_index.ensure_vector_index(768)
+            await vector_index.ensure_vector_index(768)
+            output = await build_vector_index_command(
+                BuildVectorIndexInput(dimension=768)
+            )
+            await vector_index.ensure_vector_index(768)
+
+        assert output.status == "failed"
+        assert backend.submitted == ["build_vector_index", "build_vector_index"]
+
+    @pytest.mark.asyncio
+    async def test_build_is_blocked_by_other_dimensions(self, monkeypatch):
+        monkeypatch.delenv("VECTOR_INDEX", raising=False)
+        backend = FakeVectorIndexBackend(mismatched=3)
+        with patch_vector_index(backend):
+            state = await vector_index.build_vector_index(768)
+        assert state.status == "blocked"
+        assert not any(q.startswith("DEFINE INDEX") for q in backend.statements)
+
+        backend = FakeVectorIndexBackend()
+        with patch_vector_index(backend):
+            state = await vector_index.build_vector_index(768)
+        assert state.usable_for(768)
+        defined = [q for q in backend.statements if q.startswith("DEFINE INDEX")]
+        assert len(defined) == len(vector_index.VECTOR_INDEXES)
+
+
+# ============================================================================
+# TEST SUITE 9: Local Vector Index
+# ============================================================================
+
+
+def _unit(*values):
+    vector = np.asarray(values, dtype=np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class FakeEmbeddingTables:
+    """Rows repo_scan pages through when the local index is built."""
+
+    def __init__(self, rows):
+        self.rows = rows  # table -> [row]
+
+    async def repo_scan(self, table, projection="*", where=None, vars=None, **kw):
+        rows = [
+            r for r in self.rows.get(table, []) if len(r["embedding"]) == vars["dims"]
+        ]
+        if rows:
+            yield rows
+
+
+@pytest.fixture
+def local_index_path(tmp_path, monkeypatch):
+    monkeypatch.setenv("VECTOR_SEARCH_BACKEND", "local")
+    monkeypatch.setenv("VECTOR_LOCAL_PATH", str(tmp_path))
+    return str(tmp_path)
+
+
+async def _build_local_index(path, rows, dimension=3):
+    index = local_vector_index.LocalVectorIndex(path)
+    with patch.object(
+        local_vector_index, "repo_scan", FakeEmbeddingTables(rows).repo_scan
+    ):
+        await index.build(dimension)
+    return index
+
+
+def _matryoshka_vectors(count, dimension, seed=7):
+    """Vectors whose leading components carry most of the signal."""
+    rng = np.random.default_rng(seed)
+    decay = np.linspace(3.0, 0.2, dimension, dtype=np.float32)
+    return (rng.standard_normal((count, dimension)) * decay).astype(np.float32)
+
+
+class TestLocalVectorIndex:
+    """Test suite for the in-process vector index and its shared journal."""
+
+    @pytest.mark.asyncio
+    async def test_build_then_journal_is_seen_by_other_processes(
+        self, local_index_path
+    ):
+        writer = await _build_local_index(
+            local_index_path,
+            {
+                "source_embedding": [
+                    {
+                        "id": "source_embedding:a",
+                        "parent": "source:s",
+                        "embedding": _unit(1, 0, 0),
+                    },
+                    {
+                        "id": "source_embedding:b",
+                        "parent": "source:s",
+                        "embedding": _unit(0, 1, 0),
+                    },
+                ],
+                "note": [
+                    {"id": "note:n", "parent": "note:n", "embedding": _unit(1, 1, 0)}
+                ],
+            },
+        )
+        reader = local_vector_index.LocalVectorIndex(local_index_path)
+        hits = reader.search_sync(_unit(1, 0.1, 0), 1, "source_embedding")
+        assert [key for key, _ in hits] == ["source_embedding:a"]
+        assert hits[0][1] == pytest.approx(0.995, abs=0.01)
+        assert [k for k, _ in reader.search_sync(_unit(1, 0, 0), 5, "note")] == [
+            "note:n"
+        ]
+
+        writer.put_sync(
+            [("source_embedding:c", "source_embedding", "source:t", _unit(1, 0.1, 0))]
+        )
+        hits = reader.search_sync(_unit(1, 0.1, 0), 1, "source_embedding")
+        assert [key for key, _ in hits] == ["source_embedding:c"]
+
+        writer.delete_parents_sync(["source:s"])
+        writer.delete_sync(["note:n"])
+        hits = reader.search_sync(_unit(1, 0, 0), 5, "source_embedding")
+        assert [key for key, _ in hits] == ["source_embedding:c"]
+        assert reader.search_sync(_unit(1, 0, 0), 5, "note") == []
+
+    @pytest.mark.asyncio
+    async def test_compaction_writes_a_snapshot_and_empties_journal(
+        self, local_index_path
+    ):
+        index = await _build_local_index(
+            local_index_path,
+            {
+                "note": [
+                    {"id": "note:a", "parent": "note:a", "embedding": _unit(1, 0, 0)}
+                ]
+            },
+        )
+        index.put_sync([("note:b", "note", "note:b", _unit(0, 1, 0))])
+        index.delete_sync(["note:a"])
+        assert index.compact_sync()
+
+        (pending,) = (
+            index._connection().execute("SELECT count(*) FROM journal").fetchone()
+        )
+        assert pending == 0
+        fresh = local_vector_index.LocalVectorIndex(local_index_path)
+        assert [k for k, _ in fresh.search_sync(_unit(0, 1, 0), 5, "note")] == [
+            "note:b"
+        ]
+        snapshots = {
+            name.rsplit(".", 1)[0]
+            for name in os.listdir(local_index_path)
+            if name.startswith("snapshot-")
+        }
+        assert len(snapshots) == 2  # Current and previous
+
+    @pytest.mark.asyncio
+    async def test_dimension_change_resets_until_rebuilt(self, local_index_path):
+        index = await _build_local_index(
+            local_index_path,
+            {
+                "note": [
+                    {"id": "note:a", "parent": "note:a", "embedding": _unit(1, 0, 0)}
+                ]
+            },
+        )
+        assert index.ensure_dimension_sync(3)
+        assert not index.ensure_dimension_sync(4)
+        assert index.search_sync(_unit(1, 0, 0, 0), 5, "note") is None
+
+        other = local_vector_index.LocalVectorIndex(local_index_path)
+        assert other.search_sync(_unit(1, 0, 0), 5, "note") is None
+
+    @pytest.mark.asyncio
+    async def test_search_fetches_hits_in_one_query(self, local_index_path):
+        index = await _build_local_index(
+            local_index_path,
+            {
+                "source_embedding": [
+                    {
+                        "id": "source_embedding:a",
+                        "parent": "source:s",
+                        "embedding": _unit(1, 0, 0),
+                    },
+                    {
+                        "id": "source_embedding:gone",
+                        "parent": "source:s",
+                        "embedding": _unit(1, 0.2, 0),
+                    },
+                ]
+            },
+        )
+        batches = []
+
+        async def fake_query_many(statements, transaction=False):
+            batches.append(statements)
+            return [
+                [
+                    {
+                        "id": "source:s",
+                        "parent_id": "source:s",
+                        "title": "S",
+                        "content": "text",
+                        "row_id": "source_embedding:a",
+                    }
+                ]
+            ]
+
+        with (
+            patch.object(local_vector_index, "_local_index", index),
+            patch.object(local_vector_index, "repo_query_many", fake_query_many),
+        ):
+            hits = await local_vector_index.local_vector_search(
+                _unit(1, 0, 0), 5, True, False, 0.2
+            )
+
+        assert len(batches) == 1 and len(batches[0]) == 1  # Insight table had no hits
+        assert [hit["id"] for hit in hits] == ["source:s"]
+        assert hits[0]["similarity"] == pytest.approx(1.0)
+
+    @pytest.mark.asyncio
+    async def test_long_source_does_not_crowd_out_others(self, local_index_path):
+        chunks = [
+            {
+                "id": f"source_embedding:long{order}",
+                "parent": "source:long",
+                "embedding": _unit(1, order / 100, 0),
+            }
+            for order in range(12)
+        ] + [
+            {
+                "id": f"source_embedding:s{item}",
+                "parent": f"source:s{item}",
+                "embedding": _unit(1, 0.5 + item / 10, 0),
+            }
+            for item in range(6)
+        ]
+        index = await _build_local_index(local_index_path, {"source_embedding": chunks})
+        parents = {chunk["id"]: chunk["parent"] for chunk in chunks}
+
+        async def fake_query_many(statements, transaction=False):
+            return [
+                [
+                    {
+                        "id": parents[str(row_id)],
+                        "parent_id": parents[str(row_id)],
+                        "title": "S",
+                        "content": str(row_id),
+                        "row_id": str(row_id),
+                    }
+                    for row_id in next(iter(vars.values()))
+                ]
+                for _, vars in statements
+            ]
+
+        with (
+            patch.object(local_vector_index, "_local_index", index),
+            patch.object(local_vector_index, "repo_query_many", fake_query_many),
+        ):
+            hits = await local_vector_index.local_vector_search(
+                _unit(1, 0, 0), 5, True, False, 0.2
+            )
+
+        assert [hit["id"] for hit in hits] == [
+            "source:long",
+            "source:s0",
+            "source:s1",
+            "source:s2",
+            "source:s3",
+        ]
+        assert len(hits[0]["matches"]) == 12
+
+    @pytest.mark.asyncio
+    async def test_scoped_search_only_scores_scope_parents(self, local_index_path):
+        index = await _build_local_index(
+            local_index_path,
+            {
+                "source_embedding": [
+                    {
+                        "id": "source_embedding:in",
+                        "parent": "source:mine",
+                        "embedding": _unit(0, 1, 0),
+                    },
+                    {
+                        "id": "source_embedding:out",
+                        "parent": "source:other",
+                        "embedding": _unit(1, 0, 0),
+                    },
+                ]
+            },
+        )
+        index.put_sync(
+            [
+                (
+                    "source_embedding:new",
+                    "source_embedding",
+                    "source:other",
+                    _unit(1, 0, 0),
+                )
+            ]
+        )
+
+        hits = index.search_sync(_unit(1, 0, 0), 5, "source_embedding", {"source:mine"})
+        assert [key for key, _ in hits] == ["source_embedding:in"]
+        assert index.search_sync(_unit(1, 0, 0), 5, "note", {"note:none"}) == []
+
+    @pytest.mark.asyncio
+    async def test_two_stage_search_reranks_head_candidates(
+        self, local_index_path, monkeypatch
+    ):
+        monkeypatch.setenv("EMBEDDING_HEAD_DIMENSIONS", "16")
+        monkeypatch.setenv("VECTOR_SEARCH_RERANK_CANDIDATES", "60")
+        vectors = _matryoshka_vectors(500, 64)
+        index = await _build_local_index(
+            local_index_path,
+            {
+                "source_embedding": [
+                    {
+                        "id": f"source_embedding:c{row}",
+                        "parent": "source:s",
+                        "embedding": vector.tolist(),
+                    }
+                    for row, vector in enumerate(vectors)
+                ]
+            },
+            dimension=64,
+        )
+        assert index._heads is not None and index._heads.shape == (500, 16)
+
+        # Scoped searches are exact scans, so they take the two-stage path
+        normalised = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        found = 0
+        for query in vectors[:20] + 0.1:
+            exact = np.argsort(-(normalised @ (query / np.linalg.norm(query))))[:5]
+            hits = dict(
+                index.search_sync(query.tolist(), 5, "source_embedding", {"source:s"})
+            )
+            found += len({f"source_embedding:c{row}" for row in exact} & hits.keys())
+        assert found / 100 >= 0.9  # recall@5 against the exact scan
+
+        monkeypatch.setenv("EMBEDDING_HEAD_DIMENSIONS", "0")
+        assert not index._two_stage(500, 5)  # Heads stay unused once disabled
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@asynccontextmanager
+async def migrated_database(monkeypatch):
+    """memory_database with every schema migration applied."""
+    from open_notebook.database import async_migrate
+
+    repository = sys.modules[repo_query_many.__module__]
+    monkeypatch.chdir(REPO_ROOT)  # Migration files are listed relative to it
+    monkeypatch.setattr(vector_index, "_cached_state", None)
+    async with memory_database() as connection:
+        with patch.object(async_migrate, "db_connection", repository.db_connection):
+            await async_migrate.AsyncMigrationManager().run_migration_up()
+        yield connection
+
+
+class TestSearchFunctions:
+    """Search functions of the migrations, run by an embedded database."""
+
+    @pytest.mark.asyncio
+    async def test_hybrid_search_fuses_text_and_vector_rankings(self, monkeypatch):
+        from open_notebook.domain import notebook
+
+        async def fake_embed_query(text):
+            return [1.0, 0.0, 0.0]
+
+        monkeypatch.setenv("VECTOR_SEARCH_BACKEND", "surreal")
+        monkeypatch.setenv("EMBEDDING_HEAD_DIMENSIONS", "0")
+        monkeypatch.setattr(
+            "open_notebook.utils.embedding.embed_query", fake_embed_query
+        )
+        async with migrated_database(monkeypatch) as connection:
+            await connection.query(
+                """
+                CREATE source:s SET title = 'Alpha', full_text = 'alpha beta';
+                CREATE source_embedding:c SET source = source:s, order = 0,
+                    content = 'alpha beta', embedding = [1.0, 0.0, 0.0];
+                CREATE note:n SET title = 'Gamma', content = 'gamma delta',
+                    embedding = [0.0, 1.0, 0.0];
+                """
+            )
+
+            results = await notebook.hybrid_search("delta", 5, minimum_score=0.1)
+            by_id = {result["id"]: result for result in results}
+            assert set(by_id) == {"source:s", "note:n"}
+            # The source is the only vector hit, the note the only BM25 hit
+            assert by_id["source:s"]["vector_score"] == pytest.approx(1.0)
+            assert by_id["source:s"]["matches"] == ["alpha beta"]
+            assert by_id["note:n"]["text_score"] != 0
+            assert by_id["note:n"]["matches"] == ["gamma delta"]
+            assert by_id["note:n"]["score"] == pytest.approx(1 / 61)
+
+            vector_only = await notebook.hybrid_search(
+                "delta", 5, minimum_score=0.1, text_weight=0
+            )
+            assert [result["id"] for result in vector_only] == ["source:s"]
+
+    @pytest.mark.asyncio
+    async def test_two_stage_search_waits_until_every_row_has_a_head(self, monkeypatch):
+        from commands.embedding_commands import (
+            ConvertEmbeddingStorageInput,
+            convert_embedding_storage_command,
+        )
+        from open_notebook.domain import notebook
+
+        async def fake_embed_query(text):
+            return [1.0, 0.0, 0.0]
+
+        monkeypatch.setenv("VECTOR_SEARCH_BACKEND", "surreal")
+        monkeypatch.setenv("EMBEDDING_HEAD_DIMENSIONS", "2")
+        monkeypatch.setattr(vector_index, "_cached_head_dimension", None)
+        monkeypatch.setattr(
+            "open_notebook.utils.embedding.embed_query", fake_embed_query
+        )
+        async with migrated_database(monkeypatch) as connection:
+            # Embedded before heads were enabled, so it has none
+            await connection.query(
+                "CREATE note:old SET title = 'Old', content = 'old', "
+                "embedding = [0.9, 0.1, 0.0];"
+            )
+            assert await notebook._two_stage_vars([1.0, 0.0, 0.0], 5) is None
+            found = await notebook.vector_search("old", 5, minimum_score=0.1)
+            assert [result["id"] for result in found] == ["note:old"]
+
+            output = await convert_embedding_storage_command(
+                ConvertEmbeddingStorageInput(format="float")
+            )
+            assert output.success and output.rows_converted == 1
+            head = await connection.query("SELECT VALUE embedding_head FROM note:old")
+            assert len(head[0]) == 2
+
+            assert await notebook._two_stage_vars([1.0, 0.0, 0.0], 5) is not None
+            found = await notebook.vector_search("old", 5, minimum_score=0.1)
+            assert [result["id"] for result in found] == ["note:old"]
+
+    @pytest.mark.asyncio
+    async def test_index_and_scan_find_the_same_items(self, monkeypatch):
+        monkeypatch.setenv("VECTOR_SEARCH_BACKEND", "surreal")
+        monkeypatch.setenv("VECTOR_INDEX", "hnsw")
+        async with migrated_database(monkeypatch) as connection:
+            # One long source whose chunks are all nearer than any other source
+            statements = ["CREATE source:long SET title = 'Long';"]
+            for order in range(12):
+                statements.append(
+                    "CREATE source_embedding SET source = source:long, "
+                    f"order = {order}, content = 'long {order}', "
+                    f"embedding = [1.0, {order / 100}];"
+                )
+            for item in range(6):
+                statements.append(
+                    f"CREATE source:s{item} SET title = 'S'; "
+                    f"CREATE source_embedding SET source = source:s{item}, "
+                    f"order = 0, content = 's', embedding = [1.0, {0.5 + item / 10}];"
+                )
+            await connection.query(" ".join(statements))
+            state = await vector_index.build_vector_index(2)
+            assert state.status == "ready"
+
+            query = [1.0, 0.0]
+            scan = await repo_query(
+                "SELECT * FROM fn::vector_search($query, 5, true, false, 0.1, "
+                "NONE, NONE)",
+                {"query": query},
+            )
+            ids = [hit["id"] for hit in scan]
+            assert ids == [
+                "source:long",
+                "source:s0",
+                "source:s1",
+                "source:s2",
+                "source:s3",
+            ]
+            assert len(scan[0]["matches"]) == 12
+
+            indexed = await vector_index.knn_vector_search(
+                query, 5, True, False, 0.1, "hnsw"
+            )
+            assert [hit["id"] for hit in indexed] == ids
+            assert len(indexed[0]["matches"]) == 12
+
+            inlined = await repo_query(
+                f"RETURN {vector_index.knn_hits_expression(5, True, False, 'hnsw')}",
+                {"query": query, "min_similarity": 0.1, "candidates": 5},
+            )
+            assert [hit["id"] for hit in inlined] == ids
+
+
+class TestEmbeddingStorageConversion:
+    """convert_embedding_storage against an embedded database."""
+
+    @pytest.mark.asyncio
+    async def test_rows_are_rewritten_in_place(self, monkeypatch):
+        from commands.embedding_commands import (
+            ConvertEmbeddingStorageInput,
+            convert_embedding_storage_command,
+        )
+
+        monkeypatch.setenv("EMBEDDING_HEAD_DIMENSIONS", "0")
+        async with migrated_database(monkeypatch) as connection:
+            await connection.query(
+                "CREATE note:n SET title = 'N', content = 'n', "
+                "embedding = [0.5, -1.0, 0.25];"
+            )
+
+            output = await convert_embedding_storage_command(
+                ConvertEmbeddingStorageInput(format="int8")
+            )
+            assert output.success and output.rows_converted == 1
+            rows = await connection.query(
+                "SELECT embedding, embedding_scale FROM note:n"
+            )
+            assert rows[0]["embedding"] == [64, -127, 32]
+
+            output = await convert_embedding_storage_command(
+                ConvertEmbeddingStorageInput(format="float")
+            )
+            assert output.success and output.rows_converted == 1
+            rows = await connection.query(
+                "SELECT embedding, embedding_scale FROM note:n"
+            )
+            assert rows[0]["embedding"] == pytest.approx([0.5, -1.0, 0.25], abs=0.01)
+            assert rows[0].get("embedding_scale") is None
@@ -16,7 +16,13 @@ from open_notebook.utils import (
     remove_non_printable,
     token_count,
 )
-from open_notebook.utils.context_builder import ContextBuilder, ContextConfig
+from open_notebook.utils.context_builder import (
+    ContextBuilder,
+    ContextConfig,
+    ContextItem,
+)
+from open_notebook.utils.env import env_float, env_int
+from open_notebook.utils.token_utils import TokenCounter
 
 # ============================================================================
 # TEST SUITE 1: Text Utilities
@@ -151,6 +157,48 @@ class TestTokenUtilities:
             assert isinstance(count, int)
             assert count > 0
 
+    def test_count_batch_matches_count(self):
+        """Test batch counting gives the same counts as single counting."""
+        counter = TokenCounter()
+        texts = ["hello world", "", "检索质量取决于文档", "<|endoftext|> is text"]
+        assert counter.count_batch(texts) == [counter.count(t) for t in texts]
+        assert counter.count_batch([]) == []
+
+    def test_exceeds_only_counts_near_threshold(self):
+        """Test that threshold checks tokenize only near the threshold."""
+        counted = []
+
+        class SpyCounter(TokenCounter):
+            def count(self, text):
+                counted.append(text)
+                return len(text) // 4
+
+        counter = SpyCounter()
+        assert not counter.exceeds("word " * 50, 1000)  # Too short to exceed
+        assert not counter.exceeds("word " * 1000, 2000)  # Estimate far below
+        assert counter.exceeds("word " * 10000, 2000)  # Estimate far above
+        assert counted == []
+        assert counter.exceeds("word " * 2000, 2400)  # Near: exact count
+        assert counted == ["word " * 2000]
+
+    def test_context_builder_counts_in_one_batch(self):
+        """Test that context items are counted together, once."""
+        from unittest.mock import patch
+
+        builder = ContextBuilder()
+        builder.items = [
+            ContextItem(id="source:1", type="source", content={"a": "x" * 40}),
+            ContextItem(id="note:1", type="note", content={}, token_count=7),
+        ]
+        with patch(
+            "open_notebook.utils.context_builder.token_counter.count_batch",
+            return_value=[11],
+        ) as count_batch:
+            builder.truncate_to_fit(100)
+            builder.truncate_to_fit(100)
+        count_batch.assert_called_once()
+        assert [item.token_count for item in builder.items] == [11, 7]
+
 
 # ============================================================================
 # TEST SUITE 3: Version Utilities
@@ -258,5 +306,32 @@ class TestContextBuilder:
         assert builder.include_insights is False
 
 
+# ============================================================================
+# TEST SUITE 5: Environment Settings
+# ============================================================================
+
+
+class TestEnvSettings:
+    """Test suite for numeric settings read from the environment."""
+
+    def test_env_int(self, monkeypatch):
+        assert env_int("TEST_SETTING", 5) == 5
+        monkeypatch.setenv("TEST_SETTING", "12")
+        assert env_int("TEST_SETTING", 5) == 12
+        monkeypatch.setenv("TEST_SETTING", "0")
+        assert env_int("TEST_SETTING", 5, minimum=1) == 1
+        monkeypatch.setenv("TEST_SETTING", "many")
+        assert env_int("TEST_SETTING", 5) == 5
+
+    def test_env_float(self, monkeypatch):
+        assert env_float("TEST_SETTING", 1.5) == 1.5
+        monkeypatch.setenv("TEST_SETTING", "0.25")
+        assert env_float("TEST_SETTING", 1.5) == 0.25
+        monkeypatch.setenv("TEST_SETTING", "")
+        assert env_float("TEST_SETTING", 1.5) == 1.5
+        monkeypatch.setenv("TEST_SETTING", "soon")
+        assert env_float("TEST_SETTING", 1.5) == 1.5
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])